@@ -0,0 +1,219 @@
+"""Asyncio interface of the host star lookups and the flux ratio pipelines.
+
+The database lookups block on the network for seconds while the table work
+takes microseconds. ``AsyncStellarParams`` runs the blocking lookups of a
+stellar parameter provider in a small thread pool, with a bounded number of
+concurrent lookups, a timeout and retries, so many hosts can be processed
+concurrently from an event loop::
+
+    async with AsyncStellarParams(max_concurrency=8, timeout=30) as db:
+        ratios = await asyncio.gather(
+            *(flux_ratios_async(name, 90, 5, db=db) for name in names),
+            return_exceptions=True,
+        )
+
+Without a db the pipelines share one default instance (see default_db), so
+the concurrency limit holds across all their calls.
+
+The table searches run on the event loop and share the loaded model grids.
+"""
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Type
+from weakref import WeakKeyDictionary
+
+from baraffe_tables.flux_ratio_to_mass import compute_companion_params
+from baraffe_tables.mass_to_flux_ratio import compute_flux_ratios
+from baraffe_tables.providers import SimbadProvider, StellarParamProvider
+
+
+class AsyncStellarParams:
+    """Async access to a stellar parameter provider.
+
+    Parameters
+    ----------
+    provider: StellarParamProvider, optional
+        Source of the stellar parameters. Default is SimbadProvider().
+    max_concurrency: int
+        Maximum number of lookups running at once.
+    timeout: float, optional
+        Seconds to wait for each attempt of a lookup. None waits forever.
+    retries: int
+        Number of times a lookup failing with one of retry_on is retried.
+    retry_delay: float
+        Seconds to wait before the first retry, doubled for every next one.
+    retry_on: tuple of exception types
+        Errors that are retried. Default is network errors and timeouts.
+    executor: concurrent.futures.Executor, optional
+        Executor running the blocking lookups. Default is a thread pool of
+        max_concurrency threads.
+
+    Notes
+    -----
+    A lookup that times out can not be interrupted. Its thread finishes in
+    the background while the lookup is retried or the error raised, and
+    keeps its place in the max_concurrency limit until it does.
+
+    An instance can be used from several event loops, each with its own
+    concurrency limit. Use it as ``async with`` or call close() to shut down
+    the default thread pool.
+
+    """
+
+    def __init__(
+        self,
+        provider: Optional[StellarParamProvider] = None,
+        max_concurrency: int = 8,
+        timeout: Optional[float] = 60.0,
+        retries: int = 2,
+        retry_delay: float = 1.0,
+        retry_on: Tuple[Type[BaseException], ...] = (OSError, asyncio.TimeoutError),
+        executor: Optional[Executor] = None,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError(
+                "max_concurrency must be at least 1, not {}.".format(max_concurrency)
+            )
+        if retries < 0:
+            raise ValueError("retries must not be negative, not {}.".format(retries))
+        self.provider = SimbadProvider() if provider is None else provider
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.retry_on = retry_on
+        self.executor = executor
+        self._own_executor = False
+        # Semaphores are bound to an event loop, so each loop gets its own.
+        self._semaphores = WeakKeyDictionary()  # type: WeakKeyDictionary
+
+    async def __aenter__(self) -> "AsyncStellarParams":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking function in the executor, with the concurrency
+        limit, timeout and retries of the lookups."""
+        loop = _running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.max_concurrency)
+            self._own_executor = True
+        call = partial(func, *args, **kwargs)
+        for attempt in range(self.retries + 1):
+            await semaphore.acquire()
+            future = loop.run_in_executor(self.executor, call)
+            # Released when the lookup is done, not when waiting for it stops.
+            future.add_done_callback(lambda __: semaphore.release())
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            except self.retry_on:
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+    async def get_stellar_params(self, star_name: str) -> Any:
+        """Async StellarParamProvider.get_stellar_params."""
+        return await self.run(self.provider.get_stellar_params, star_name)
+
+    async def get_stellar_params_batch(
+        self, star_names: Sequence[str]
+    ) -> Tuple[Any, Dict[str, str]]:
+        """Async StellarParamProvider.get_stellar_params_batch."""
+        return await self.run(self.provider.get_stellar_params_batch, star_names)
+
+    async def get_temperature(
+        self, star_name: str, star_params: Optional[Any] = None
+    ) -> float:
+        """Async StellarParamProvider.get_temperature."""
+        return await self.run(self.provider.get_temperature, star_name, star_params)
+
+    def close(self) -> None:
+        """Shut down the default thread pool. A given executor is left running."""
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+            self._own_executor = False
+
+
+# Python 3.6 has no get_running_loop, get_event_loop is the running loop there.
+_running_loop = getattr(asyncio, "get_running_loop", asyncio.get_event_loop)
+
+_default_db = None  # type: Optional[AsyncStellarParams]
+
+
+def default_db() -> AsyncStellarParams:
+    """The AsyncStellarParams shared by the pipelines called without a db."""
+    global _default_db
+    if _default_db is None:
+        _default_db = AsyncStellarParams()
+    return _default_db
+
+
+async def flux_ratios_async(
+    star_name: str,
+    companion_mass: float,
+    stellar_age: float,
+    bands: Optional[List[str]] = None,
+    model: str = "2003",
+    age_interp: bool = False,
+    db: Optional[AsyncStellarParams] = None,
+) -> Tuple[Dict[str, float], Mapping[str, float]]:
+    """Async version of mass_to_flux_ratio.compute_flux_ratios for a host name.
+
+    The host parameters are looked up with db (default the shared
+    default_db()). See compute_flux_ratios for the other parameters
+    and the return values.
+    """
+    db = default_db() if db is None else db
+    star_params = await db.get_stellar_params(star_name)
+    return compute_flux_ratios(
+        star_params,
+        companion_mass,
+        stellar_age,
+        bands=bands,
+        model=model,
+        age_interp=age_interp,
+    )
+
+
+async def companion_params_async(
+    star_name: str,
+    flux_ratio: float,
+    stellar_age: float,
+    bands: Optional[List[str]] = None,
+    model: str = "2003",
+    age_interp: bool = False,
+    db: Optional[AsyncStellarParams] = None,
+) -> Dict[str, Tuple[float, Mapping[str, float]]]:
+    """Async version of flux_ratio_to_mass.compute_companion_params for a host name.
+
+    The host parameters are looked up with db (default the shared
+    default_db()).
+
+    Returns
+    -------
+    companions: Dict[str, Tuple[float, Mapping[str, float]]]
+        Companion magnitude and parameters for each band (default J, H, K).
+
+    """
+    if (bands is None) or ("All" in bands):
+        bands = ["H", "J", "K"]
+    db = default_db() if db is None else db
+    star_params = await db.get_stellar_params(star_name)
+    return {
+        band: compute_companion_params(
+            star_params,
+            flux_ratio,
+            stellar_age,
+            band=band,
+            model=model,
+            age_interp=age_interp,
+        )
+        for band in bands
+    }
@@ -0,0 +1,214 @@
+"""Run large tables of Baraffe table searches.
+
+``batch_search`` takes one query per row (column, value, age, model,
+age_interp), groups the rows that search the same column of the same model,
+splits the groups into chunks and runs each chunk as a single vectorized
+batch_table_search, optionally across a pool of processes or threads. The
+results come back as arrays in the input order.
+
+Process pools get the model grids through shared memory (see shared_grid)
+when it is available, so the workers do not load the grids themselves.
+"""
+import warnings
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from baraffe_tables.grid_store import normalize_model
+from baraffe_tables.model_grid import get_grid
+from baraffe_tables.table_search import batch_table_search
+
+# (column, values, ages, model, age_interp) of a chunk of queries.
+Chunk = Tuple[str, np.ndarray, np.ndarray, str, bool]
+
+
+def batch_search(
+    queries: Union[Mapping[str, Any], Sequence[Sequence[Any]]],
+    n_workers: int = 1,
+    chunk_size: int = 100000,
+    executor: Union[str, Executor] = "process",
+) -> Dict[str, np.ndarray]:
+    """Search the Baraffe tables for every row of a table of queries.
+
+    Parameters
+    ----------
+    queries: mapping or sequence of rows
+        Either a mapping of columns (dict of arrays, pandas.DataFrame,
+        astropy Table) with "column", "value" and "age" and optionally
+        "model" (default "2003") and "age_interp" (default False), or a
+        sequence of (column, value, age[, model[, age_interp]]) rows.
+    n_workers: int
+        Number of workers. With 1 (default) the chunks are run in this
+        process.
+    chunk_size: int
+        Maximum number of queries searched in one call.
+    executor: str or concurrent.futures.Executor
+        "process" (default) or "thread" pool, or an existing executor to
+        submit the chunks to.
+
+    Returns
+    -------
+    results: Dict[str, numpy.ndarray]
+        Array of each column of the Baraffe tables, in the order of the
+        queries. Columns missing from the model of a query are NaN.
+
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1, not {}.".format(chunk_size))
+    columns, values, ages, models, age_interps = _query_arrays(queries)
+
+    # Group the queries searching the same column of the same model.
+    keys = list(zip(columns.tolist(), models.tolist(), age_interps.tolist()))
+    groups = {}  # type: Dict[Tuple[str, str, bool], List[int]]
+    for i, key in enumerate(keys):
+        groups.setdefault(key, []).append(i)
+
+    result_columns = []  # type: List[str]
+    for column, model, __ in groups:
+        grid = get_grid(model)
+        if column not in grid.column_index:
+            raise ValueError(
+                "Column {0} not in Baraffe table (model={1})".format(column, model)
+            )
+        result_columns.extend(col for col in grid.columns if col not in result_columns)
+
+    chunks = []  # type: List[Chunk]
+    chunk_rows = []  # type: List[np.ndarray]
+    for (column, model, age_interp), rows in groups.items():
+        rows = np.array(rows)
+        for start in range(0, len(rows), chunk_size):
+            part = rows[start : start + chunk_size]
+            chunks.append((column, values[part], ages[part], model, age_interp))
+            chunk_rows.append(part)
+
+    results = {col: np.full(len(values), np.nan) for col in result_columns}
+    messages = []  # type: List[Tuple[str, type]]
+    for rows, (chunk_results, chunk_messages) in zip(
+        chunk_rows, _run_chunks(chunks, n_workers, executor, sorted(set(models)))
+    ):
+        for col, array in chunk_results.items():
+            results[col][rows] = array
+        messages.extend(m for m in chunk_messages if m not in messages)
+
+    for message, category in messages:
+        warnings.warn(message, category)
+    return results
+
+
+def _query_arrays(
+    queries: Union[Mapping[str, Any], Sequence[Sequence[Any]]],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Split the queries into arrays of column, value, age, model and age_interp."""
+    if hasattr(queries, "keys"):
+        names = list(queries.keys())
+        n_rows = len(queries["column"])
+        fields = [
+            queries["column"],
+            queries["value"],
+            queries["age"],
+            queries["model"] if "model" in names else ["2003"] * n_rows,
+            queries["age_interp"] if "age_interp" in names else [False] * n_rows,
+        ]
+    else:
+        rows = []
+        for row in queries:
+            row = tuple(row)
+            if not 3 <= len(row) <= 5:
+                raise ValueError(
+                    "Query rows need (column, value, age[, model[, age_interp]]), "
+                    "not {!r}.".format(row)
+                )
+            rows.append(row + ("2003", False)[len(row) - 3 :])
+        fields = [list(field) for field in zip(*rows)] if rows else [[]] * 5
+
+    columns = np.array([str(col) for col in fields[0]], dtype=object)
+    values = np.asarray(fields[1], dtype=float)
+    ages = np.asarray(fields[2], dtype=float)
+    models = np.array(
+        [normalize_model(str(model)) for model in fields[3]], dtype=object
+    )
+    age_interps = np.asarray(fields[4], dtype=bool)
+    if not len(columns) == len(values) == len(ages) == len(models) == len(age_interps):
+        raise ValueError("All query fields must have the same length.")
+    return columns, values, ages, models, age_interps
+
+
+def _search_chunk(
+    chunk: Chunk, record_warnings: bool = True
+) -> Tuple[Dict[str, np.ndarray], List[Tuple[str, type]]]:
+    """Search one chunk, returning the results and the warnings raised.
+
+    Recording the warnings changes the process wide warning filters, so
+    chunks run in threads raise their warnings directly instead.
+    """
+    column, values, ages, model, age_interp = chunk
+    if not record_warnings:
+        return (
+            batch_table_search(column, values, ages, model, age_interp=age_interp),
+            [],
+        )
+    with warnings.catch_warnings(record=True) as record:
+        warnings.simplefilter("always")
+        results = batch_table_search(column, values, ages, model, age_interp=age_interp)
+    return results, [(str(w.message), w.category) for w in record]
+
+
+def _run_chunks(
+    chunks: List[Chunk],
+    n_workers: int,
+    executor: Union[str, Executor],
+    models: List[str],
+) -> List[Tuple[Dict[str, np.ndarray], List[Tuple[str, type]]]]:
+    """Run the chunks serially or on an executor, keeping their order."""
+    if isinstance(executor, ThreadPoolExecutor):
+        return list(executor.map(partial(_search_chunk, record_warnings=False), chunks))
+    if isinstance(executor, Executor):
+        return list(executor.map(_search_chunk, chunks))
+    if n_workers <= 1 or len(chunks) <= 1:
+        return [_search_chunk(chunk) for chunk in chunks]
+    if executor == "thread":
+        with ThreadPoolExecutor(n_workers) as pool:
+            return list(pool.map(partial(_search_chunk, record_warnings=False), chunks))
+    if executor != "process":
+        raise ValueError(
+            "executor must be 'process', 'thread' or an Executor, not {!r}.".format(
+                executor
+            )
+        )
+
+    shared = _publish(models)
+    try:
+        if shared is None:
+            pool = ProcessPoolExecutor(n_workers)
+        else:
+            pool = ProcessPoolExecutor(
+                n_workers, initializer=_attach_worker, initargs=(shared.handles,)
+            )
+        with pool:
+            return list(pool.map(_search_chunk, chunks))
+    finally:
+        if shared is not None:
+            shared.close()
+
+
+def _attach_worker(handles: List[Any]) -> None:
+    """Pool initializer attaching the shared grids until the worker exits."""
+    from multiprocessing.util import Finalize
+
+    from baraffe_tables.shared_grid import attach_grids, detach_grids
+
+    attach_grids(handles)
+    # Run by the worker process on its way out, when the pool shuts down.
+    Finalize(None, detach_grids, exitpriority=10)
+
+
+def _publish(models: List[str]) -> Optional[Any]:
+    """Publish the grids in shared memory, None if it is not available."""
+    try:
+        from baraffe_tables.shared_grid import publish_grids
+
+        return publish_grids(models)
+    except ImportError:  # Python < 3.8
+        return None
@@ -0,0 +1,117 @@
+"""Small bounded caches used to avoid re-reading and re-computing tables."""
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with hit/miss counters.
+
+    Parameters
+    ----------
+    maxsize: int
+        Maximum number of entries held. The least recently used entry is
+        discarded when the cache is full. Must be at least 1.
+
+    """
+
+    def __init__(self, maxsize: int = 128) -> None:
+        if maxsize < 1:
+            raise ValueError(
+                "Cache maxsize must be at least 1, not {}.".format(maxsize)
+            )
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # type: OrderedDict
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, counting a hit or a miss."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the oldest entries if needed."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the cached value for key, creating it with factory() on a miss."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def resize(self, maxsize: int) -> None:
+        """Change the maximum size, evicting entries if it shrinks."""
+        if maxsize < 1:
+            raise ValueError(
+                "Cache maxsize must be at least 1, not {}.".format(maxsize)
+            )
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the hit/miss counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        """Return a dictionary of cache statistics.
+
+        Keys are "hits", "misses", "size" and "maxsize".
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+class ReadOnlyDict(Mapping):
+    """Read-only mapping over a copy of a dictionary.
+
+    Unlike types.MappingProxyType it can be pickled, so shared cached
+    results can be sent to other processes.
+    """
+
+    def __init__(self, data: Dict[Any, Any]) -> None:
+        self._data = dict(data)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return "ReadOnlyDict({!r})".format(self._data)
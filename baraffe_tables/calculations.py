@@ -1,5 +1,5 @@
 """Calculations for flux ratios."""
-from typing import Any
+from typing import Any, Dict, Optional
 
 import numpy as np
 
@@ -31,13 +31,15 @@ def flux_mag_ratio(mag1: float, mag2: float) -> float:
     return 10 ** (-0.4 * (mag1 - mag2))
 
 
-def calculate_stellar_radius(star_params: Any) -> float:
+def calculate_stellar_radius(star_params: Any, teff: Optional[float] = None) -> float:
     """Based on R/Rs = (Ts/T)^2(L/Ls)^(1/2) equation.
 
     Parameters
     ----------
     star_params: votable, dict
         Table of Stellar parameters.
+    teff: float, optional
+        Stellar temperature. Default is found with get_temperature.
 
     Returns
     -------
@@ -45,8 +47,11 @@ def calculate_stellar_radius(star_params: Any) -> float:
         Estimated Stellar Radius in solar radii.
 
     """
-    star_name = star_params['MAIN_ID'][0].decode("utf-8")
-    teff_star = get_temperature(star_name, star_params)
+    if teff is None:
+        star_name = star_params["MAIN_ID"][0].decode("utf-8")
+        teff_star = get_temperature(star_name, star_params)
+    else:
+        teff_star = teff
 
     Ts_T = 5800. / teff_star  # Temperature ratio
     Dm = 4.83 - star_params["FLUX_V"][0]  # Difference of absolute magnitude
@@ -131,3 +136,53 @@ def apparent_magnitude(parallax, M):
     d = 1. / (parallax * 1e-3)  # Conversion to arcsecond before deriving distance
     mu = distance_modulus(d)
     return M + mu
+
+
+def host_absolute_magnitude(star_params: Any, band: str) -> float:
+    """Absolute magnitude of the host star in a band from its parameter table.
+
+    Parameters
+    ----------
+    star_params: votable, dict
+        Table of Stellar parameters with the FLUX_{band} and PLX_VALUE (mas) columns.
+    band: str
+        Spectral band, e.g. "K".
+
+    Returns
+    -------
+    absolute_mag: float
+        Absolute magnitude of the host in the band.
+
+    """
+    apparent_mag = star_params["FLUX_{0!s}".format(band)]
+    parallax = star_params["PLX_VALUE"]
+    if parallax.unit != "mas":
+        raise ValueError("Parallax unit not correct")
+    return absolute_magnitude(parallax.data[0], apparent_mag.data[0])
+
+
+def host_absolute_magnitudes(star_params: Any) -> Dict[str, float]:
+    """Absolute magnitudes of the host star in every band of its parameter table.
+
+    Parameters
+    ----------
+    star_params: votable, dict
+        Table of Stellar parameters with FLUX_{band} and PLX_VALUE (mas) columns.
+
+    Returns
+    -------
+    absolute_mags: Dict[str, float]
+        Absolute magnitude of each band with a measured FLUX_{band}.
+
+    """
+    absolute_mags = {}  # type: Dict[str, float]
+    for name in star_params.keys():
+        band = name[len("FLUX_") :]
+        if (
+            not name.startswith("FLUX_")
+            or "_" in band
+            or np.ma.is_masked(star_params[name][0])
+        ):
+            continue
+        absolute_mags[band] = host_absolute_magnitude(star_params, band)
+    return absolute_mags
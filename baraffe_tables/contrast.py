@@ -0,0 +1,146 @@
+"""Companion/host flux ratios over grids of companion mass and age.
+
+``flux_ratio_grid`` evaluates the flux ratio of every (mass, age, band) cell
+of an observation plan with one vectorized search of the model grid,
+instead of one ``mass_to_flux_ratio`` run per mass and age.
+
+``mass_limits`` goes the other way for detection limits: it turns whole
+contrast curves of flux ratios into the lowest companion masses that would
+be detected. Magnitudes are not monotonic in mass for every age and band,
+so the limits use the faintest magnitude of all companions at least as
+massive, the precomputed monotone inverse tables of
+``table_search.mass_from_magnitude``.
+"""
+from typing import List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from baraffe_tables.calculations import calculate_companion_magnitude, flux_mag_ratio
+from baraffe_tables.interpolation import ArrayLike
+from baraffe_tables.model_grid import get_grid
+from baraffe_tables.table_search import (
+    batch_table_search,
+    mass_from_magnitude,
+)
+
+
+def model_bands(model: str = "2003") -> List[str]:
+    """Photometric bands of a model, e.g. "K" for the "Mk" column ("LL" is L')."""
+    return [
+        col[1:].upper()
+        for col in get_grid(model).columns
+        if col.startswith("M") and col != "M/Ms"
+    ]
+
+
+def flux_ratio_grid(
+    host_abs_mags: Mapping[str, float],
+    masses: ArrayLike,
+    ages: ArrayLike,
+    model: str = "2003",
+    age_interp: bool = False,
+    bands: Optional[List[str]] = None,
+) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """Companion/host flux ratios for every mass, age and band.
+
+    Parameters
+    ----------
+    host_abs_mags: mapping of str to float
+        Absolute magnitude of the host star in each band, e.g. {"K": 3.9}.
+        See calculations.host_absolute_magnitudes.
+    masses: array_like
+        Companion masses (M_sun), 1-D.
+    ages: array_like
+        Ages of the system (Gyr), 1-D.
+    model: str
+        Year of Baraffe model to use [2003 (default), 2015].
+    age_interp: bool
+        Interpolate tables across age. Default=False.
+    bands: list of str, optional
+        Bands to compute. Default is every band of the model.
+
+    Returns
+    -------
+    flux_ratios: numpy.ndarray
+        F_companion/F_host of shape (mass, age, band). Bands without a host
+        magnitude are NaN.
+    bands: list of str
+        The bands of the last axis.
+    outside: numpy.ndarray
+        Boolean (mass, age) mask of the masses outside the mass range of the
+        tables, which are extrapolated.
+
+    """
+    masses = np.atleast_1d(np.asarray(masses, dtype=float))
+    ages = np.atleast_1d(np.asarray(ages, dtype=float))
+    if masses.ndim != 1 or ages.ndim != 1:
+        raise ValueError("masses and ages must be 1-D.")
+    host_abs_mags = {band.upper(): mag for band, mag in host_abs_mags.items()}
+    available = model_bands(model)
+    if bands is None:
+        bands = available
+    else:
+        bands = [band.upper() for band in bands]
+        for band in bands:
+            if band not in available:
+                raise ValueError(
+                    "Band {0} not in Baraffe model {1}".format(band, model)
+                )
+
+    companion = batch_table_search(
+        "M/Ms", masses[:, None], ages[None, :], model=model, age_interp=age_interp
+    )
+    host = np.array([host_abs_mags.get(band, np.nan) for band in bands], dtype=float)
+    companion_mags = np.stack(
+        [companion["M{}".format(band.lower())] for band in bands], axis=-1
+    )
+    flux_ratios = flux_mag_ratio(companion_mags, host)
+
+    low, high = get_grid(model).mass_range(ages, age_interp)
+    outside = (masses[:, None] < low) | (masses[:, None] > high)
+    return flux_ratios, bands, outside
+
+
+def mass_limits(
+    flux_ratios: ArrayLike,
+    host_abs_mag: float,
+    age: float,
+    band: str = "K",
+    model: str = "2003",
+    age_interp: bool = False,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Lowest detectable companion masses of the flux ratio limits of a contrast curve.
+
+    Parameters
+    ----------
+    flux_ratios: array_like
+        Detection limits F_companion/F_host, of any shape.
+    host_abs_mag: float
+        Absolute magnitude of the host star in the band.
+    age: float
+        Age of star/system (Gyr).
+    band: str
+        Wavelength band of the flux ratios.
+    model: str
+        Year of Baraffe model to use [2003 (default), 2015].
+    age_interp: bool
+        Interpolate tables across age. Default=False.
+
+    Returns
+    -------
+    masses: numpy.ndarray
+        Mass limits (M_sun), the lowest mass above which every companion is
+        brighter than the limit. NaN outside the grid.
+    below: numpy.ndarray
+        True where even the lowest mass of the table is detected.
+    above: numpy.ndarray
+        True where no mass of the table is detected.
+
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        limits = calculate_companion_magnitude(
+            host_abs_mag, np.asarray(flux_ratios, dtype=float)
+        )
+    return mass_from_magnitude(
+        limits, age, band=band, model=model, age_interp=age_interp
+    )
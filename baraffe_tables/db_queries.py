@@ -1,18 +1,39 @@
 """Access Databases."""
-from typing import Any, Optional, Union
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
-from PyAstronomy import pyasl
-from astroquery.simbad import Simbad
 
+from baraffe_tables.query_cache import cache_enabled, offline_mode, query_cache
 
-def get_stellar_params(star_name: str) -> Any:
+# Can add more fluxes here if need to extend flux ranges. Although K is the SIMBAD limit.
+# if want higher need to search for Wise band in VISIER probably.
+simbad_fields = (
+    "parallax",
+    "sp",
+    "fluxdata(B)",
+    "fluxdata(V)",
+    "fluxdata(J)",
+    "fluxdata(H)",
+    "fluxdata(K)",
+    "fe_h",
+)  # type: Tuple[str, ...]
+
+
+def get_stellar_params(star_name: str, cache: Optional[bool] = None,
+                       offline: Optional[bool] = None) -> Any:
     """"Astroquery SIMBAD search for stellar parameters.
 
     Parameters
     ----------
     star_name: str
         Stellar name to get parameters for.
+    cache: bool, optional
+        Use the persistent query cache (see query_cache). Default is True if
+        the BARAFFE_TABLES_QUERY_CACHE environment variable is set.
+    offline: bool, optional
+        Only use the query cache, raising LookupError for stars not in it.
+        Default is the BARAFFE_TABLES_OFFLINE environment variable.
 
     Returns
     -------
@@ -34,15 +55,228 @@ def get_stellar_params(star_name: str) -> Any:
     'name']
 
     """
+    offline = offline_mode() if offline is None else offline
+    cache = cache_enabled() if cache is None else cache
+    if cache or offline:
+        result_table = query_cache.get(star_name, simbad_fields)
+        if result_table is not None:
+            return result_table
+    if offline:
+        raise LookupError(
+            "{0} is not in the SIMBAD query cache {1} and offline mode is on.".format(
+                star_name, query_cache.path
+            )
+        )
+
     # return Magnitudes, parallax, Temp
+    result_table = _custom_simbad().query_object(star_name)
+    if cache and result_table is not None:
+        query_cache.put(star_name, simbad_fields, result_table)
+    return result_table
+
+
+def get_stellar_params_batch(
+    star_names: Sequence[str],
+    chunk_size: int = 100,
+    simbad: Optional[Any] = None,
+    cache: Optional[bool] = None,
+    offline: Optional[bool] = None,
+) -> Tuple[Any, Dict[str, str]]:
+    """SIMBAD search for the stellar parameters of many stars at once.
+
+    The stars not in the query cache are queried with ``query_objects`` in
+    chunks of chunk_size names, one round trip per chunk.
+
+    Parameters
+    ----------
+    star_names: sequence of str
+        Stellar names to get parameters for.
+    chunk_size: int
+        Maximum number of stars per SIMBAD query.
+    simbad: object, optional
+        Object with a ``query_objects`` method to query. Default is a
+        Simbad instance with the stellar parameter fields added.
+    cache: bool, optional
+        Use the persistent query cache (see query_cache). Default is True if
+        the BARAFFE_TABLES_QUERY_CACHE environment variable is set.
+    offline: bool, optional
+        Only use the query cache. Default is the BARAFFE_TABLES_OFFLINE
+        environment variable.
+
+    Returns
+    -------
+    result_table: astropy.table.Table
+        One row per star in the order of star_names, with the columns of
+        get_stellar_params and "QUERY_NAME", the name queried. The rows of
+        the stars that failed are masked.
+    errors: Dict[str, str]
+        Error message of each star that failed.
+
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1, not {}.".format(chunk_size))
+    offline = offline_mode() if offline is None else offline
+    cache = cache_enabled() if cache is None else cache
+    star_names = list(star_names)
+
+    rows = [None] * len(star_names)  # type: List[Any]
+    errors = {}  # type: Dict[str, str]
+    if cache or offline:
+        rows = [query_cache.get(name, simbad_fields) for name in star_names]
+    missing = list(
+        dict.fromkeys(name for name, row in zip(star_names, rows) if row is None)
+    )
+
+    found = {}  # type: Dict[str, Any]
+    if offline:
+        for name in missing:
+            errors[name] = (
+                "Not in the SIMBAD query cache {} and offline mode is on.".format(
+                    query_cache.path
+                )
+            )
+        missing = []
+    if missing and simbad is None:
+        simbad = _custom_simbad()
+    for start in range(0, len(missing), chunk_size):
+        chunk = missing[start : start + chunk_size]
+        try:
+            chunk_found = _split_objects(simbad.query_objects(chunk), chunk)
+        except Exception as e:  # Reported per star, the other chunks go on.
+            for name in chunk:
+                errors[name] = "{0}: {1}".format(type(e).__name__, e)
+            continue
+        for name in chunk:
+            if name in chunk_found:
+                found[name] = chunk_found[name]
+                if cache:
+                    query_cache.put(name, simbad_fields, found[name])
+            else:
+                errors[name] = "Not found in SIMBAD."
+
+    rows = [
+        found.get(name) if row is None else row for name, row in zip(star_names, rows)
+    ]
+    return align_rows(star_names, rows), errors
+
+
+def _custom_simbad() -> Any:
+    """Simbad instance querying the stellar parameter fields."""
+    from astroquery.simbad import Simbad
+
     customSimbad = Simbad()
-    # Can add more fluxes here if need to extend flux ranges. Although K is the SIMBAD limit.
-    # if want higher need to search for Wise band in VISIER probably.
-    customSimbad.add_votable_fields('parallax', 'sp', 'fluxdata(B)',
-                                    'fluxdata(V)', 'fluxdata(J)', 'fluxdata(H)', 'fluxdata(K)',
-                                    'fe_h')
+    customSimbad.add_votable_fields(*simbad_fields)
+    return customSimbad
+
+
+def _split_objects(result_table: Any, star_names: List[str]) -> Dict[str, Any]:
+    """Split a query_objects result into the first row table of each star found."""
+    if result_table is None or len(result_table) == 0:
+        return {}
+    colnames = {name.lower(): name for name in result_table.colnames}
+    id_columns = [
+        colnames[name]
+        for name in ("user_specified_id", "script_number_id")
+        if name in colnames
+    ]
+    if "user_specified_id" in colnames:
+        keys = {" ".join(name.split()).lower(): name for name in star_names}
+        row_names = [
+            keys.get(" ".join(str(value).split()).lower())
+            for value in result_table[colnames["user_specified_id"]]
+        ]
+    elif "script_number_id" in colnames:
+        row_names = [
+            star_names[int(number) - 1]
+            for number in result_table[colnames["script_number_id"]]
+        ]
+    elif len(result_table) == len(star_names):
+        row_names = list(star_names)
+    else:
+        raise ValueError("Can not match the SIMBAD results to the names queried.")
 
-    return customSimbad.query_object(star_name)
+    main_id = colnames.get("main_id")
+    objects = {}  # type: Dict[str, Any]
+    for i, name in enumerate(row_names):
+        if name is None or name in objects:
+            continue
+        if main_id is not None:
+            value = result_table[main_id][i]
+            if np.ma.is_masked(value) or not str(value).strip():
+                continue  # Not found
+        row = result_table[i : i + 1].copy()
+        row.remove_columns(id_columns)
+        objects[name] = row
+    return objects
+
+
+def align_rows(star_names: List[str], rows: List[Any]) -> Any:
+    """Stack the row table of each star, masking the stars without one.
+
+    Parameters
+    ----------
+    star_names: list of str
+        Names of the stars.
+    rows: list
+        One row table per star, or None for the stars not found.
+
+    Returns
+    -------
+    result_table: astropy.table.Table
+        One row per star, as returned by get_stellar_params_batch.
+
+    """
+    from astropy.table import Table, vstack
+
+    present = [row for row in rows if row is not None]
+    if not present:
+        return Table({"QUERY_NAME": np.array(star_names, dtype=str)})
+    blank = Table(present[0], masked=True, copy=True)
+    for column in blank.itercols():
+        column.mask[:] = True
+    result_table = vstack(
+        [blank if row is None else row for row in rows],
+        join_type="outer",
+        metadata_conflicts="silent",
+    )
+    result_table["QUERY_NAME"] = star_names
+    return result_table
+
+
+@lru_cache(maxsize=1)
+def sweet_cat_index() -> Dict[str, float]:
+    """Index of the SWEET-Cat temperatures by normalized HD number.
+
+    The catalogue is loaded once per process. Call
+    ``sweet_cat_index.cache_clear()`` to load it again.
+
+    Returns
+    -------
+    index: Dict[str, float]
+        Temperature of the first SWEET-Cat entry of each HD number, upper
+        case without spaces or the "HD" prefix (e.g. "41004B").
+
+    """
+    from PyAstronomy import pyasl
+
+    data = pyasl.SWEETCat().data
+    index = {}  # type: Dict[str, float]
+    for hd_number, teff in zip(data.hd.values, data.teff.values):
+        key = _hd_key(hd_number)
+        if key is not None:
+            index.setdefault(key, teff)
+    return index
+
+
+def _hd_key(hd_number: Any) -> Optional[str]:
+    """Normalized HD number of a SWEET-Cat entry, None if it has none."""
+    if isinstance(hd_number, (float, np.floating)):
+        if np.isnan(hd_number):
+            return None
+        if float(hd_number).is_integer():
+            hd_number = int(hd_number)
+    key = "".join(str(hd_number).split()).upper()
+    return key or None
 
 
 def get_sweet_cat_temp(star_name: str) -> Union[float, int]:
@@ -54,23 +288,20 @@ def get_sweet_cat_temp(star_name: str) -> Union[float, int]:
         Star identifier. HD number only accepted currently.
 
     """
-    sc = pyasl.SWEETCat()
-    data = sc.data
-
     if star_name[0:2].lower() != "hd":
         # only accept HD numbers atm
         raise NotImplementedError
 
     # Assuming given as hd******
     star_name = ''.join(star_name.split())
-    hd_number = star_name[2:]
+    hd_number = star_name[2:].upper()
     # print("hd number ", hd_number)
-    if hd_number in sc.data.hd.values:
-        hd_entry = data[data.hd == hd_number]
-
-        if (hd_entry.iloc[0]["teff"] != 0) and (not np.isnan(hd_entry.iloc[0]["teff"])):
+    index = sweet_cat_index()
+    if hd_number in index:
+        teff = index[hd_number]
+        if (teff != 0) and (not np.isnan(teff)):
             # Temp = 0 when doesn't exist
-            return hd_entry.iloc[0]["teff"]
+            return teff
         else:
             return 0
     else:
@@ -78,11 +309,40 @@ def get_sweet_cat_temp(star_name: str) -> Union[float, int]:
         return 0
 
 
-def get_temperature(star_name: str, star_params: Optional[Any] = None) -> float:
+def get_sweet_cat_temps(star_names: Iterable[str]) -> np.ndarray:
+    """Obtain the SWEET-Cat temperatures of many stars at once.
+
+    Parameters
+    ----------
+    star_names: iterable of str
+        Star identifiers. Only HD numbers are looked up.
+
+    Returns
+    -------
+    teffs: numpy.ndarray
+        Temperature of each star. 0 for stars that are not HD numbers,
+        not in SWEET-Cat or without a temperature.
+
+    """
+    index = sweet_cat_index()
+    teffs = []  # type: List[float]
+    for star_name in star_names:
+        star_name = "".join(star_name.split())
+        teff = (
+            index.get(star_name[2:].upper(), 0) if star_name[0:2].lower() == "hd" else 0
+        )
+        teffs.append(0 if np.isnan(teff) else teff)
+    return np.array(teffs, dtype=float)
+
+
+def get_temperature(
+    star_name: str, star_params: Optional[Any] = None, sweet_cat: bool = True
+) -> float:
     """Find temperature of the star multiple ways.
 
     1st - Try Fe_H_Teff param from SIMBAD.
     2nd - Try SWEETCat but the star might not be there (only planet hosts).
+          Skipped if sweet_cat is False.
     3rd - Calculate from B-V and interpolation.
 
     """
@@ -103,7 +363,7 @@ def get_temperature(star_name: str, star_params: Optional[Any] = None) -> float:
             print("Temperature obtained from Fe_H_Teff = {0:5.0f} K".format(good_temp))
             return teff
 
-    if not good_temp:
+    if not good_temp and sweet_cat:
         teff = get_sweet_cat_temp(star_name)
 
         if (teff == 0) or (np.isnan(teff)):  # temp from sweet-cat
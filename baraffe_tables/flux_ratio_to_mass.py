@@ -13,16 +13,25 @@ flux_ratio: float
     Flux ratio between host and companion.
 age: float
     Stellar Age. (Closest model is used)
+catalog: str
+    Local catalog of stellar parameters to use instead of SIMBAD.
+contrast_curve: str
+    Table file (CSV, FITS, ...) with a "flux_ratio" column of detection
+    limits, instead of a single flux_ratio. The mass limit of each row is
+    written as CSV to stdout or to --output.
 
 """
 
 import argparse
 import sys
-from typing import List, Optional
+from typing import Any, List, Mapping, Optional, Tuple
 
-from astropy.constants import M_jup, M_sun
-from baraffe_tables.calculations import calculate_companion_magnitude, absolute_magnitude
-from baraffe_tables.db_queries import get_stellar_params
+from baraffe_tables.calculations import (
+    calculate_companion_magnitude,
+    host_absolute_magnitude,
+)
+from baraffe_tables.contrast import mass_limits
+from baraffe_tables.providers import get_provider
 from baraffe_tables.table_search import magnitude_table_search
 
 
@@ -34,7 +43,7 @@ def _parser() -> object:
     parser = argparse.ArgumentParser(
         description='Determine mass of stellar companion from a flux ratio')
     parser.add_argument('star_name', help='Name of host star.', type=str)
-    parser.add_argument('flux_ratio', type=float,
+    parser.add_argument('flux_ratio', type=float, nargs="?",
                         help='Flux ratio between host and companion (F_companion/F_host)')
     parser.add_argument('stellar_age', help='Star age (Gyr)', type=float)
     parser.add_argument("-b", "--bands", choices=["All", "J", "H", "K"], default=["K"],
@@ -48,12 +57,26 @@ def _parser() -> object:
                         help="Print star parameters for paper.")
     parser.add_argument("--age_interp", default=False, action="store_true",
                         help="Interpolate age between tables, instead of closest age only.")
-    return parser.parse_args()
+    parser.add_argument("--catalog", default=None,
+                        help="Local CSV, FITS or Parquet catalog of stellar parameters "
+                             "to use instead of SIMBAD.")
+    parser.add_argument("--contrast_curve", default=None,
+                        help="Table file with a flux_ratio column of detection limits, "
+                             "converted to mass limits instead of a single flux_ratio.")
+    parser.add_argument("-o", "--output", default=None,
+                        help="File for the mass limits of --contrast_curve. "
+                             "Default is stdout.")
+    args = parser.parse_args()
+    if (args.flux_ratio is None) == (args.contrast_curve is None):
+        parser.error("Give either a flux_ratio or --contrast_curve.")
+    return args
 
 
-def main(star_name: str, flux_ratio: float, stellar_age: float,
+def main(star_name: str, flux_ratio: Optional[float], stellar_age: float,
          bands: Optional[List[str]] = None, model: str = "2003",
-         star_pars: bool = False, full_table: bool = False, age_interp: bool = False) -> int:
+         star_pars: bool = False, full_table: bool = False, age_interp: bool = False,
+         catalog: Optional[str] = None, contrast_curve: Optional[str] = None,
+         output: Optional[str] = None) -> int:
     """Compute companion mass from flux ratio value.
 
     Parameters
@@ -74,36 +97,57 @@ def main(star_name: str, flux_ratio: float, stellar_age: float,
         Print star parameters also.
     age_interp: bool
         Interpolate tables across age. Default=False.
+    catalog: str (optional)
+        Local catalog file of stellar parameters to use instead of SIMBAD
+        (see providers.LocalCatalogProvider).
+    contrast_curve: str (optional)
+        Table file with a "flux_ratio" column of detection limits to convert
+        to mass limits (see contrast_curve_masses) instead of flux_ratio.
+    output: str (optional)
+        File for the contrast curve mass limits. Default is stdout.
 
     """
+    from astropy.constants import M_jup, M_sun
+
     Jup_sol_mass = (M_sun / M_jup).value  # Jupiter's in 1 M_sol
 
     if (bands is None) or ("All" in bands):
         bands = ["H", "J", "K"]
 
     # Obtain Stellar parameters from astroquery
-    star_params = get_stellar_params(star_name)  # returns a astroquery result table
+    provider = get_provider(catalog)
+    star_params = provider.get_stellar_params(star_name)  # astroquery result table
 
-    for band in bands:
-        print("{0!s} band\n------".format(band))
-        mag_label = "FLUX_{0!s}".format(band)
+    if contrast_curve is not None:
+        from astropy.table import Table
 
-        # Convert stellar apparent mag to absolute magnitude.
-        apparent_mag = star_params[mag_label]
-        parallax = star_params['PLX_VALUE']
-        if parallax.unit != "mas":
-            raise ValueError("Parallax unit not correct")
-        absolute_mag = absolute_magnitude(parallax.data[0], apparent_mag.data[0])
+        curve = contrast_curve_masses(
+            star_params,
+            Table.read(contrast_curve),
+            stellar_age,
+            bands=bands,
+            model=model,
+            age_interp=age_interp,
+        )
+        if output is None:
+            curve.write(sys.stdout, format="ascii.csv")
+        else:
+            curve.write(output, overwrite=True)
+        return 0
 
-        # Calculate Absolute companion magnitude for this flux ratio
-        companion_mag = calculate_companion_magnitude(absolute_mag, flux_ratio)
+    for band in bands:
+        print("{0!s} band\n------".format(band))
+        companion_mag, companion_params = compute_companion_params(
+            star_params,
+            flux_ratio,
+            stellar_age,
+            band=band,
+            model=model,
+            age_interp=age_interp,
+        )
 
         print("Magnitude calculation for companion M{0} = {1}".format(band, companion_mag))
 
-        # Find companion parameters that match these magnitudes
-        companion_params = magnitude_table_search(companion_mag, stellar_age,
-                                                  band=band, model=model, age_interp=age_interp)
-
         # Print flux ratios using a generator
         print("Estimated Companion Mass from {0} band flux ratio".format(band.upper()))
         print("M/M_S = {0} (M_star)".format(companion_params["M/Ms"]) +
@@ -120,6 +164,110 @@ def main(star_name: str, flux_ratio: float, stellar_age: float,
     return 0
 
 
+def compute_companion_params(
+    star_params: Any,
+    flux_ratio: float,
+    stellar_age: float,
+    band: str = "K",
+    model: str = "2003",
+    age_interp: bool = False,
+) -> Tuple[float, Mapping[str, float]]:
+    """Companion magnitude and parameters for a flux ratio in one band.
+
+    Parameters
+    ----------
+    star_params: votable, dict
+        Table of the host star parameters.
+    flux_ratio: float
+        Flux ratio for the system (F_companion/F_host).
+    stellar_age: float
+        Age of star/system (Gyr).
+    band: str
+        Wavelength band of the flux ratio.
+    model: str (optional)
+       Year of Baraffe model to use [2003 (default), 2015].
+    age_interp: bool
+        Interpolate tables across age. Default=False.
+
+    Returns
+    -------
+    companion_mag: float
+        Absolute magnitude of the companion in the band.
+    companion_params: Mapping[str, float]
+        Baraffe table parameters of the companion.
+
+    """
+    # Convert stellar apparent mag to absolute magnitude.
+    absolute_mag = host_absolute_magnitude(star_params, band)
+
+    # Calculate Absolute companion magnitude for this flux ratio
+    companion_mag = calculate_companion_magnitude(absolute_mag, flux_ratio)
+
+    # Find companion parameters that match these magnitudes
+    companion_params = magnitude_table_search(
+        companion_mag, stellar_age, band=band, model=model, age_interp=age_interp
+    )
+    return companion_mag, companion_params
+
+
+def contrast_curve_masses(
+    star_params: Any,
+    curve: Any,
+    stellar_age: float,
+    bands: Optional[List[str]] = None,
+    model: str = "2003",
+    age_interp: bool = False,
+) -> Any:
+    """Mass limits of every detection limit of a contrast curve.
+
+    Parameters
+    ----------
+    star_params: votable, dict
+        Table of the host star parameters.
+    curve: astropy.table.Table
+        Contrast curve with a "flux_ratio" column (F_companion/F_host).
+    stellar_age: float
+        Age of star/system (Gyr).
+    bands: list of str
+        Wavelength bands of the flux ratios. Default (or "All") is H, J and K.
+    model: str (optional)
+       Year of Baraffe model to use [2003 (default), 2015].
+    age_interp: bool
+        Interpolate tables across age. Default=False.
+
+    Returns
+    -------
+    curve: astropy.table.Table
+        Copy of the contrast curve with, for each band, the mass limit in
+        Jupiter masses ("mass_{band}") and the masks of the limits below the
+        lowest and above the highest mass of the table ("below_{band}",
+        "above_{band}"), see contrast.mass_limits.
+
+    """
+    from astropy.constants import M_jup, M_sun
+
+    Jup_sol_mass = (M_sun / M_jup).value  # Jupiter's in 1 M_sol
+
+    if (bands is None) or ("All" in bands):
+        bands = ["H", "J", "K"]
+    if "flux_ratio" not in curve.colnames:
+        raise ValueError("Contrast curve has no flux_ratio column.")
+    curve = curve.copy()
+    for band in bands:
+        masses, below, above = mass_limits(
+            curve["flux_ratio"],
+            host_absolute_magnitude(star_params, band),
+            stellar_age,
+            band=band,
+            model=model,
+            age_interp=age_interp,
+        )
+        curve["mass_{}".format(band)] = Jup_sol_mass * masses
+        curve["below_{}".format(band)] = below
+        curve["above_{}".format(band)] = above
+    return curve
+
+
 if __name__ == '__main__':
     args = vars(_parser())
     opts = {k: args[k] for k in args}
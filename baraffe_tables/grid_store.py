@@ -0,0 +1,242 @@
+"""Compiled binary store of the Baraffe model tables.
+
+Parsing the ASCII tables is much slower than the table searches themselves.
+The combined isochrone file of each model (``*-all.dat``) is therefore
+converted once into a single ``.npz`` artifact holding every age table, the
+column names, the ages and a checksum of the source ``.dat`` file. The
+artifact is rebuilt automatically when the source files change.
+
+The artifacts are written to the directory given by the environment variable
+``BARAFFE_TABLES_CACHE`` (default ``~/.cache/baraffe_tables``). They can be
+built ahead of time with::
+
+    python -m baraffe_tables.grid_store
+
+"""
+import hashlib
+import os
+import re
+import tempfile
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from importlib.resources import files as _package_files
+except ImportError:  # Python < 3.9
+    _package_files = None
+
+STORE_VERSION = 3
+
+# Combined isochrone file of each model, holding the tables of every age.
+model_sources = {
+    "2003": "data/Baraffe2003/BaraffeCOND2003-all.dat",
+    "2015": "data/Baraffe2015/BaraffeBHAC15-all.dat",
+}
+
+_age_pattern = re.compile(r"t \(Gyr\)\s*=\s*([0-9.]+)")
+
+
+def normalize_model(model: str) -> str:
+    """Return the four digit model year for the model options [03, 15, 2003, 2015]."""
+    if not isinstance(model, str):
+        raise ValueError("Model is not the valid type 'str'.")
+    elif model not in ["2003", "03", "2015", "15"]:
+        raise ValueError("Model value '{}' is not valid".format(model))
+    return "2003" if model in "2003" else "2015"
+
+
+def store_directory() -> str:
+    """Directory where the compiled grid artifacts are kept."""
+    default = os.path.join(os.path.expanduser("~"), ".cache", "baraffe_tables")
+    return os.environ.get("BARAFFE_TABLES_CACHE", default)
+
+
+def store_path(model: str, directory: Optional[str] = None) -> str:
+    """Path of the compiled grid artifact of a model."""
+    model = normalize_model(model)
+    directory = store_directory() if directory is None else directory
+    return os.path.join(directory, "baraffe{0}_v{1}.npz".format(model, STORE_VERSION))
+
+
+def source_files(model: str) -> List[str]:
+    """List the source table files of a model."""
+    return [_package_filename(model_sources[normalize_model(model)])]
+
+
+def _package_filename(name: str) -> str:
+    """Path of a data file installed with the package."""
+    if _package_files is None:
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    return str(_package_files("baraffe_tables").joinpath(name))
+
+
+def source_checksum(files: List[str]) -> str:
+    """SHA-256 checksum of the names and contents of the source files."""
+    sha = hashlib.sha256()
+    for name in files:
+        sha.update(os.path.basename(name).encode("utf-8"))
+        with open(name, "rb") as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def parse_isochrones(filename: str) -> Tuple[List[str], List[str], List[np.ndarray]]:
+    """Parse a Baraffe isochrone file holding one or more age tables.
+
+    Each table starts with a "t (Gyr) = age" line, followed by the column
+    header and the rows of the table. Other lines are ignored.
+
+    Returns
+    -------
+    age_labels: list of str
+        The ages as written in the file.
+    columns: list of str
+        The column names.
+    tables: list of numpy.ndarray
+        The (row, column) table of each age.
+
+    """
+    age_labels = []  # type: List[str]
+    columns = []  # type: List[str]
+    rows = []  # type: List[List[List[float]]]
+    with open(filename) as f:
+        for line in f:
+            match = _age_pattern.search(line)
+            if match is not None:
+                age_labels.append(match.group(1))
+                rows.append([])
+                continue
+            values = line.replace("!", " ").split()
+            if not values:
+                continue
+            elif values[0] == "M/Ms":
+                columns = values
+            elif rows and values[0][0].isdigit():
+                if len(values) != len(columns):
+                    raise ValueError(
+                        "Row '{0}' in {1} does not match columns {2}".format(
+                            line.strip(), filename, columns
+                        )
+                    )
+                rows[-1].append([float(value) for value in values])
+    if not age_labels:
+        raise ValueError("No age tables found in {}".format(filename))
+    tables = [np.array(table, dtype=float).reshape(-1, len(columns)) for table in rows]
+    return age_labels, columns, tables
+
+
+def parse_tables(model: str) -> Dict[str, np.ndarray]:
+    """Parse the ASCII tables of a model into the arrays of the grid store.
+
+    The tables are aligned on the union of their masses. Cells of masses
+    missing from a table are NaN and False in the "valid" mask.
+
+    Returns
+    -------
+    arrays: dict
+        "ages" (float), "age_labels" (str), "columns" (str), "masses" (float),
+        "valid" (bool of shape (age, mass)), "data" (float of shape
+        (age, mass, column)) and "checksum".
+
+    """
+    files = source_files(model)
+    checksum = source_checksum(files)
+    labels, columns, tables = parse_isochrones(files[0])
+
+    order = np.argsort([float(label) for label in labels], kind="stable")
+    labels = [labels[i] for i in order]
+    tables = [tables[i] for i in order]
+
+    mass_index = columns.index("M/Ms")
+    masses = np.unique(np.concatenate([table[:, mass_index] for table in tables]))
+    data = np.full((len(tables), len(masses), len(columns)), np.nan)
+    valid = np.zeros((len(tables), len(masses)), dtype=bool)
+    for i, table in enumerate(tables):
+        rows = np.searchsorted(masses, table[:, mass_index])
+        data[i, rows] = table
+        valid[i, rows] = True
+
+    return {
+        "ages": np.array(labels, dtype=float),
+        "age_labels": np.array(labels),
+        "columns": np.array(columns),
+        "masses": masses,
+        "valid": valid,
+        "data": data,
+        "checksum": np.array(checksum),
+    }
+
+
+def build_grid_store(model: str, directory: Optional[str] = None) -> str:
+    """Compile the tables of a model into the binary grid artifact.
+
+    The file is written atomically so concurrent processes never read a
+    partially written artifact.
+
+    Returns
+    -------
+    path: str
+        Path of the written artifact.
+
+    """
+    path = store_path(model, directory)
+    arrays = parse_tables(model)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(suffix=".npz", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.remove(tmp_name)
+        raise
+    return path
+
+
+def load_grid_store(
+    model: str, directory: Optional[str] = None
+) -> Dict[str, np.ndarray]:
+    """Load the binary grid of a model, (re)building it if needed.
+
+    The artifact is rebuilt when it is missing, unreadable or its checksum
+    does not match the current source files. If the store directory is not
+    writable the tables are parsed in memory instead.
+
+    """
+    model = normalize_model(model)
+    path = store_path(model, directory)
+    checksum = source_checksum(source_files(model))
+
+    arrays = _read_artifact(path)
+    if arrays is None or str(arrays.get("checksum")) != checksum:
+        try:
+            build_grid_store(model, directory)
+        except OSError:
+            return parse_tables(model)
+        arrays = _read_artifact(path)
+        if arrays is None:
+            return parse_tables(model)
+    return arrays
+
+
+def _read_artifact(path: str) -> Optional[Dict[str, np.ndarray]]:
+    """Read all arrays from an artifact, None if it is missing or corrupt."""
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            return {key: npz[key] for key in npz.files}
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+
+
+def main(directory: Optional[str] = None) -> Tuple[str, ...]:
+    """Build the grid artifacts for all models."""
+    paths = tuple(build_grid_store(model, directory) for model in model_sources)
+    for path in paths:
+        print("Built {}".format(path))
+    return paths
+
+
+if __name__ == "__main__":
+    main()
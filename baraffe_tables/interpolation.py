@@ -0,0 +1,399 @@
+"""Interpolation kernels for the model tables and the model grids.
+
+The bracketing rows and weights of a query are found once and then applied
+to every column of a table at once. For interpolation in age the two tables
+bounding the age are row aligned, so a query point is a bilinear combination
+of four grid rows and no interpolated table needs to be built.
+"""
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+
+def interpolation_weights(
+    x_data: ArrayLike, values: ArrayLike
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Find the bracketing rows and interpolation weights of values in a column.
+
+    The reference column must be monotonic, either increasing or decreasing.
+    Values beyond the ends of the column are clamped to the first or last
+    row (like numpy.interp) and flagged.
+
+    Parameters
+    ----------
+    x_data: array_like
+        Monotonic reference column.
+    values: array_like
+        Values to locate in the reference column.
+
+    Returns
+    -------
+    index: numpy.ndarray
+        Index of the first row of the bracketing pair of rows.
+    weight: numpy.ndarray
+        Weight in [0, 1] of the second row of the pair.
+    below: numpy.ndarray
+        True where the value is beyond the first row of the column.
+    above: numpy.ndarray
+        True where the value is beyond the last row of the column.
+
+    """
+    x_data = np.asarray(x_data, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if len(x_data) < 2:
+        raise ValueError("Need at least two rows to interpolate.")
+    if x_data[-1] < x_data[0]:
+        # Search the negated column of decreasing data.
+        x_data, values = -x_data, -values
+
+    index = np.clip(
+        np.searchsorted(x_data, values, side="right") - 1, 0, len(x_data) - 2
+    )
+    x_lower, x_upper = x_data[index], x_data[index + 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight = np.where(
+            x_upper > x_lower, (values - x_lower) / (x_upper - x_lower), 0.0
+        )
+    below = values < x_data[0]
+    above = values > x_data[-1]
+    return index, np.clip(weight, 0.0, 1.0), below, above
+
+
+def apply_interpolation_weights(
+    table: np.ndarray, index: np.ndarray, weight: np.ndarray
+) -> np.ndarray:
+    """Interpolate all columns of a (row, column) table at once.
+
+    Uses the bracketing rows and weights from interpolation_weights. Rows
+    are returned exactly when the weight is 0 or 1.
+    """
+    weight = np.asarray(weight)[..., None]
+    lower, upper = table[index], table[index + 1]
+    return np.where(weight == 1, upper, lower + weight * (upper - lower))
+
+
+def row_interpolation_weights(
+    x_rows: np.ndarray, values: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """interpolation_weights for a different reference column per value.
+
+    Parameters
+    ----------
+    x_rows: numpy.ndarray
+        Array of shape (value, row), a monotonic reference column per value.
+    values: numpy.ndarray
+        Values to locate, one per reference column.
+
+    Returns
+    -------
+    index, weight, below, above: numpy.ndarray
+        As for interpolation_weights.
+
+    """
+    n_values, n_rows = x_rows.shape
+    if n_rows < 2:
+        raise ValueError("Need at least two rows to interpolate.")
+    sign = np.where(x_rows[:, -1] < x_rows[:, 0], -1.0, 1.0)
+    x_rows = x_rows * sign[:, None]
+    values = values * sign
+
+    index = np.clip(np.sum(x_rows <= values[:, None], axis=1) - 1, 0, n_rows - 2)
+    positions = np.arange(n_values)
+    x_lower, x_upper = x_rows[positions, index], x_rows[positions, index + 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight = np.where(
+            x_upper > x_lower, (values - x_lower) / (x_upper - x_lower), 0.0
+        )
+    below = values < x_rows[:, 0]
+    above = values > x_rows[:, -1]
+    return index, np.clip(weight, 0.0, 1.0), below, above
+
+
+def row_crossing_weights(
+    x_rows: np.ndarray, values: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """row_interpolation_weights for reference columns that may not be monotonic.
+
+    Each value is located between the first two neighbouring rows (in row
+    order) that bracket it. Values not bracketed by any rows are clamped as
+    by row_interpolation_weights.
+
+    Returns
+    -------
+    index, weight, below, above: numpy.ndarray
+        As for interpolation_weights.
+    n_solutions: numpy.ndarray
+        Number of distinct row positions matching each value.
+
+    """
+    clamp_index, clamp_weight, below, above = row_interpolation_weights(x_rows, values)
+    values = values[:, None]
+    crossing = (x_rows[:, :-1] - values) * (x_rows[:, 1:] - values) <= 0
+    found = np.any(crossing, axis=1)
+    # A value equal to a row is bracketed by the pairs on both sides of it.
+    n_solutions = crossing.sum(axis=1) - (x_rows[:, 1:-1] == values).sum(axis=1)
+
+    index = np.argmax(crossing, axis=1)
+    positions = np.arange(len(x_rows))
+    x_lower, x_upper = x_rows[positions, index], x_rows[positions, index + 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight = np.where(
+            x_upper != x_lower, (values[:, 0] - x_lower) / (x_upper - x_lower), 0.0
+        )
+    index = np.where(found, index, clamp_index)
+    weight = np.where(found, np.clip(weight, 0.0, 1.0), clamp_weight)
+    return index, weight, below & ~found, above & ~found, n_solutions
+
+
+def age_interpolation_weights(grid, ages: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Index of the younger bounding table and the age weight of each age.
+
+    The ages must lie strictly inside the grid age range.
+    """
+    lower = np.searchsorted(grid.ages, ages) - 1
+    weight = (ages - grid.ages[lower]) / (grid.ages[lower + 1] - grid.ages[lower])
+    return lower, weight
+
+
+def interpolate_age_table(grid, age: float) -> np.ndarray:
+    """Row aligned (row, column) table of the grid interpolated to age."""
+    lower_index, weight = age_interpolation_weights(grid, np.array([age]))
+    lower, upper = grid.aligned_pair(lower_index[0])
+    return lower + weight[0] * (upper - lower)
+
+
+def age_mass_interpolation(
+    grid,
+    ref_index: int,
+    values: np.ndarray,
+    ages: np.ndarray,
+    return_solutions: bool = False,
+) -> Tuple[np.ndarray, ...]:
+    """Bilinear interpolation of every grid column in age and reference column.
+
+    For each query only the reference column is interpolated to the age, to
+    find the bracketing rows. The result is then the combination of those two
+    rows in the two tables bounding the age. Where the reference column is
+    not monotonic the lowest mass solution is used.
+
+    Parameters
+    ----------
+    grid: ModelGrid
+        Model grid to interpolate.
+    ref_index: int
+        Index of the reference column.
+    values: numpy.ndarray
+        Values of the reference column.
+    ages: numpy.ndarray
+        Ages of the queries, strictly inside the grid age range.
+
+    Returns
+    -------
+    results: numpy.ndarray
+        Array of shape (value, column).
+    below, above: numpy.ndarray
+        Masks of the values beyond the first and last rows.
+    n_solutions: numpy.ndarray
+        Number of solutions of each value, only if return_solutions is True.
+
+    """
+    values = np.asarray(values, dtype=float)
+    ages = np.asarray(ages, dtype=float)
+    lower_index, age_weight = age_interpolation_weights(grid, ages)
+    column = grid.columns[ref_index]
+
+    results = np.empty((len(values), len(grid.columns)))
+    below = np.zeros(len(values), dtype=bool)
+    above = np.zeros(len(values), dtype=bool)
+    n_solutions = np.ones(len(values), dtype=int)
+    for pair in np.unique(lower_index):
+        queries = lower_index == pair
+        lower, upper = grid.aligned_pair(pair)
+        step = upper - lower
+        weight = age_weight[queries, None]
+
+        x_rows = lower[:, ref_index] + weight * step[:, ref_index]
+        if grid.pair_is_monotonic(pair, column):
+            index, row_weight, below[queries], above[queries] = (
+                row_interpolation_weights(x_rows, values[queries])
+            )
+            n_solutions[queries] = ~(below[queries] | above[queries])
+        else:
+            (
+                index,
+                row_weight,
+                below[queries],
+                above[queries],
+                n_solutions[queries],
+            ) = row_crossing_weights(x_rows, values[queries])
+        first = lower[index] + weight * step[index]
+        second = lower[index + 1] + weight * step[index + 1]
+        row_weight = row_weight[:, None]
+        results[queries] = np.where(
+            row_weight == 1, second, first + row_weight * (second - first)
+        )
+    if return_solutions:
+        return results, below, above, n_solutions
+    return results, below, above
+
+
+def monotonic_segments(x_data: ArrayLike) -> np.ndarray:
+    """Split a column into its monotonic segments.
+
+    Neighbouring segments share their turning point row. Runs of equal
+    values form segments of their own.
+
+    Returns
+    -------
+    segments: numpy.ndarray
+        Array of shape (segment, 2) with the first and last row of each
+        segment.
+
+    """
+    x_data = np.asarray(x_data, dtype=float)
+    direction = np.sign(np.diff(x_data))
+    turns = np.flatnonzero(direction[1:] != direction[:-1]) + 1
+    starts = np.concatenate(([0], turns))
+    stops = np.concatenate((turns, [len(x_data) - 1]))
+    return np.column_stack((starts, stops))
+
+
+def segment_interpolation_weights(
+    x_data: ArrayLike, values: ArrayLike, segments: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """interpolation_weights for a column that may not be monotonic.
+
+    Each value is located in the first monotonic segment (in row order)
+    that contains it. Values not contained in any segment are clamped like
+    interpolation_weights does for the whole column.
+
+    Parameters
+    ----------
+    x_data: array_like
+        Reference column.
+    values: array_like
+        Values to locate in the reference column.
+    segments: numpy.ndarray
+        Monotonic segments of x_data, from monotonic_segments.
+
+    Returns
+    -------
+    index, weight, below, above: numpy.ndarray
+        As for interpolation_weights.
+    n_solutions: numpy.ndarray
+        Number of distinct rows positions matching each value.
+
+    """
+    x_data = np.asarray(x_data, dtype=float)
+    values = np.asarray(values, dtype=float)
+    index, weight, below, above = interpolation_weights(x_data, values)
+    if len(segments) == 1:
+        return index, weight, below, above, (~(below | above)).astype(int)
+
+    index, weight = np.array(index), np.array(weight)
+    found = np.zeros(values.shape, dtype=bool)
+    n_solutions = np.zeros(values.shape, dtype=int)
+    for i, (start, stop) in enumerate(segments):
+        segment = x_data[start : stop + 1]
+        inside = (values >= segment.min()) & (values <= segment.max())
+        if i > 0:
+            # The first row is the last row of the previous segment.
+            inside &= values != segment[0]
+        first = inside & ~found
+        if np.any(first):
+            seg_index, seg_weight, __, __ = interpolation_weights(
+                segment, values[first]
+            )
+            index[first] = seg_index + start
+            weight[first] = seg_weight
+        found |= inside
+        n_solutions += inside
+    return index, weight, below & ~found, above & ~found, n_solutions
+
+
+def inverse_interpolation(
+    x_data: ArrayLike, value: float, segments: np.ndarray
+) -> List[Tuple[int, float]]:
+    """Find every row position where a column takes a value.
+
+    Parameters
+    ----------
+    x_data: array_like
+        Reference column.
+    value: float
+        Value to find.
+    segments: numpy.ndarray
+        Monotonic segments of x_data, from monotonic_segments.
+
+    Returns
+    -------
+    solutions: list of (int, float)
+        The (index, weight) of each solution, in row order.
+
+    """
+    x_data = np.asarray(x_data, dtype=float)
+    solutions = []  # type: List[Tuple[int, float]]
+    for i, (start, stop) in enumerate(segments):
+        segment = x_data[start : stop + 1]
+        if not segment.min() <= value <= segment.max():
+            continue
+        if i > 0 and value == segment[0]:
+            continue  # Found as the last row of the previous segment.
+        index, weight, __, __ = interpolation_weights(segment, value)
+        solutions.append((int(index) + start, float(weight)))
+    return solutions
+
+
+def monotone_envelope(y_data: ArrayLike) -> np.ndarray:
+    """Largest value of each row and every row after it.
+
+    For a magnitude column ordered by increasing mass this is the faintest
+    magnitude of any companion at least as massive, which never increases.
+    """
+    y_data = np.asarray(y_data, dtype=float)
+    return np.maximum.accumulate(y_data[::-1])[::-1]
+
+
+def envelope_inverse(
+    x_data: ArrayLike, envelope: ArrayLike, values: ArrayLike
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Lowest x where a non-increasing envelope reaches each value.
+
+    Parameters
+    ----------
+    x_data: array_like
+        Increasing reference column, e.g. mass.
+    envelope: array_like
+        Non-increasing column from monotone_envelope.
+    values: array_like
+        Values to invert. NaN values give NaN.
+
+    Returns
+    -------
+    x: numpy.ndarray
+        Interpolated x of each value, NaN beyond the envelope.
+    below: numpy.ndarray
+        True for values beyond the first row of the envelope, reached by
+        every row.
+    above: numpy.ndarray
+        True for values the envelope never reaches.
+
+    """
+    x_data = np.asarray(x_data, dtype=float)
+    envelope = np.asarray(envelope, dtype=float)
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+
+    # First row at or below each value, by binary search of the increasing -envelope.
+    index = np.searchsorted(-envelope, -np.where(valid, values, 0), side="left")
+    below = valid & (values > envelope[0])
+    above = valid & (index == len(envelope))
+    upper = np.clip(index, 1, len(envelope) - 1)
+    lower = upper - 1
+    step = envelope[upper] - envelope[lower]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight = np.where(step != 0, (values - envelope[lower]) / step, 1.0)
+    x = x_data[lower] + weight * (x_data[upper] - x_data[lower])
+    return np.where(valid & ~below & ~above, x, np.nan), below, above
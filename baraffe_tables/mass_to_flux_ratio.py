@@ -31,23 +31,25 @@ noise: bool
     Calculate Noise ratios.
 age_interp: bool
     Interpolate tables across age. Default=False.
+catalog: str
+    Local catalog of stellar parameters to use instead of SIMBAD.
 
 """
 
 import argparse
 import logging
 import sys
-from typing import List, Optional
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 import numpy as np
-from astropy.constants import M_jup, M_sun
 
 from baraffe_tables.calculations import (
     absolute_magnitude,
     calculate_stellar_radius,
     flux_mag_ratio,
+    host_absolute_magnitude,
 )
-from baraffe_tables.db_queries import get_stellar_params
+from baraffe_tables.providers import get_provider
 from baraffe_tables.table_search import mass_table_search
 
 
@@ -109,6 +111,12 @@ def _parser() -> object:
         action="store_true",
         help="Interpolate age between tables, instead of closest age only.",
     )
+    parser.add_argument(
+        "--catalog",
+        default=None,
+        help="Local CSV, FITS or Parquet catalog of stellar parameters to use "
+        "instead of SIMBAD.",
+    )
     return parser.parse_args()
 
 
@@ -123,6 +131,7 @@ def main(
     star_pars: bool = False,
     noise: bool = False,
     age_interp: bool = False,
+    catalog: Optional[str] = None,
 ) -> int:
     """Compute flux/contrast ratio between a stellar host and companion.
 
@@ -148,48 +157,24 @@ def main(
         Calculate Noise ratios.
     age_interp: bool
         Interpolate tables across age. Default=False.
+    catalog: str (optional)
+        Local catalog file of stellar parameters to use instead of SIMBAD
+        (see providers.LocalCatalogProvider).
 
     """
-    if (bands is None) or ("All" in bands):
-        bands = ["J", "H", "K"]
-
     # Obtain Stellar parameters from astroquery
-    star_params = get_stellar_params(star_name)  # returns a astroquery result table
-
-    companion_mass_solar = (
-        companion_mass * (M_jup / M_sun).value
-    )  # transform to solar mass for table search
-
-    # Get parameters for this mass and age
-    companion_params = mass_table_search(
-        companion_mass_solar, stellar_age, model=model, age_interp=age_interp
+    provider = get_provider(catalog)
+    star_params = provider.get_stellar_params(star_name)  # astroquery result table
+
+    flux_ratios, companion_params = compute_flux_ratios(
+        star_params,
+        companion_mass,
+        stellar_age,
+        bands=bands,
+        model=model,
+        age_interp=age_interp,
     )
 
-    # flux_ratios = calculate_flux_ratio(star_params, companion_params, bands)
-    # print("old ratios", flux_ratios)
-
-    flux_ratios = {}
-    for band in bands:
-        try:
-            mag_label = "FLUX_{0!s}".format(band)
-            companion_mag_label = "M{0!s}".format(band.lower())
-
-            # Convert stellar apparent mag to absolute magnitudes.
-            apparent_mag = star_params[mag_label]
-            parallax = star_params["PLX_VALUE"]
-            if parallax.unit != "mas":
-                raise ValueError("Parallax unit not correct")
-            absolute_mag = absolute_magnitude(parallax.data[0], apparent_mag.data[0])
-
-            # Model magnitudes are absolute
-            companion_mag = companion_params[companion_mag_label]
-
-            flux_ratio = flux_mag_ratio(absolute_mag, companion_mag)
-
-            flux_ratios.update({band: flux_ratio})
-        except:
-            logging.warning("Unable to calculate flux ratio for {} band".format(band))
-
     print("\nFlux ratios:")
     for band, value in flux_ratios.items():
         print(
@@ -213,7 +198,9 @@ def main(
 
     if area_ratio:
         # Compare to area ratio
-        Rstar = calculate_stellar_radius(star_params)
+        Rstar = calculate_stellar_radius(
+            star_params, teff=provider.get_temperature(star_name, star_params)
+        )
         print(Rstar)
         Rcomp_Rstar = companion_params["R"] / Rstar
 
@@ -251,6 +238,72 @@ def main(
     return 0
 
 
+def compute_flux_ratios(
+    star_params: Any,
+    companion_mass: float,
+    stellar_age: float,
+    bands: Optional[List[str]] = None,
+    model: str = "2003",
+    age_interp: bool = False,
+) -> Tuple[Dict[str, float], Mapping[str, float]]:
+    """Flux ratios between a host and a companion of a given mass.
+
+    Parameters
+    ----------
+    star_params: votable, dict
+        Table of the host star parameters.
+    companion_mass: float
+        Mass of companion in Jupiter masses.
+    stellar_age: float
+        Stellar Age. Closest model is used unless age_interp=True.
+    bands: list of str
+        Spectral bands to obtain ratio. Default (or "All") is J, H and K.
+    model: str (optional)
+        Year of Baraffe model to use [2003 (default), 2015].
+    age_interp: bool
+        Interpolate tables across age. Default=False.
+
+    Returns
+    -------
+    flux_ratios: Dict[str, float]
+        Host/companion flux ratio of each band it could be calculated for.
+    companion_params: Mapping[str, float]
+        Baraffe table parameters of the companion.
+
+    """
+    from astropy.constants import M_jup, M_sun
+
+    if (bands is None) or ("All" in bands):
+        bands = ["J", "H", "K"]
+
+    companion_mass_solar = (
+        companion_mass * (M_jup / M_sun).value
+    )  # transform to solar mass for table search
+
+    # Get parameters for this mass and age
+    companion_params = mass_table_search(
+        companion_mass_solar, stellar_age, model=model, age_interp=age_interp
+    )
+
+    flux_ratios = {}
+    for band in bands:
+        try:
+            companion_mag_label = "M{0!s}".format(band.lower())
+
+            # Convert stellar apparent mag to absolute magnitudes.
+            absolute_mag = host_absolute_magnitude(star_params, band)
+
+            # Model magnitudes are absolute
+            companion_mag = companion_params[companion_mag_label]
+
+            flux_ratio = flux_mag_ratio(absolute_mag, companion_mag)
+
+            flux_ratios.update({band: flux_ratio})
+        except:
+            logging.warning("Unable to calculate flux ratio for {} band".format(band))
+    return flux_ratios, companion_params
+
+
 if __name__ == "__main__":
     args = vars(_parser())
     opts = {k: args[k] for k in args}
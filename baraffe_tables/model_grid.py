@@ -0,0 +1,292 @@
+"""Dense in-memory grid of a Baraffe model.
+
+A ModelGrid holds every age table of a model in a single contiguous array
+indexed by (age, mass row, column), together with the sorted float age axis
+and a column name to index map. It is loaded once per process from the
+compiled grid store so the table searches never need to touch the disk again.
+
+The tables cover different mass ranges, so the rows are aligned on the union
+of all masses and a validity mask marks the (age, mass) cells a table has.
+Interpolating between two ages is then index arithmetic over the rows both
+tables cover.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from baraffe_tables.grid_store import load_grid_store, normalize_model
+from baraffe_tables.interpolation import (
+    ArrayLike,
+    monotone_envelope,
+    monotonic_segments,
+)
+
+
+class ModelGrid:
+    """All age tables of one Baraffe model.
+
+    Parameters
+    ----------
+    model: str
+        Baraffe model year, "2003" or "2015".
+    ages: numpy.ndarray
+        Ages of the tables (Gyr), sorted increasing.
+    columns: list of str
+        Column names of the tables. Must include "M/Ms".
+    data: numpy.ndarray
+        Array of shape (age, mass, column), rows aligned on mass.
+    valid: numpy.ndarray
+        Boolean array of shape (age, mass). True for the cells present in the
+        table of that age. The cells of each age must be contiguous in mass.
+    age_labels: list of str, optional
+        Ages as written in the source tables.
+
+    """
+
+    def __init__(
+        self,
+        model: str,
+        ages: np.ndarray,
+        columns: List[str],
+        data: np.ndarray,
+        valid: np.ndarray,
+        age_labels: Optional[List[str]] = None,
+    ) -> None:
+        self.model = normalize_model(model)
+        self.ages = _read_only(np.array(ages, dtype=float))
+        if np.any(np.diff(self.ages) <= 0):
+            raise ValueError("Model grid ages must be strictly increasing.")
+        self.columns = [str(col) for col in columns]
+        self.column_index = {col: i for i, col in enumerate(self.columns)}
+        self.data = _read_only(np.ascontiguousarray(data, dtype=float))
+        self.valid = _read_only(np.ascontiguousarray(valid, dtype=bool))
+        if age_labels is None:
+            age_labels = ["{0:.4f}".format(age) for age in self.ages]
+        self.age_labels = [str(label) for label in age_labels]
+
+        if self.data.shape != (len(self.ages), self.data.shape[1], len(self.columns)):
+            raise ValueError(
+                "Grid data shape {0} does not match {1} ages and {2} columns.".format(
+                    self.data.shape, len(self.ages), len(self.columns)
+                )
+            )
+        if self.valid.shape != self.data.shape[:2]:
+            raise ValueError("Grid valid mask does not match the (age, mass) shape.")
+
+        # Contiguous mass rows [start, stop) of each table.
+        self.row_starts = _read_only(np.argmax(self.valid, axis=1))
+        self.row_stops = _read_only(
+            self.valid.shape[1] - np.argmax(self.valid[:, ::-1], axis=1)
+        )
+        self.n_rows = _read_only(self.row_stops - self.row_starts)
+        if np.any(self.valid.sum(axis=1) != self.n_rows) or np.any(self.n_rows < 2):
+            raise ValueError("Each table must cover a contiguous range of masses.")
+
+        # Rows covered by both tables of each pair of neighbouring ages.
+        self.pair_starts = _read_only(
+            np.maximum(self.row_starts[:-1], self.row_starts[1:])
+        )
+        self.pair_stops = _read_only(
+            np.minimum(self.row_stops[:-1], self.row_stops[1:])
+        )
+        if np.any(self.pair_stops - self.pair_starts < 2):
+            raise ValueError("Neighbouring tables must share at least two masses.")
+
+        mass_data = np.where(
+            self.valid, self.data[:, :, self.column_index["M/Ms"]], np.nan
+        )
+        self.masses = _read_only(np.nanmax(mass_data, axis=0))
+
+        # Monotonic segments of each (age, column), computed on first use.
+        self._segments = {}  # type: Dict[Tuple[int, str], np.ndarray]
+        self._pair_monotonic = {}  # type: Dict[Tuple[int, str], bool]
+        # Monotone envelopes of each (age, column), computed on first use.
+        self._envelopes = {}  # type: Dict[Tuple[int, str], np.ndarray]
+
+    @classmethod
+    def from_store(cls, model: str, directory: Optional[str] = None) -> "ModelGrid":
+        """Load the grid of a model from the compiled grid store."""
+        store = load_grid_store(model, directory)
+        return cls(
+            model,
+            store["ages"],
+            list(store["columns"]),
+            store["data"],
+            store["valid"],
+            age_labels=list(store["age_labels"]),
+        )
+
+    def __repr__(self) -> str:
+        return "ModelGrid(model={0!r}, ages={1}, masses={2}, columns={3})".format(
+            self.model, len(self.ages), len(self.masses), len(self.columns)
+        )
+
+    def age_index(self, age: float) -> int:
+        """Index of the table with exactly this age."""
+        index = np.flatnonzero(self.ages == float(age))
+        if len(index) == 0:
+            raise ValueError(
+                "No {0} model table for age {1} Gyr".format(self.model, age)
+            )
+        return int(index[0])
+
+    def closest_age_index(self, age: float) -> int:
+        """Index of the table closest in age. The younger wins ties."""
+        return int(self.closest_age_indices(age))
+
+    def closest_age_indices(self, ages: ArrayLike) -> np.ndarray:
+        """Index of the table closest in age to each age. The younger wins ties."""
+        ages = np.asarray(ages, dtype=float)
+        upper = np.clip(np.searchsorted(self.ages, ages), 1, len(self.ages) - 1)
+        lower = upper - 1
+        return np.where(
+            ages - self.ages[lower] <= self.ages[upper] - ages, lower, upper
+        )
+
+    def between_tables(self, ages: ArrayLike) -> np.ndarray:
+        """True for ages inside the grid age range without a table of their own."""
+        ages = np.asarray(ages, dtype=float)
+        return (
+            (self.ages[0] < ages) & (ages < self.ages[-1]) & ~np.isin(ages, self.ages)
+        )
+
+    def mass_range(
+        self, ages: ArrayLike, age_interp: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Lowest and highest mass searched by the table searches at each age.
+
+        That is the mass range of the table closest in age or, with
+        age_interp, of the aligned pair of tables bounding the ages between
+        tables.
+        """
+        ages = np.asarray(ages, dtype=float)
+        closest = self.closest_age_indices(ages)
+        starts = self.row_starts[closest]
+        stops = self.row_stops[closest]
+        if age_interp:
+            between = self.between_tables(ages)
+            lower = np.clip(np.searchsorted(self.ages, ages), 1, len(self.ages) - 1) - 1
+            starts = np.where(between, self.pair_starts[lower], starts)
+            stops = np.where(between, self.pair_stops[lower], stops)
+        return self.masses[starts], self.masses[stops - 1]
+
+    def bounding_age_indices(self, age: float) -> Tuple[int, int]:
+        """Indices of the two tables bounding age, (lower, upper).
+
+        Only valid for ages inside the grid age range.
+        """
+        upper = int(np.searchsorted(self.ages, age))
+        return upper - 1, upper
+
+    def table(self, index: int) -> np.ndarray:
+        """Read-only (row, column) view of a single age table."""
+        return self.data[index, self.row_starts[index] : self.row_stops[index]]
+
+    def aligned_pair(self, lower_index: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Row aligned (row, column) tables of an age and the next older age.
+
+        Only the masses present in both tables are included.
+        """
+        rows = slice(self.pair_starts[lower_index], self.pair_stops[lower_index])
+        return self.data[lower_index, rows], self.data[lower_index + 1, rows]
+
+    def segments(self, index: int, column: str) -> np.ndarray:
+        """Monotonic segments of a column in a single age table.
+
+        Returns
+        -------
+        segments: numpy.ndarray
+            Read-only array of shape (segment, 2) with the first and last
+            table row of each segment. Neighbouring segments share a row.
+
+        """
+        key = (int(index), column)
+        segments = self._segments.get(key)
+        if segments is None:
+            table = self.table(index)
+            segments = _read_only(
+                monotonic_segments(table[:, self.column_index[column]])
+            )
+            self._segments[key] = segments
+        return segments
+
+    def is_monotonic(self, index: int, column: str) -> bool:
+        """True if the column of a single age table is monotonic."""
+        return len(self.segments(index, column)) == 1
+
+    def pair_is_monotonic(self, lower_index: int, column: str) -> bool:
+        """True if the column is monotonic over the aligned pair of lower_index."""
+        key = (int(lower_index), column)
+        monotonic = self._pair_monotonic.get(key)
+        if monotonic is None:
+            col = self.column_index[column]
+            monotonic = all(
+                len(monotonic_segments(table[:, col])) == 1
+                for table in self.aligned_pair(lower_index)
+            )
+            self._pair_monotonic[key] = monotonic
+        return monotonic
+
+    def inverse_table(self, index: int, column: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Monotone inverse of a (magnitude) column in a single age table.
+
+        Returns
+        -------
+        masses: numpy.ndarray
+            Masses of the table, increasing.
+        envelope: numpy.ndarray
+            Read-only monotone envelope of the column (see
+            interpolation.monotone_envelope), the faintest value of the
+            table at or above each mass.
+
+        """
+        key = (int(index), column)
+        envelope = self._envelopes.get(key)
+        if envelope is None:
+            table = self.table(index)
+            envelope = _read_only(
+                monotone_envelope(table[:, self.column_index[column]])
+            )
+            self._envelopes[key] = envelope
+        return self.table(index)[:, self.column_index["M/Ms"]], envelope
+
+    def table_dict(self, index: int) -> Dict[str, np.ndarray]:
+        """Single age table as a dictionary of column arrays."""
+        table = self.table(index)
+        return {col: table[:, i] for i, col in enumerate(self.columns)}
+
+
+_grids = {}  # type: Dict[str, ModelGrid]
+
+
+def get_grid(model: str) -> ModelGrid:
+    """Return the grid of a model, loading it on first use."""
+    model = normalize_model(model)
+    grid = _grids.get(model)
+    if grid is None:
+        grid = ModelGrid.from_store(model)
+        _grids[model] = grid
+    return grid
+
+
+def register_grid(grid: ModelGrid) -> None:
+    """Use this grid for all following searches of its model."""
+    _grids[grid.model] = grid
+
+
+def unregister_grid(grid: ModelGrid) -> None:
+    """Stop using this grid for the searches of its model, if it is in use."""
+    if _grids.get(grid.model) is grid:
+        del _grids[grid.model]
+
+
+def clear_grids() -> None:
+    """Forget the loaded grids, they are reloaded on next use."""
+    _grids.clear()
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    """Return a read-only view of the array."""
+    array = array.view()
+    array.setflags(write=False)
+    return array
@@ -0,0 +1,397 @@
+"""Monte Carlo propagation of the host and companion uncertainties.
+
+``mass_to_flux_ratio`` gives the flux ratio of one companion mass, age,
+parallax and host magnitude. ``monte_carlo_flux_ratios`` instead draws
+samples of all four from their uncertainties and pushes them through
+absolute_magnitude, the age/mass interpolation of the grid and
+flux_mag_ratio, returning the percentiles of the flux ratios::
+
+    result = monte_carlo_flux_ratios(
+        parallax=(20.9, 0.3), host_mags={"K": (5.5, 0.02)},
+        age=(5.0, 1.0), companion_mass=(90, 5), n_samples=10 ** 8,
+    )
+    print(result.percentiles()["flux_ratio_K"])
+
+The samples are drawn and searched in chunks of chunk_size and only kept as
+fixed resolution histograms, so the memory does not grow with n_samples.
+Every chunk has its own random stream spawned from the seed, so the
+results depend on the seed and chunk_size but not on the number of workers.
+"""
+import warnings
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from baraffe_tables.calculations import absolute_magnitude, flux_mag_ratio
+from baraffe_tables.contrast import model_bands
+from baraffe_tables.model_grid import get_grid
+from baraffe_tables.table_search import batch_table_search
+
+# A fixed value, a (value, standard deviation) normal distribution, or a
+# function rng, size -> samples.
+Distribution = Union[
+    float, Tuple[float, float], Callable[[np.random.Generator, int], Any]
+]
+
+# Bin width of the histograms of positive quantities (dex) and magnitudes.
+log_resolution = 1e-4
+magnitude_resolution = 1e-3
+
+
+class Histogram:
+    """Counts of values in bins of fixed width, for percentiles of a stream.
+
+    Only the occupied bins are stored, so the memory depends on the range
+    of the values over the resolution, not on their number.
+
+    Parameters
+    ----------
+    resolution: float
+        Width of the bins, in dex if log.
+    log: bool
+        Bin log10 of the values. Non-positive values are dropped.
+
+    """
+
+    def __init__(
+        self, resolution: float = magnitude_resolution, log: bool = False
+    ) -> None:
+        if resolution <= 0:
+            raise ValueError("resolution must be positive, not {}.".format(resolution))
+        self.resolution = resolution
+        self.log = log
+        self.bins = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    @property
+    def count(self) -> int:
+        """Number of values added."""
+        return int(self.counts.sum())
+
+    def add(self, values: Any) -> None:
+        """Add the finite values of an array."""
+        values = np.asarray(values, dtype=float).ravel()
+        if self.log:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values = np.log10(values)
+        values = values[np.isfinite(values)]
+        bins, counts = np.unique(
+            np.floor(values / self.resolution).astype(np.int64), return_counts=True
+        )
+        self._add_bins(bins, counts)
+
+    def merge(self, other: "Histogram") -> None:
+        """Add the counts of another histogram of the same binning."""
+        if (other.resolution, other.log) != (self.resolution, self.log):
+            raise ValueError(
+                "Can only merge histograms with the same resolution and log."
+            )
+        self._add_bins(other.bins, other.counts)
+
+    def _add_bins(self, bins: np.ndarray, counts: np.ndarray) -> None:
+        self.bins, inverse = np.unique(
+            np.concatenate([self.bins, bins]), return_inverse=True
+        )
+        merged = np.zeros(len(self.bins), dtype=np.int64)
+        np.add.at(merged, inverse, np.concatenate([self.counts, counts]))
+        self.counts = merged
+
+    def percentile(self, q: Any) -> np.ndarray:
+        """Percentiles q (0-100) of the values, interpolated within the bins.
+
+        They are exact to the resolution. NaN if no values were added.
+        """
+        q = np.asarray(q, dtype=float)
+        if np.any((q < 0) | (q > 100)):
+            raise ValueError("Percentiles must be between 0 and 100.")
+        if not len(self.counts):
+            return np.full(q.shape, np.nan)
+        cumulative = np.cumsum(self.counts)
+        target = q / 100 * cumulative[-1]
+        i = np.minimum(
+            np.searchsorted(cumulative, target, side="left"), len(cumulative) - 1
+        )
+        fraction = np.clip(
+            (target - cumulative[i] + self.counts[i]) / self.counts[i], 0, 1
+        )
+        result = (self.bins[i] + fraction) * self.resolution
+        return 10 ** result if self.log else result
+
+
+class MonteCarloResult:
+    """Histograms of the quantities of a Monte Carlo run.
+
+    Attributes
+    ----------
+    histograms: Dict[str, Histogram]
+        "flux_ratio_{band}" (F_companion/F_host) and "M{band}" (companion
+        absolute magnitude) of each band, and "Teff" of the companion.
+    n_samples: int
+        Number of samples drawn.
+    n_invalid: int
+        Samples dropped for a non-positive parallax, age or mass.
+    n_outside: int
+        Samples dropped for a mass outside the mass range of the tables.
+
+    """
+
+    def __init__(
+        self,
+        histograms: Dict[str, Histogram],
+        n_samples: int = 0,
+        n_invalid: int = 0,
+        n_outside: int = 0,
+    ) -> None:
+        self.histograms = histograms
+        self.n_samples = n_samples
+        self.n_invalid = n_invalid
+        self.n_outside = n_outside
+
+    @property
+    def n_valid(self) -> int:
+        """Number of samples in the histograms."""
+        return self.n_samples - self.n_invalid - self.n_outside
+
+    def merge(self, other: "MonteCarloResult") -> None:
+        """Add the samples of another run of the same quantities."""
+        for name, histogram in self.histograms.items():
+            histogram.merge(other.histograms[name])
+        self.n_samples += other.n_samples
+        self.n_invalid += other.n_invalid
+        self.n_outside += other.n_outside
+
+    def percentiles(
+        self, q: Sequence[float] = (2.5, 16, 50, 84, 97.5)
+    ) -> Dict[str, np.ndarray]:
+        """Percentiles q of every quantity."""
+        return {
+            name: histogram.percentile(q) for name, histogram in self.histograms.items()
+        }
+
+
+def monte_carlo_flux_ratios(
+    parallax: Distribution,
+    host_mags: Mapping[str, Distribution],
+    age: Distribution,
+    companion_mass: Distribution,
+    n_samples: int = 1000000,
+    chunk_size: int = 100000,
+    model: str = "2003",
+    age_interp: bool = False,
+    seed: Optional[int] = None,
+    n_workers: int = 1,
+    executor: Union[str, Executor] = "process",
+) -> MonteCarloResult:
+    """Distributions of the companion/host flux ratios from the input uncertainties.
+
+    Parameters
+    ----------
+    parallax: distribution
+        Parallax of the system (mas).
+    host_mags: mapping of str to distribution
+        Apparent magnitude of the host star in each band, e.g. {"K": (5.5, 0.02)}.
+    age: distribution
+        Age of the system (Gyr).
+    companion_mass: distribution
+        Companion mass (M_Jup).
+    n_samples: int
+        Number of samples to draw.
+    chunk_size: int
+        Number of samples drawn and searched at once.
+    model: str
+        Year of Baraffe model to use [2003 (default), 2015].
+    age_interp: bool
+        Interpolate tables across age. Default=False.
+    seed: int, optional
+        Seed of the random streams. Default is a fresh seed.
+    n_workers: int
+        Number of workers. With 1 (default) the chunks are run in this
+        process.
+    executor: str or concurrent.futures.Executor
+        "process" (default) or "thread" pool, or an existing executor to
+        submit the work to. Distribution functions must be picklable for
+        process pools.
+
+    Returns
+    -------
+    result: MonteCarloResult
+        Histograms of the flux ratios, companion magnitudes and companion
+        temperature, see MonteCarloResult.percentiles.
+
+    Notes
+    -----
+    A distribution is a fixed value, a (value, standard deviation) pair for
+    a normal distribution, or a function of (numpy Generator, size)
+    returning the samples. Samples with a non-positive parallax, age or
+    mass, or a mass outside the tables, are dropped and counted.
+
+    """
+    from astropy.constants import M_jup, M_sun
+
+    if n_samples < 1:
+        raise ValueError("n_samples must be at least 1, not {}.".format(n_samples))
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1, not {}.".format(chunk_size))
+    available = model_bands(model)
+    host_mags = {band.upper(): mag for band, mag in host_mags.items()}
+    for band, mag in host_mags.items():
+        if band not in available:
+            raise ValueError("Band {0} not in Baraffe model {1}".format(band, model))
+    for name, dist in [
+        ("parallax", parallax),
+        ("age", age),
+        ("companion_mass", companion_mass),
+    ]:
+        _check_distribution(name, dist)
+    for band, mag in host_mags.items():
+        _check_distribution("host_mags[{!r}]".format(band), mag)
+
+    sizes = [
+        min(chunk_size, n_samples - start) for start in range(0, n_samples, chunk_size)
+    ]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    chunks = [
+        (
+            chunk_seed,
+            size,
+            parallax,
+            host_mags,
+            age,
+            companion_mass,
+            float((M_jup / M_sun).value),
+            get_grid(model).model,
+            age_interp,
+        )
+        for chunk_seed, size in zip(seeds, sizes)
+    ]
+    # Contiguous blocks of chunks, one per worker.
+    n_blocks = max(1, min(n_workers, len(chunks)))
+    blocks = [
+        chunks[i * len(chunks) // n_blocks : (i + 1) * len(chunks) // n_blocks]
+        for i in range(n_blocks)
+    ]
+
+    result = None  # type: Optional[MonteCarloResult]
+    for block_result in _run_blocks(blocks, n_workers, executor):
+        if result is None:
+            result = block_result
+        else:
+            result.merge(block_result)
+
+    if result.n_outside:
+        warnings.warn(
+            "{0} of {1} samples have a companion mass outside the tables and were "
+            "dropped.".format(result.n_outside, result.n_samples)
+        )
+    return result
+
+
+def _check_distribution(name: str, dist: Distribution) -> None:
+    """Raise ValueError unless dist is a value, (value, std) or a function."""
+    if callable(dist):
+        return
+    values = np.atleast_1d(np.asarray(dist, dtype=float))
+    if values.shape not in [(1,), (2,)]:
+        raise ValueError(
+            "{0} must be a value, (value, std) or a function, not {1!r}.".format(
+                name, dist
+            )
+        )
+    if len(values) == 2 and values[1] < 0:
+        raise ValueError("Standard deviation of {0} must not be negative.".format(name))
+
+
+def _draw(dist: Distribution, rng: np.random.Generator, size: int) -> np.ndarray:
+    """Samples of a distribution."""
+    if callable(dist):
+        return np.broadcast_to(np.asarray(dist(rng, size), dtype=float), (size,))
+    values = np.atleast_1d(np.asarray(dist, dtype=float))
+    if len(values) == 1 or values[1] == 0:
+        return np.full(size, values[0])
+    return rng.normal(values[0], values[1], size)
+
+
+def _simulate_chunk(chunk: Tuple[Any, ...]) -> MonteCarloResult:
+    """Draw and search one chunk of samples."""
+    (
+        seed,
+        size,
+        parallax,
+        host_mags,
+        age,
+        companion_mass,
+        mass_ratio,
+        model,
+        age_interp,
+    ) = chunk
+    rng = np.random.default_rng(seed)
+    parallaxes = _draw(parallax, rng, size)
+    ages = _draw(age, rng, size)
+    masses = _draw(companion_mass, rng, size) * mass_ratio  # M_sun
+    apparent = {band: _draw(mag, rng, size) for band, mag in host_mags.items()}
+
+    valid = (parallaxes > 0) & (ages > 0) & (masses > 0)
+    low, high = get_grid(model).mass_range(ages, age_interp)
+    outside = valid & ((masses < low) | (masses > high))
+    keep = valid & ~outside
+
+    with warnings.catch_warnings():
+        # Samples outside the tables are counted instead.
+        warnings.simplefilter("ignore")
+        companion = batch_table_search(
+            "M/Ms", masses[keep], ages[keep], model=model, age_interp=age_interp
+        )
+
+    result = _empty_result(host_mags)
+    for band, mags in apparent.items():
+        with np.errstate(divide="ignore", invalid="ignore"):
+            host_mag = absolute_magnitude(parallaxes[keep], mags[keep])
+        companion_mag = companion["M{}".format(band.lower())]
+        result.histograms["flux_ratio_{}".format(band)].add(
+            flux_mag_ratio(companion_mag, host_mag)
+        )
+        result.histograms["M{}".format(band.lower())].add(companion_mag)
+    result.histograms["Teff"].add(companion["Teff"])
+    result.n_samples = size
+    result.n_invalid = int(np.sum(~valid))
+    result.n_outside = int(np.sum(outside))
+    return result
+
+
+def _empty_result(host_mags: Mapping[str, Any]) -> MonteCarloResult:
+    histograms = {}  # type: Dict[str, Histogram]
+    for band in host_mags:
+        histograms["flux_ratio_{}".format(band)] = Histogram(log_resolution, log=True)
+        histograms["M{}".format(band.lower())] = Histogram(magnitude_resolution)
+    histograms["Teff"] = Histogram(log_resolution, log=True)
+    return MonteCarloResult(histograms)
+
+
+def _simulate_block(block: List[Tuple[Any, ...]]) -> MonteCarloResult:
+    """Run a block of chunks, keeping only their merged histograms."""
+    result = _simulate_chunk(block[0])
+    for chunk in block[1:]:
+        result.merge(_simulate_chunk(chunk))
+    return result
+
+
+def _run_blocks(
+    blocks: List[List[Tuple[Any, ...]]], n_workers: int, executor: Union[str, Executor]
+) -> List[MonteCarloResult]:
+    """Run the blocks serially or on an executor."""
+    if isinstance(executor, Executor):
+        return list(executor.map(_simulate_block, blocks))
+    if n_workers <= 1 or len(blocks) <= 1:
+        return [_simulate_block(block) for block in blocks]
+    if executor == "thread":
+        with ThreadPoolExecutor(n_workers) as pool:
+            return list(pool.map(_simulate_block, blocks))
+    if executor != "process":
+        raise ValueError(
+            "executor must be 'process', 'thread' or an Executor, not {!r}.".format(
+                executor
+            )
+        )
+    with ProcessPoolExecutor(n_workers) as pool:
+        return list(pool.map(_simulate_block, blocks))
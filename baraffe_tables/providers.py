@@ -0,0 +1,182 @@
+"""Sources of the host star parameters.
+
+The flux ratio scripts need the magnitudes, parallax and temperature of the
+host star. ``SimbadProvider`` gets them from SIMBAD and SWEET-Cat over the
+network (see db_queries), ``LocalCatalogProvider`` from a local catalog file
+with the same column names as the SIMBAD results (``FLUX_K``,
+``PLX_VALUE``, ``Fe_H_Teff``, ...), for machines without network access.
+"""
+import abc
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from baraffe_tables import db_queries
+
+# Columns searched, in order, for the star names of a local catalog.
+name_columns = ["name", "NAME", "star_name", "MAIN_ID", "QUERY_NAME"]
+
+
+class StellarParamProvider(abc.ABC):
+    """Base class of the sources of host star parameters.
+
+    Subclasses implement get_stellar_params.
+    """
+
+    @abc.abstractmethod
+    def get_stellar_params(self, star_name: str) -> Any:
+        """Table of the parameters of one star, with the SIMBAD column names.
+
+        Raises LookupError if the star is unknown.
+        """
+
+    def get_stellar_params_batch(
+        self, star_names: Sequence[str]
+    ) -> Tuple[Any, Dict[str, str]]:
+        """Parameters of many stars, see db_queries.get_stellar_params_batch."""
+        rows = []  # type: List[Any]
+        errors = {}  # type: Dict[str, str]
+        for star_name in star_names:
+            try:
+                row = self.get_stellar_params(star_name)
+            except LookupError as e:
+                row = None
+                errors[star_name] = str(e)
+            else:
+                if row is None:
+                    errors[star_name] = "Not found."
+            rows.append(row)
+        return db_queries.align_rows(list(star_names), rows), errors
+
+    def get_temperature(
+        self, star_name: str, star_params: Optional[Any] = None
+    ) -> float:
+        """Temperature of the star from Fe_H_Teff, or else from B-V."""
+        if star_params is None:
+            star_params = self.get_stellar_params(star_name)
+        return db_queries.get_temperature(star_name, star_params, sweet_cat=False)
+
+
+class SimbadProvider(StellarParamProvider):
+    """Host star parameters from SIMBAD, and temperatures also from SWEET-Cat.
+
+    Parameters
+    ----------
+    cache: bool, optional
+        Use the persistent query cache. Default is True if the
+        BARAFFE_TABLES_QUERY_CACHE environment variable is set.
+    offline: bool, optional
+        Only use the query cache. Default is the BARAFFE_TABLES_OFFLINE
+        environment variable.
+    chunk_size: int
+        Maximum number of stars per SIMBAD query of get_stellar_params_batch.
+
+    """
+
+    def __init__(
+        self,
+        cache: Optional[bool] = None,
+        offline: Optional[bool] = None,
+        chunk_size: int = 100,
+    ) -> None:
+        self.cache = cache
+        self.offline = offline
+        self.chunk_size = chunk_size
+
+    def get_stellar_params(self, star_name: str) -> Any:
+        return db_queries.get_stellar_params(
+            star_name, cache=self.cache, offline=self.offline
+        )
+
+    def get_stellar_params_batch(
+        self, star_names: Sequence[str]
+    ) -> Tuple[Any, Dict[str, str]]:
+        return db_queries.get_stellar_params_batch(
+            star_names,
+            chunk_size=self.chunk_size,
+            cache=self.cache,
+            offline=self.offline,
+        )
+
+    def get_temperature(
+        self, star_name: str, star_params: Optional[Any] = None
+    ) -> float:
+        if star_params is None:
+            star_params = self.get_stellar_params(star_name)
+        return db_queries.get_temperature(star_name, star_params)
+
+
+class LocalCatalogProvider(StellarParamProvider):
+    """Host star parameters from a local CSV, FITS or Parquet catalog.
+
+    Parameters
+    ----------
+    path: str
+        Catalog file, read with astropy.table.Table.read. Its columns have
+        the SIMBAD names (FLUX_J, FLUX_H, FLUX_K, PLX_VALUE, Fe_H_Teff, ...).
+        PLX_VALUE is in mas unless it has another unit.
+    name_column: str, optional
+        Column of the star names. Default is the first of name_columns in
+        the catalog.
+    format: str, optional
+        Table format passed to Table.read. Default is guessed from the file.
+
+    Notes
+    -----
+    Names are matched ignoring case and spaces, so "HD30501" finds "HD 30501".
+    Parquet catalogs need pyarrow.
+
+    """
+
+    def __init__(
+        self, path: str, name_column: Optional[str] = None, format: Optional[str] = None
+    ) -> None:
+        from astropy.table import Table
+
+        if not os.path.exists(path):
+            raise ValueError("Catalog file {} does not exist.".format(path))
+        table = Table.read(path, format=format)
+        if name_column is None:
+            name_column = next(
+                (name for name in name_columns if name in table.colnames), None
+            )
+        if name_column not in table.colnames:
+            raise ValueError(
+                "Catalog {0} has no star name column, one of {1}.".format(
+                    path, name_columns
+                )
+            )
+        if "PLX_VALUE" in table.colnames:
+            parallax = table["PLX_VALUE"]
+            if parallax.unit is None:
+                parallax.unit = "mas"
+            elif parallax.unit != "mas":
+                parallax.convert_unit_to("mas")
+
+        self.path = path
+        self.table = table
+        self.name_column = name_column
+        self.index = {}  # type: Dict[str, int]
+        for i, name in enumerate(table[name_column]):
+            self.index.setdefault(_name_key(name), i)
+
+    def get_stellar_params(self, star_name: str) -> Any:
+        try:
+            i = self.index[_name_key(star_name)]
+        except KeyError:
+            raise LookupError(
+                "{0} is not in the catalog {1}.".format(star_name, self.path)
+            )
+        return self.table[i : i + 1]
+
+
+def _name_key(name: Any) -> str:
+    if isinstance(name, bytes):
+        name = name.decode("utf-8")
+    return "".join(str(name).split()).lower()
+
+
+def get_provider(catalog: Optional[str] = None) -> StellarParamProvider:
+    """SimbadProvider, or LocalCatalogProvider of the catalog file if given."""
+    if catalog is None:
+        return SimbadProvider()
+    return LocalCatalogProvider(catalog)
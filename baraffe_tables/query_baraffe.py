@@ -1,17 +1,28 @@
 #!/usr/bin/env python
-"""Brown Dwarf Flux ratio calculator.
+"""Baraffe table query.
 
-Calculates the flux/contrast ratio between a host star and a brown dwarf of a specified mass.
+Looks up the Baraffe table entry of a single (column, value, age) query
+and prints it.
 
-This script uses the SIMBAD database to obtain the host star parameters, such as magnitude and age.
-The companion/brown dwarf mass is a given input (in M_Jup) and  is used to obtain the band magnitudes
-of the companion from the Baraffe tables.
-
-The magnitude difference between the host and companion are used to calculate the flux/contrast ratio.
+With --input, queries are read from a CSV file (or stdin with "-") or a
+Parquet file, one query per row with the columns "column", "value", "age"
+and optionally "model" and "age_interp". The queries are searched in chunks
+of --chunk-size rows and the input columns followed by every Baraffe table
+column are written to --output (CSV or Parquet, default CSV on stdout).
+Memory use is bounded by the chunk size. Parquet needs pyarrow.
 
 """
 import argparse
+import contextlib
+import csv
+import sys
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
 
+from baraffe_tables.batch import batch_search
+from baraffe_tables.grid_store import model_sources
+from baraffe_tables.model_grid import get_grid
 from baraffe_tables.table_search import baraffe_table_search
 
 
@@ -21,18 +32,270 @@ def _parser() -> object:
     :returns: the args
     """
     parser = argparse.ArgumentParser(description='Baraffe table Query.')
-    parser.add_argument('column', help='Input fits file to calibrate',
+    parser.add_argument('column', help='Column to search', nargs="?",
                         choices=["M/Ms", "Teff", "L/Ls", "g", "R/Rs", "R", "Li/Li0",
                                  "Mv", "Mr", "Mi", "Mj", " Mh", "Mk", "Ml", "Mll", "Mm"])
-    parser.add_argument('value', help='Parameter value', type=float)
-    parser.add_argument('age', help='Star age (Gyr)', type=float)
+    parser.add_argument('value', help='Parameter value', type=float, nargs="?")
+    parser.add_argument('age', help='Star age (Gyr)', type=float, nargs="?")
     parser.add_argument('-m', '--model', choices=['03', '15', '2003', '2015'],
                         help='Baraffe model to use [2003, 2015]', default='2003', type=str)
-    return parser.parse_args()
+    parser.add_argument('-i', '--input', default=None,
+                        help='CSV or Parquet file of queries, "-" for CSV on stdin.')
+    parser.add_argument('-o', '--output', default=None,
+                        help='CSV or Parquet file for the results of --input. '
+                             'Default is stdout.')
+    parser.add_argument('--chunk-size', dest="chunk_size", type=int, default=100000,
+                        help='Number of queries searched at once with --input.')
+    args = parser.parse_args()
+    if args.input is None and None in (args.column, args.value, args.age):
+        parser.error("column, value and age are required without --input.")
+    return args
+
+
+def stream_queries(
+    queries_file: str,
+    output_file: Optional[str] = None,
+    model: str = "2003",
+    chunk_size: int = 100000,
+) -> int:
+    """Search every query of a CSV or Parquet file, chunk by chunk.
+
+    Parameters
+    ----------
+    queries_file: str
+        Path of the CSV or Parquet (".parquet") queries, or "-" for CSV on stdin.
+    output_file: str, optional
+        Path of the CSV or Parquet (".parquet") results. Default is CSV on stdout.
+    model: str
+        Baraffe model of the queries without a "model" column.
+    chunk_size: int
+        Number of queries searched at once.
+
+    Returns
+    -------
+    n_queries: int
+        Number of queries searched.
+
+    Raises
+    ------
+    ValueError
+        For the first query that can not be searched, naming its row. The
+        results of the chunks before it are already written.
+
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1, not {}.".format(chunk_size))
+    with contextlib.ExitStack() as stack:
+        if _is_parquet(queries_file):
+            chunks = _read_parquet(queries_file, chunk_size)
+        elif queries_file == "-":
+            chunks = _read_csv(sys.stdin, chunk_size)
+        else:
+            chunks = _read_csv(
+                stack.enter_context(open(queries_file, newline="")), chunk_size
+            )
+
+        if output_file is not None and _is_parquet(output_file):
+            writer = _ParquetWriter(output_file)  # type: Any
+        elif output_file is not None:
+            writer = _CSVWriter(stack.enter_context(open(output_file, "w", newline="")))
+        else:
+            writer = _CSVWriter(sys.stdout)
+        stack.callback(writer.close)
+
+        n_queries = 0
+        for chunk in chunks:
+            queries = dict(chunk)
+            queries.setdefault("model", [model] * len(queries["column"]))
+            if "age_interp" in queries:
+                queries["age_interp"] = [
+                    _as_bool(flag) for flag in queries["age_interp"]
+                ]
+            _check_queries(
+                queries, n_queries, "stdin" if queries_file == "-" else queries_file
+            )
+            writer.write(chunk, batch_search(queries, chunk_size=chunk_size))
+            n_queries += len(queries["column"])
+    return n_queries
+
+
+def result_columns() -> List[str]:
+    """Every column of the Baraffe tables of all models, in model order."""
+    columns = []  # type: List[str]
+    for model in model_sources:
+        columns.extend(col for col in get_grid(model).columns if col not in columns)
+    return columns
+
+
+def _is_parquet(path: str) -> bool:
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def _as_bool(flag: Any) -> bool:
+    if isinstance(flag, str):
+        return flag.strip().lower() in ("1", "true", "yes", "y", "t")
+    return bool(flag)
+
+
+# Columns every queries file must have.
+required_columns = ("column", "value", "age")
+
+
+def _check_columns(names: List[str], source: str) -> None:
+    """Raise ValueError if the queries lack a required column."""
+    missing = [name for name in required_columns if name not in names]
+    if missing:
+        raise ValueError(
+            "Queries in {0} lack the column(s) {1}. The header needs {2}, "
+            "and optionally model and age_interp.".format(
+                source, ", ".join(missing), ", ".join(required_columns)
+            )
+        )
+
+
+def _check_queries(queries: Dict[str, List[Any]], first_row: int, source: str) -> None:
+    """Raise ValueError for the first query of a chunk that can not be searched.
+
+    first_row is the number of queries before the chunk, the row numbers of
+    the error messages count the queries of the source from 1.
+    """
+    checked = {}  # type: Dict[Tuple[Any, Any], int]
+    for i, key in enumerate(zip(queries["model"], queries["column"])):
+        checked.setdefault(key, i)
+    for (model, column), i in checked.items():
+        try:
+            grid = get_grid(str(model))
+        except ValueError as e:
+            raise _row_error(first_row + i, source, e)
+        if str(column) not in grid.column_index:
+            raise _row_error(
+                first_row + i,
+                source,
+                "Column {0} not in Baraffe table (model={1})".format(column, model),
+            )
+    for name in ("value", "age"):
+        try:
+            np.asarray(queries[name], dtype=float)
+        except (TypeError, ValueError):
+            for i, value in enumerate(queries[name]):
+                try:
+                    float(value)
+                except (TypeError, ValueError):
+                    raise _row_error(
+                        first_row + i,
+                        source,
+                        "{0} {1!r} is not a number".format(name, value),
+                    )
+
+
+def _row_error(row: int, source: str, error: Any) -> ValueError:
+    return ValueError(
+        "Query {0} of {1}: {2}.".format(row + 1, source, str(error).rstrip("."))
+    )
+
+
+def _read_csv(f: TextIO, chunk_size: int) -> Iterator[Dict[str, List[Any]]]:
+    """Read chunks of the CSV queries as dictionaries of column lists.
+
+    The header is checked before the first chunk is requested.
+    """
+    reader = csv.DictReader(f)
+    _check_columns(reader.fieldnames or [], getattr(f, "name", "the CSV input"))
+    return _csv_chunks(reader, chunk_size)
+
+
+def _csv_chunks(
+    reader: csv.DictReader, chunk_size: int
+) -> Iterator[Dict[str, List[Any]]]:
+    chunk = {name: [] for name in reader.fieldnames}  # type: Dict[str, List[Any]]
+    n_rows = 0
+    for row in reader:
+        for name in chunk:
+            chunk[name].append(row[name])
+        n_rows += 1
+        if n_rows == chunk_size:
+            yield chunk
+            chunk = {name: [] for name in chunk}
+            n_rows = 0
+    if n_rows:
+        yield chunk
+
+
+def _read_parquet(path: str, chunk_size: int) -> Iterator[Dict[str, List[Any]]]:
+    """Read chunks of the Parquet queries as dictionaries of column lists.
+
+    The schema is checked before the first chunk is requested.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    _check_columns(parquet_file.schema_arrow.names, path)
+    return (
+        batch.to_pydict() for batch in parquet_file.iter_batches(batch_size=chunk_size)
+    )
+
+
+class _CSVWriter:
+    """Write the queries and their results as CSV rows."""
+
+    def __init__(self, f: TextIO) -> None:
+        self.f = f
+        self.columns = result_columns()
+        self.writer = csv.writer(f)
+        self.header = None  # type: Optional[List[str]]
+
+    def write(
+        self, queries: Dict[str, List[Any]], results: Dict[str, np.ndarray]
+    ) -> None:
+        if self.header is None:
+            self.header = list(queries) + [
+                "result_" + col if col in queries else col for col in self.columns
+            ]
+            self.writer.writerow(self.header)
+        nan = np.full(len(queries["column"]), np.nan)
+        arrays = [results.get(col, nan) for col in self.columns]
+        for i, row in enumerate(zip(*queries.values())):
+            self.writer.writerow(
+                list(row) + [repr(float(array[i])) for array in arrays]
+            )
+
+    def close(self) -> None:
+        self.f.flush()
+
+
+class _ParquetWriter:
+    """Write the queries and their results as Parquet row groups."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.columns = result_columns()
+        self.writer = None  # type: Any
+
+    def write(
+        self, queries: Dict[str, List[Any]], results: Dict[str, np.ndarray]
+    ) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = {name: list(values) for name, values in queries.items()}
+        nan = np.full(len(queries["column"]), np.nan)
+        for col in self.columns:
+            table["result_" + col if col in queries else col] = results.get(col, nan)
+        table = pa.table(table)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
 
 
 if __name__ == '__main__':
     args = vars(_parser())
-    opts = {k: args[k] for k in args}
+    if args["input"] is not None:
+        stream_queries(args["input"], args["output"], args["model"], args["chunk_size"])
+        sys.exit(0)
+    opts = {k: args[k] for k in ("column", "value", "age", "model")}
     result = baraffe_table_search(**opts)
     print(result)
@@ -0,0 +1,217 @@
+"""Persistent cache of database query results.
+
+The SIMBAD queries of ``db_queries`` take seconds per star, so their result
+tables are kept in a small SQLite database keyed by the star name and the
+set of fields queried. The tables are stored as ECSV text, never pickled, so
+a cache file written by someone else can not run code when it is read.
+Cached entries older than the time to live are queried again.
+
+The cache is configured with the environment variables
+
+``BARAFFE_TABLES_QUERY_CACHE``
+    Path of the SQLite file (default ``queries.sqlite`` in the grid store
+    directory, see grid_store). Setting it turns the cache on for the
+    queries that do not choose, see cache_enabled.
+``BARAFFE_TABLES_QUERY_TTL``
+    Time to live of the entries in seconds (default 30 days).
+``BARAFFE_TABLES_OFFLINE``
+    If set to 1, never query the databases. Only cached results are used.
+
+"""
+import io
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from baraffe_tables.grid_store import store_directory
+
+DEFAULT_TTL = 30 * 24 * 3600.0
+
+_schema = (
+    "CREATE TABLE IF NOT EXISTS results ("
+    "name TEXT NOT NULL, fields TEXT NOT NULL, created REAL NOT NULL, "
+    "ecsv TEXT NOT NULL, PRIMARY KEY (name, fields))"
+)
+
+
+def query_cache_path() -> str:
+    """Path of the SQLite file of the query cache."""
+    default = os.path.join(store_directory(), "queries.sqlite")
+    return os.environ.get("BARAFFE_TABLES_QUERY_CACHE", default)
+
+
+def cache_enabled() -> bool:
+    """True if the BARAFFE_TABLES_QUERY_CACHE environment variable is set.
+
+    The query cache is opt-in, as cached results can be out of date by up to
+    the time to live.
+    """
+    return bool(os.environ.get("BARAFFE_TABLES_QUERY_CACHE"))
+
+
+def query_cache_ttl() -> float:
+    """Time to live of the cached query results in seconds."""
+    return float(os.environ.get("BARAFFE_TABLES_QUERY_TTL", DEFAULT_TTL))
+
+
+def offline_mode() -> bool:
+    """True if the databases must not be queried, only the cache."""
+    return os.environ.get("BARAFFE_TABLES_OFFLINE", "").strip().lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+
+
+def query_key(name: str, fields: Iterable[str]) -> Tuple[str, str]:
+    """Cache key of a query, insensitive to the case and spacing of the name
+    and to the order of the fields."""
+    return " ".join(name.split()).lower(), ",".join(sorted(set(fields)))
+
+
+class QueryCache:
+    """SQLite cache of query result tables with a time to live.
+
+    Parameters
+    ----------
+    path: str, optional
+        Path of the SQLite file. Default is query_cache_path(), read on
+        every access.
+    ttl: float, optional
+        Time to live of the entries in seconds. Default is query_cache_ttl(),
+        read on every access.
+
+    Notes
+    -----
+    A connection is opened per access so the cache can be shared between
+    threads and processes. If the file can not be read or written, or a table
+    can not be written as ECSV, the cache behaves as if it were empty. The
+    tables are stored as ECSV, which keeps the column units and masks; bytes
+    columns are read back as str.
+
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None) -> None:
+        self._path = path
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def path(self) -> str:
+        return query_cache_path() if self._path is None else self._path
+
+    @property
+    def ttl(self) -> float:
+        return query_cache_ttl() if self._ttl is None else self._ttl
+
+    def _connect(self) -> sqlite3.Connection:
+        path = self.path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(path, timeout=30)
+        connection.execute(_schema)
+        return connection
+
+    def get(self, name: str, fields: Iterable[str]) -> Any:
+        """Return the cached result table of a query, None if missing or expired."""
+        key = query_key(name, fields)
+        try:
+            connection = self._connect()
+            try:
+                row = connection.execute(
+                    "SELECT created, ecsv FROM results WHERE name = ? AND fields = ?",
+                    key,
+                ).fetchone()
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError):
+            row = None
+
+        value = None
+        if row is not None and time.time() - row[0] <= self.ttl:
+            from astropy.table import Table
+
+            try:
+                value = Table.read(row[1], format="ascii.ecsv")
+            except Exception:  # Not readable ECSV.
+                value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, name: str, fields: Iterable[str], value: Any) -> None:
+        """Store the result table of a query."""
+        from astropy.table import Table
+
+        if not isinstance(value, Table):
+            raise TypeError(
+                "Only astropy Tables can be cached, not {}.".format(type(value))
+            )
+        try:
+            text = io.StringIO()
+            value.write(text, format="ascii.ecsv")
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                        query_key(name, fields) + (time.time(), text.getvalue()),
+                    )
+            finally:
+                connection.close()
+        except Exception:  # Not writable as ECSV or to the file, so not cached.
+            pass
+
+    def clear(self) -> None:
+        """Remove all entries and reset the hit/miss counters."""
+        if os.path.exists(self.path):
+            try:
+                connection = self._connect()
+                try:
+                    with connection:
+                        connection.execute("DELETE FROM results")
+                finally:
+                    connection.close()
+            except (sqlite3.Error, OSError):
+                pass
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a dictionary of cache statistics.
+
+        Keys are "hits", "misses", "size", "ttl" and "path".
+        """
+        size = 0
+        if os.path.exists(self.path):
+            try:
+                connection = self._connect()
+                try:
+                    size = connection.execute(
+                        "SELECT COUNT(*) FROM results"
+                    ).fetchone()[0]
+                finally:
+                    connection.close()
+            except (sqlite3.Error, OSError):
+                pass
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": size,
+                "ttl": self.ttl,
+                "path": self.path,
+            }
+
+
+# Cache of the SIMBAD stellar parameters of db_queries.
+query_cache = QueryCache()
@@ -0,0 +1,235 @@
+"""Share the model grids between processes.
+
+A process pool would otherwise load a copy of every ModelGrid in each
+worker. ``publish_grids`` copies the grid arrays once into
+``multiprocessing.shared_memory`` blocks. The returned handles are small
+and picklable, and ``attach_grids`` builds ModelGrids in a worker directly
+on the shared memory, without copying, and registers them for the table
+searches. It is meant to be used as the pool initializer::
+
+    with publish_grids() as shared:
+        with multiprocessing.Pool(
+            64, initializer=attach_grids, initargs=(shared.handles,)
+        ) as pool:
+            pool.map(work, chunks)
+
+``detach_grids`` undoes attach_grids in a process that keeps running after
+the work on the shared grids is done.
+
+Requires Python 3.8 or newer.
+"""
+import gc
+import sys
+from typing import Any, List, Sequence
+from weakref import WeakValueDictionary
+
+import numpy as np
+
+from baraffe_tables.model_grid import (
+    ModelGrid,
+    get_grid,
+    register_grid,
+    unregister_grid,
+)
+
+# Shared memory blocks attached in this process, kept open while used.
+_attached = []  # type: List[Any]
+# Grids built on the attached blocks.
+_attached_grids = []  # type: List[ModelGrid]
+# Array built on each attached block, by block name. Every view of the block
+# keeps this array alive, so the block is only closed once it is gone.
+_block_arrays = WeakValueDictionary()  # type: WeakValueDictionary
+
+
+class GridHandle:
+    """Picklable description of a ModelGrid published in shared memory.
+
+    Holds the grid metadata and the names of the shared memory blocks of the
+    data and valid arrays.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        ages: np.ndarray,
+        columns: List[str],
+        age_labels: List[str],
+        data_name: str,
+        valid_name: str,
+        shape: Sequence[int],
+    ) -> None:
+        self.model = model
+        self.ages = ages
+        self.columns = columns
+        self.age_labels = age_labels
+        self.data_name = data_name
+        self.valid_name = valid_name
+        self.shape = tuple(shape)
+
+    def __repr__(self) -> str:
+        return "GridHandle(model={0!r}, data={1!r}, valid={2!r})".format(
+            self.model, self.data_name, self.valid_name
+        )
+
+
+class SharedGrids:
+    """Shared memory copies of model grids, owned by the publishing process.
+
+    Use as a context manager, or call close() once the workers are done.
+    The shared memory is released on close.
+    """
+
+    def __init__(self, grids: Sequence[ModelGrid]) -> None:
+        self._blocks = []  # type: List[Any]
+        self.handles = []  # type: List[GridHandle]
+        try:
+            for grid in grids:
+                data = self._share(grid.data)
+                valid = self._share(grid.valid)
+                self.handles.append(
+                    GridHandle(
+                        grid.model,
+                        np.array(grid.ages),
+                        list(grid.columns),
+                        list(grid.age_labels),
+                        data.name,
+                        valid.name,
+                        grid.data.shape,
+                    )
+                )
+        except BaseException:
+            self.close()
+            raise
+
+    def _share(self, array: np.ndarray) -> Any:
+        """Copy an array into a new shared memory block."""
+        from multiprocessing import shared_memory
+
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._blocks.append(block)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        return block
+
+    def __enter__(self) -> "SharedGrids":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the shared memory blocks."""
+        while self._blocks:
+            block = self._blocks.pop()
+            block.close()
+            block.unlink()
+
+
+def publish_grids(models: Sequence[str] = ("2003", "2015")) -> SharedGrids:
+    """Copy the grids of the models into shared memory.
+
+    Parameters
+    ----------
+    models: sequence of str
+        Models to publish. Default is both.
+
+    Returns
+    -------
+    shared: SharedGrids
+        Owner of the shared memory, its handles attribute is passed to
+        attach_grids.
+
+    """
+    return SharedGrids([get_grid(model) for model in models])
+
+
+def attach_grids(handles: Sequence[GridHandle]) -> List[ModelGrid]:
+    """Use the published grids for all table searches of this process.
+
+    The grids are read-only views of the shared memory, nothing is copied.
+    """
+    grids = []
+    for handle in handles:
+        data = _attach(handle.data_name)
+        valid = _attach(handle.valid_name)
+        data_array = np.ndarray(handle.shape, dtype=float, buffer=data.buf)
+        valid_array = np.ndarray(handle.shape[:2], dtype=bool, buffer=valid.buf)
+        _block_arrays[data.name] = data_array
+        _block_arrays[valid.name] = valid_array
+        grid = ModelGrid(
+            handle.model,
+            handle.ages,
+            handle.columns,
+            data_array,
+            valid_array,
+            age_labels=handle.age_labels,
+        )
+        register_grid(grid)
+        grids.append(grid)
+    _attached_grids.extend(grids)
+    return grids
+
+
+def detach_grids() -> None:
+    """Stop using the attached grids and close their shared memory blocks.
+
+    The grids registered by attach_grids are forgotten, and the caches that
+    may hold views of them are cleared, so the next searches load the grids
+    from the grid store. Blocks whose arrays are still referenced elsewhere
+    can not be closed yet and stay attached until the next call.
+    """
+    from baraffe_tables.table_search import (
+        interpolated_table_cache,
+        inverse_table_cache,
+        model_table_cache,
+        search_cache,
+    )
+    from baraffe_tables.tracks import track_cache
+
+    while _attached_grids:
+        _forget_grid(_attached_grids.pop())
+    for cache in (
+        model_table_cache,
+        interpolated_table_cache,
+        search_cache,
+        inverse_table_cache,
+        track_cache,
+    ):
+        cache.clear()
+    gc.collect()
+
+    still_used = []
+    for block in _attached:
+        # Closing a block unmaps it even if numpy views of it remain.
+        if block.name in _block_arrays:
+            still_used.append(block)
+            continue
+        try:
+            block.close()
+        except BufferError:
+            still_used.append(block)
+    _attached[:] = still_used
+
+
+def _forget_grid(grid: ModelGrid) -> None:
+    """Unregister a grid and drop the (Teff, log g) index built on it."""
+    unregister_grid(grid)
+    teff_logg = sys.modules.get("baraffe_tables.teff_logg")
+    if teff_logg is not None:
+        for model in [
+            model for model, index in teff_logg._indices.items() if index.grid is grid
+        ]:
+            del teff_logg._indices[model]
+
+
+def _attach(name: str) -> Any:
+    """Attach to an existing shared memory block without taking ownership."""
+    from multiprocessing import shared_memory
+
+    try:
+        block = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always tracks the block. Child processes share the
+        # resource tracker of the publisher, which already tracks it.
+        block = shared_memory.SharedMemory(name=name)
+    _attached.append(block)
+    return block
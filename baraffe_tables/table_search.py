@@ -1,12 +1,28 @@
 """Code to obtain and find row in Baraffe tables."""
+import contextlib
 import warnings
-from typing import Dict, List, Tuple
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
 
 import numpy as np
-import pkg_resources
-from scipy.interpolate import interp1d
 
-# Table model details
+from baraffe_tables.cache import LRUCache, ReadOnlyDict
+from baraffe_tables.grid_store import normalize_model
+from baraffe_tables.interpolation import (
+    ArrayLike,
+    age_mass_interpolation,
+    apply_interpolation_weights,
+    envelope_inverse,
+    interpolate_age_table,
+    interpolation_weights,
+    inverse_interpolation,
+    monotone_envelope,
+    monotonic_segments,
+    segment_interpolation_weights,
+)
+from baraffe_tables.model_grid import ModelGrid, get_grid
+
+# Table model details. The searches use the float age axes and column names of
+# the loaded ModelGrid, model_grid.get_grid(model).ages and .columns.
 model_ages_03 = [
     "0.001",
     "0.005",
@@ -38,6 +54,7 @@ cols_03 = [
 model_ages_15 = [
     "0.0005",
     "0.001",
+    "0.002",
     "0.003",
     "0.004",
     "0.005",
@@ -79,10 +96,30 @@ cols_15 = [
     "Mj",
     "Mh",
     "Mk",
+    "Ml",
     "Mll",
     "Mm",
 ]
 
+# Parsed model tables keyed by (model, age). Call model_table_cache.clear()
+# to release them, model_table_cache.stats() for hit/miss counts.
+model_table_cache = LRUCache(maxsize=64)
+
+# Tables interpolated in age, keyed by (model, age rounded to
+# interpolated_age_decimals). The tables are interpolated to the rounded age.
+interpolated_table_cache = LRUCache(maxsize=64)
+interpolated_age_decimals = 6
+
+# Opt-in memoization of baraffe_table_search (and so mass_table_search and
+# magnitude_table_search), see memoize_searches.
+search_cache = LRUCache(maxsize=1024)
+_search_memo = {"enabled": False, "decimals": None}  # type: Dict[str, Any]
+
+# Monotone inverse tables of the tables interpolated in age, keyed by (model,
+# age rounded to interpolated_age_decimals, column). The inverse tables of the
+# grid ages are kept by the ModelGrid itself.
+inverse_table_cache = LRUCache(maxsize=256)
+
 
 def find_bounding_ages(age: float, model_ages: List[str]) -> Tuple[str, str]:
     """ Find the two bounding model ages to age.
@@ -105,7 +142,7 @@ def find_bounding_ages(age: float, model_ages: List[str]) -> Tuple[str, str]:
 
     """
     age_array = np.asarray(model_ages)
-    m_ages = age_array.astype(np.float)
+    m_ages = age_array.astype(float)
     sortargs = np.argsort(m_ages)
     indx = m_ages[sortargs].searchsorted(age)  # Where to put age in sorted numpy array
     sorted_ages = age_array[sortargs]  # sort the array of strings
@@ -121,7 +158,9 @@ def interp_data_dicts(
 ) -> Dict[str, List[float]]:
     """Interpolate two data dictionaries to a new age.
 
-    The keys should be the same. The lower age may have extra rows at the start which are removed.
+    The keys should be the same. If both have a "M/Ms" column only the rows of
+    the masses in both tables are kept. Otherwise the lower age may have extra
+    rows at the start which are removed.
 
     (lower_age < age) and (upper_age > age)
 
@@ -134,23 +173,31 @@ def interp_data_dicts(
     assert set(lower_data.keys()) == set(
         upper_data.keys()
     ), "Data dicts do not have the same keys."
+    lower_rows, upper_rows = None, None
+    if "M/Ms" in lower_data:
+        # Align the rows on the masses present in both tables.
+        lower_mass = np.asarray(lower_data["M/Ms"])
+        upper_mass = np.asarray(upper_data["M/Ms"])
+        lower_rows = np.isin(lower_mass, upper_mass)
+        upper_rows = np.isin(upper_mass, lower_mass)
+
     interp_data_dict = {}
     for key in lower_data:
         data1, data2 = lower_data[key], upper_data[key]
 
+        if lower_rows is not None:
+            data1 = np.asarray(data1)[lower_rows]
+            data2 = np.asarray(data2)[upper_rows]
         while len(data1) != len(data2):
             # Lower age data may have more rows at lower masses so remove leading entries
             data1 = data1[1:]
 
+        data1, data2 = np.asarray(data1), np.asarray(data2)
         if np.all(data1 == data2):
             result = data1
         else:
-            ages = np.array([lower_age, upper_age])
-            data_in = np.vstack((data1, data2))
-
-            interp_function = interp1d(ages, data_in, axis=0)
-            data_out = interp_function(age)
-            result = np.round(data_out, 3)
+            weight = (age - lower_age) / (upper_age - lower_age)
+            result = np.round(data1 + weight * (data2 - data1), 3)
 
         interp_data_dict[key] = result
     return interp_data_dict
@@ -176,8 +223,9 @@ def age_table(
         The correct model table data.
     column_names: list of str
         List of the columns in the the table.
-    model_age: float
-        Age of table returned
+    model_age: str or float
+        Age of table returned, the age label of the table (e.g. "5.000") or
+        the age of an interpolated table.
 
     """
     if not isinstance(model, str):
@@ -185,72 +233,136 @@ def age_table(
     elif model not in ["2003", "03", "2015", "15"]:
         raise ValueError("Model value '{}' is not valid".format(model))
 
-    if model in "2003":
-        modelages = model_ages_03
-        base_name = "data/Baraffe2003/BaraffeCOND2003-"
-        skiprows = 18
-        cols = cols_03
-    else:
-        modelages = model_ages_15
-        base_name = "data/Baraffe2015/BaraffeBHAC15-"
-        skiprows = 22
-        cols = cols_15
-
-    closest_age = min(modelages, key=lambda x: abs(float(x) - age))  # Closest one
-
-    if (
-        age_interp
-        and (float(closest_age) != float(age))
-        and (float(modelages[0]) < age)
-        and (age < float(modelages[-1]))
-    ):
+    grid = get_grid(model)
+    ages = grid.ages
+    cols = list(grid.columns)
+
+    closest_index = grid.closest_age_index(age)
+
+    if age_interp and grid.between_tables(age):
         # Find two closest tables, interp values to given age.
-        lower_age, upper_age = find_bounding_ages(age, modelages)
-        print(
-            "Interpolating tables {0} Gyr and {1} Gyr to {2} Gyr".format(
-                lower_age, upper_age, age
+        table, model_age, computed = _interpolated_table(grid, age)
+        if computed:
+            lower_index, upper_index = grid.bounding_age_indices(age)
+            print(
+                "Interpolating tables {0} Gyr and {1} Gyr to {2} Gyr".format(
+                    grid.age_labels[lower_index], grid.age_labels[upper_index], age
+                )
             )
+        data_dict = {col: table[:, i] for i, col in enumerate(cols)}
+    else:
+        # Find closest model age table only.
+        # Returned as the age label of the table, as when loaded from the files.
+        model_ages = model_ages_03 if grid.model == "2003" else model_ages_15
+        model_age = next(
+            label for label in model_ages if float(label) == ages[closest_index]
         )
 
-        lower_data = model_age_table(base_name, lower_age, skiprows=skiprows)
-        upper_data = model_age_table(base_name, upper_age, skiprows=skiprows)
+        model_data = model_age_table(grid.model, model_age)
 
-        lower_data_dict = {}
-        upper_data_dict = {}
-        for i, col in enumerate(cols):
-            lower_data_dict[col] = lower_data[i]
-            upper_data_dict[col] = upper_data[i]
+        # Turn into Dict of values
+        data_dict = dict(zip(cols, model_data))
+    return data_dict, cols, model_age
 
-        # Interpolate age tables together
-        data_dict = interp_data_dicts(
-            age, lower_age, lower_data_dict, upper_age, upper_data_dict
-        )
-        model_age = age
+
+def _interpolated_table(grid: ModelGrid, age: float) -> Tuple[np.ndarray, float, bool]:
+    """Table of the grid interpolated to age, kept in interpolated_table_cache.
+
+    Returns the read-only (row, column) table, the rounded age it was
+    interpolated to and True if it was computed rather than found in the cache.
+    """
+    model_age = round(float(age), interpolated_age_decimals)
+    key = (grid.model, model_age)
+    table = interpolated_table_cache.get(key)
+    if table is not None:
+        return table, model_age, False
+    if grid.between_tables(model_age):
+        table = interpolate_age_table(grid, model_age)
+        table.setflags(write=False)
     else:
-        # Find closest model age table only.
-        model_age = closest_age
+        # Rounded onto a table of the grid.
+        table = grid.table(grid.closest_age_index(model_age))
+    interpolated_table_cache.put(key, table)
+    return table, model_age, True
 
-        model_data = model_age_table(base_name, model_age, skiprows=skiprows)
 
-        # Turn into Dict of values
-        data_dict = {col: model_data[i] for i, col in enumerate(cols)}
-    return data_dict, cols, model_age
+def _warn_bounds(ref_col: str, below: np.ndarray, above: np.ndarray) -> None:
+    """Warn once for values beyond the first or last rows of the reference column."""
+    if np.any(below):
+        warnings.warn(
+            "Interpolated values are outside the lower bound of {0!s}.".format(ref_col)
+        )
+    if np.any(above):
+        warnings.warn(
+            "Interpolated values are outside the upper bound of {0!s}.".format(ref_col)
+        )
+
+
+def _warn_ambiguous(ref_col: str, n_solutions: np.ndarray) -> None:
+    """Warn once for values found in more than one monotonic part of the column."""
+    if np.any(n_solutions > 1):
+        warnings.warn(
+            "Values of {0!s} match more than one table row, the lowest mass "
+            "solution is returned. Use inverse_table_search to get every "
+            "solution.".format(ref_col)
+        )
+
+
+def model_age_table(
+    model: str, model_age, skiprows: Optional[int] = None
+) -> np.ndarray:
+    """Load in model age table.
+
+    Tables are taken from the loaded ModelGrid and kept in
+    ``model_table_cache``. The returned array, of shape (column, row), is a
+    read-only view shared between calls.
 
+    Parameters
+    ----------
+    model: str
+        Baraffe model version [03, 15, 2003, 2015].
+    model_age: str or float
+        Age of the table (Gyr), e.g. "5.000" or 5.
+    skiprows: int, optional
+        Ignored, kept for the old (base_name, model_age, skiprows) calls.
+
+    Notes
+    -----
+    The old data file base names ("data/Baraffe2003/BaraffeCOND2003-" and
+    "data/Baraffe2015/BaraffeBHAC15-") are still accepted as the model, with
+    a DeprecationWarning.
+    """
+    if model in _legacy_base_names:
+        warnings.warn(
+            "model_age_table(base_name, model_age, skiprows) is deprecated, "
+            "use model_age_table(model, model_age).",
+            DeprecationWarning,
+        )
+        model = _legacy_base_names[model]
+    key = (normalize_model(model), float(model_age))
+    model_data = model_table_cache.get(key)
+    if model_data is None:
+        model_data = _load_model_age_table(model, model_age)
+        model_table_cache.put(key, model_data)
+    return model_data.view()
 
-def model_age_table(base_name, model_age, skiprows):
-    """Load in model age table."""
-    model_id = "p".join(str(model_age).split("."))  # Replace . with p in number str
-    model_name = base_name + model_id + "Gyr.dat"
-    model_name = pkg_resources.resource_filename("baraffe_tables", model_name)
 
-    model_data = np.loadtxt(model_name, skiprows=skiprows, unpack=False)
-    model_data = model_data.T
-    return model_data
+# Data file base names of the old model_age_table signature.
+_legacy_base_names = {
+    "data/Baraffe2003/BaraffeCOND2003-": "2003",
+    "data/Baraffe2015/BaraffeBHAC15-": "2015",
+}
+
+
+def _load_model_age_table(model: str, model_age) -> np.ndarray:
+    """Extract a single age table from the grid of the model."""
+    grid = get_grid(model)
+    return grid.table(grid.age_index(model_age)).T
 
 
 def mass_table_search(
     companion_mass: float, age: float, model: str = "2003", age_interp: bool = False
-) -> Dict[str, float]:
+) -> Mapping[str, float]:
     """Search Baraffe tables to find the companion entry given a mass value.
 
     Parameters
@@ -270,11 +382,11 @@ def mass_table_search(
         Companion parameters from Baraffe table, interpolated to the provided mass.
 
     """
-    model_data, __, __ = age_table(age, model=model, age_interp=age_interp)
-
     ref_val = companion_mass
     ref_col = "M/Ms"
-    companion_parameters = table_interpolation(model_data, ref_col, ref_val)
+    companion_parameters = baraffe_table_search(
+        ref_col, ref_val, age, model, age_interp=age_interp
+    )
     return companion_parameters  # as a dictionary
 
 
@@ -284,7 +396,7 @@ def magnitude_table_search(
     band: str = "K",
     model: str = "2003",
     age_interp: bool = False,
-) -> Dict[str, float]:
+) -> Mapping[str, float]:
     """Search Baraffe tables to find the companion entry given a band magnitude value.
 
     Parameters
@@ -320,9 +432,117 @@ def magnitude_table_search(
     return companion_parameters  # as a dictionary
 
 
+def mass_from_magnitude(
+    magnitudes: ArrayLike,
+    ages: ArrayLike,
+    band: str = "K",
+    model: str = "2003",
+    age_interp: bool = False,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Companion masses of band magnitudes from the precomputed inverse tables.
+
+    Each magnitude is located by binary search in the monotone inverse table
+    (see magnitude_envelope) of its age. Where the magnitudes are monotonic in
+    mass this is the mass magnitude_table_search finds. Otherwise it is the
+    lowest mass above which every companion is at least as bright.
+
+    Parameters
+    ----------
+    magnitudes: array_like
+        Absolute magnitudes of the companions in the band.
+    ages: array_like
+        Ages of star/system (Gyr), broadcast against the magnitudes.
+    band: str
+        Wavelength band to use.
+    model: str
+        Year of Baraffe model to use [2003 (default), 2015].
+    age_interp: bool
+        Interpolate tables across age. Default=False.
+
+    Returns
+    -------
+    masses: numpy.ndarray
+        Companion masses (M_sun), NaN beyond the masses of the table.
+    below: numpy.ndarray
+        True for magnitudes fainter than the lowest mass of the table.
+    above: numpy.ndarray
+        True for magnitudes brighter than the highest mass of the table.
+
+    """
+    grid = get_grid(model)
+    _band_column(grid, band)  # Validate the band before grouping the queries.
+    magnitudes, ages = np.broadcast_arrays(
+        np.asarray(magnitudes, dtype=float), np.asarray(ages, dtype=float)
+    )
+    shape = magnitudes.shape
+    magnitudes, ages = magnitudes.ravel(), ages.ravel()
+
+    # Age of the table searched for each query, the younger table wins ties.
+    table_ages = grid.ages[grid.closest_age_indices(ages)]
+    if age_interp:
+        rounded = np.round(ages, interpolated_age_decimals)
+        table_ages = np.where(grid.between_tables(rounded), rounded, table_ages)
+
+    masses = np.empty(len(magnitudes))
+    below = np.zeros(len(magnitudes), dtype=bool)
+    above = np.zeros(len(magnitudes), dtype=bool)
+    order = np.argsort(table_ages, kind="stable")
+    keys, starts = np.unique(table_ages[order], return_index=True)
+    for age, rows in zip(keys, np.split(order, starts[1:])):
+        masses[rows], below[rows], above[rows] = envelope_inverse(
+            *magnitude_envelope(age, band, grid.model, age_interp), magnitudes[rows]
+        )
+    return masses.reshape(shape), below.reshape(shape), above.reshape(shape)
+
+
+def magnitude_envelope(
+    age: float, band: str = "K", model: str = "2003", age_interp: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Monotone inverse table of a band magnitude at an age.
+
+    Returns
+    -------
+    masses: numpy.ndarray
+        Masses of the table (M_sun), increasing.
+    envelope: numpy.ndarray
+        Faintest magnitude of the companions of at least each mass, which
+        never increases with mass.
+
+    """
+    grid = get_grid(model)
+    column = _band_column(grid, band)
+    if not (
+        age_interp and grid.between_tables(round(float(age), interpolated_age_decimals))
+    ):
+        return grid.inverse_table(grid.closest_age_index(age), column)
+
+    def build() -> Tuple[np.ndarray, np.ndarray]:
+        table = _interpolated_table(grid, age)[0]
+        envelope = monotone_envelope(table[:, grid.column_index[column]])
+        envelope.setflags(write=False)
+        return table[:, grid.column_index["M/Ms"]], envelope
+
+    key = (grid.model, round(float(age), interpolated_age_decimals), column)
+    return inverse_table_cache.get_or_create(key, build)
+
+
+def _band_column(grid: ModelGrid, band: str) -> str:
+    """Magnitude column of a band, e.g. "Mk" for "K"."""
+    if not isinstance(band, str):
+        raise ValueError(
+            "Band {0} was given, when not given as a single string.".format(band)
+        )
+    column = "M{}".format(band.lower())
+    if column not in grid.column_index:
+        raise ValueError(
+            "Band {0} not in Baraffe table (model={1})".format(band, grid.model)
+        )
+    return column
+
+
 def baraffe_table_search(
     column: str, value: float, age: float, model: str, age_interp: bool = False
-) -> Dict[str, float]:
+) -> Mapping[str, float]:
     """Search Baraffe tables to find the companion entry given a column and value.
 
     Parameters
@@ -344,16 +564,266 @@ def baraffe_table_search(
         Companion parameters from Baraffe table, interpolated between the
         rows to the provided magnitude.
 
+    When memoization is on (see memoize_searches) the result is a read-only
+    mapping, shared between calls with the same arguments.
+
     """
-    found_table, cols, model_age = age_table(age, model=model, age_interp=age_interp)
-    if column not in cols:
+    if not _search_memo["enabled"]:
+        return _baraffe_table_search(column, value, age, model, age_interp)
+
+    value, age = float(np.ravel(value)[0]), float(age)
+    decimals = _search_memo["decimals"]
+    if decimals is not None:
+        value, age = round(value, decimals), round(age, decimals)
+    key = (column, value, age, get_grid(model).model, bool(age_interp))
+    entry = search_cache.get(key)
+    if entry is None:
+        with warnings.catch_warnings(record=True) as record:
+            warnings.simplefilter("always")
+            result = _baraffe_table_search(column, value, age, model, age_interp)
+        entry = (ReadOnlyDict(result), tuple(record))
+        search_cache.put(key, entry)
+
+    # Warnings are raised again for every call, not only the first.
+    result, record = entry
+    for warning in record:
+        warnings.warn_explicit(
+            warning.message, warning.category, warning.filename, warning.lineno
+        )
+    return result
+
+
+def _baraffe_table_search(
+    column: str, value: float, age: float, model: str, age_interp: bool = False
+) -> Dict[str, float]:
+    """Uncached baraffe_table_search."""
+    grid = get_grid(model)
+    if column not in grid.column_index:
+        raise ValueError(
+            "Column {0} not in Baraffe table (age={1}, model={2})".format(
+                column, grid.ages[grid.closest_age_index(age)], model
+            )
+        )
+
+    ref_index = grid.column_index[column]
+    if age_interp and grid.between_tables(age):
+        # Bilinear interpolation between the two tables bounding the age.
+        results, below, above, n_solutions = age_mass_interpolation(
+            grid, ref_index, np.ravel(value)[:1], np.array([age]), return_solutions=True
+        )
+    else:
+        index = grid.closest_age_index(age)
+        results, below, above, n_solutions = _interpolate_rows(
+            grid.table(index),
+            ref_index,
+            np.ravel(value)[:1],
+            grid.segments(index, column),
+        )
+    _warn_bounds(column, below, above)
+    _warn_ambiguous(column, n_solutions)
+    return dict(zip(grid.columns, results[0]))
+
+
+@contextlib.contextmanager
+def memoize_searches(
+    enabled: bool = True, decimals: Optional[int] = None, maxsize: Optional[int] = None
+) -> Iterator[LRUCache]:
+    """Turn memoization of the scalar table searches on or off inside a with block.
+
+    Memoized searches return read-only mappings (cache.ReadOnlyDict, which
+    can be pickled), and warnings raised by the search are raised again on
+    every cache hit. The previous settings are restored on exit. The cached
+    results are kept in search_cache, whose stats() give the hit and miss
+    counts.
+
+    The switch is global to the process: it applies to the searches of
+    every thread while the block runs, and blocks entered from several
+    threads at once restore each other's settings in any order. Turn it on
+    once around the threaded work, not from within each thread.
+
+    Parameters
+    ----------
+    enabled: bool
+        Memoize the searches. Default=True.
+    decimals: int, optional
+        Round the value and age to this many decimals before searching, so
+        nearby queries share a cache entry. Default is no rounding.
+    maxsize: int, optional
+        New maximum size of search_cache.
+
+    """
+    previous = dict(_search_memo)
+    if maxsize is not None:
+        search_cache.resize(maxsize)
+    _search_memo.update(enabled=enabled, decimals=decimals)
+    try:
+        yield search_cache
+    finally:
+        _search_memo.update(previous)
+
+
+def inverse_table_search(
+    column: str, value: float, age: float, model: str = "2003", age_interp: bool = False
+) -> Tuple[List[Dict[str, float]], bool]:
+    """Find every Baraffe table entry where a column takes the given value.
+
+    Columns such as the magnitudes, Teff or R are not monotonic in mass for
+    every table, so one value can match several masses. The table column is
+    split into its monotonic segments and each segment is searched.
+
+    Parameters
+    ----------
+    column: str
+        Column name to search.
+    value: float
+        Parameter value to find parameters for.
+    age: float
+        Age of star/system (Gyr).
+    model: str
+        Year of Baraffe model to use [2003 (default), 2015].
+    age_interp: bool
+        Interpolate tables across age. Default=False.
+
+    Returns
+    -------
+    solutions: list of Dict[str, float]
+        Companion parameters of each solution, by increasing mass. Empty if
+        the value is outside the range of the column.
+    ambiguous: bool
+        True if there is more than one solution.
+
+    """
+    grid = get_grid(model)
+    if column not in grid.column_index:
         raise ValueError(
             "Column {0} not in Baraffe table (age={1}, model={2})".format(
-                column, model_age, model
+                column, grid.ages[grid.closest_age_index(age)], model
             )
         )
+    ref_index = grid.column_index[column]
+    if age_interp and grid.between_tables(age):
+        table, __, __ = _interpolated_table(grid, age)
+        segments = monotonic_segments(table[:, ref_index])
+    else:
+        index = grid.closest_age_index(age)
+        table, segments = grid.table(index), grid.segments(index, column)
+
+    solutions = []  # type: List[Dict[str, float]]
+    for index, weight in inverse_interpolation(table[:, ref_index], value, segments):
+        row = apply_interpolation_weights(table, np.array(index), np.array(weight))
+        solutions.append(dict(zip(grid.columns, row)))
+    solutions.sort(key=lambda solution: solution["M/Ms"])
+    return solutions, len(solutions) > 1
+
+
+def batch_table_search(
+    column: str,
+    values: ArrayLike,
+    ages: ArrayLike,
+    model: str = "2003",
+    age_interp: bool = False,
+) -> Dict[str, np.ndarray]:
+    """Vectorized baraffe_table_search over arrays of values and ages.
+
+    The values and ages are broadcast against each other, so a single age
+    can be given for many values or vice versa. Queries sharing a table are
+    interpolated together in one pass.
+
+    Parameters
+    ----------
+    column: str
+        Column name to search.
+    values: array_like
+        Parameter values to find parameters for.
+    ages: array_like
+        Ages of star/system (Gyr).
+    model: str
+        Year of Baraffe model to use [2003 (default), 2015].
+    age_interp: bool
+        Interpolate tables across age. Default=False.
+
+    Returns
+    -------
+    companion_parameters: Dict[str, numpy.ndarray]
+        Arrays of companion parameters, with the broadcast shape of values
+        and ages, for each column of the Baraffe table.
+
+    """
+    if not isinstance(model, str):
+        raise ValueError("Model is not the valid type 'str'.")
+    grid = get_grid(model)
+    if column not in grid.column_index:
+        raise ValueError(
+            "Column {0} not in Baraffe table (model={1})".format(column, model)
+        )
+    ref_index = grid.column_index[column]
 
-    return table_interpolation(found_table, column, value)
+    values, ages = np.broadcast_arrays(
+        np.asarray(values, dtype=float), np.asarray(ages, dtype=float)
+    )
+    shape = values.shape
+    values, ages = values.ravel(), ages.ravel()
+
+    # Closest table of each query, the younger table wins ties.
+    closest = grid.closest_age_indices(ages)
+    if age_interp:
+        interpolate = grid.between_tables(ages)
+    else:
+        interpolate = np.zeros(len(ages), dtype=bool)
+
+    results = np.empty((len(values), len(grid.columns)))
+    below = np.zeros(len(values), dtype=bool)
+    above = np.zeros(len(values), dtype=bool)
+    n_solutions = np.ones(len(values), dtype=int)
+    for index in np.unique(closest[~interpolate]):
+        rows = (closest == index) & ~interpolate
+        (
+            results[rows],
+            below[rows],
+            above[rows],
+            n_solutions[rows],
+        ) = _interpolate_rows(
+            grid.table(index), ref_index, values[rows], grid.segments(index, column)
+        )
+
+    if np.any(interpolate):
+        (
+            results[interpolate],
+            below[interpolate],
+            above[interpolate],
+            n_solutions[interpolate],
+        ) = age_mass_interpolation(
+            grid,
+            ref_index,
+            values[interpolate],
+            ages[interpolate],
+            return_solutions=True,
+        )
+
+    _warn_bounds(column, below, above)
+    _warn_ambiguous(column, n_solutions)
+
+    return {col: results[:, i].reshape(shape) for i, col in enumerate(grid.columns)}
+
+
+def _interpolate_rows(
+    table: np.ndarray,
+    ref_index: int,
+    values: np.ndarray,
+    segments: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Interpolate every column of a (row, column) table to the reference values.
+
+    Returns the (value, column) results, masks of the values beyond the
+    first and last table rows and the number of solutions of each value.
+    The lowest mass solution is used for values with several solutions.
+    """
+    if segments is None:
+        segments = monotonic_segments(table[:, ref_index])
+    index, weight, below, above, n_solutions = segment_interpolation_weights(
+        table[:, ref_index], values, segments
+    )
+    return apply_interpolation_weights(table, index, weight), below, above, n_solutions
 
 
 def table_interpolation(
@@ -380,31 +850,18 @@ def table_interpolation(
         Result from interpolation of each dict item to the reference.
 
     """
-    column_reversed = False
-    result_parameters = {}
-    for key, y_data in data.items():
-        x_data = data[ref_col]
-        if x_data[-1] < x_data[0]:
-            # Reverse data if not increasing.
-            x_data = x_data[::-1]
-            y_data = y_data[::-1]
-            column_reversed = True
-
-        result_parameters[key] = np.interp(ref_value, x_data, y_data)
-
-        if isinstance(result_parameters[key], (np.ndarray, list)):
-            result_parameters[key] = result_parameters[key][0]
+    keys = list(data)
+    table = np.column_stack([data[key] for key in keys])
+    ref_value = np.ravel(ref_value)[0]
+    x_data = np.asarray(data[ref_col], dtype=float)
+    index, weight, below, above, n_solutions = segment_interpolation_weights(
+        x_data, ref_value, monotonic_segments(x_data)
+    )
+    row = apply_interpolation_weights(table, index, weight)
+    result_parameters = dict(zip(keys, row))
 
     # Raising warning if value outside bounds of table
-    result = np.interp(ref_value, x_data, y_data, left=-99999999, right=99999999)
-    indicator = result * (-1) ** (column_reversed)
-    if indicator == -99999999:
-        warnings.warn(
-            "Interpolated values are outside the lower bound of {0!s}.".format(ref_col)
-        )
-    elif indicator == 99999999:
-        warnings.warn(
-            "Interpolated values are outside the upper bound of {0!s}.".format(ref_col)
-        )
+    _warn_bounds(ref_col, below, above)
+    _warn_ambiguous(ref_col, n_solutions)
 
     return result_parameters
@@ -9,23 +9,22 @@ Temperature: str
     Temperature.
 logg: float
     Logg.
-age: float
-    Stellar Age. (Closest model is used)
-model: str
-    Choose between the 2003 and 2015 Baraffe modelling.
+
+The age, mass and radius are interpolated between the model tables with
+baraffe_tables.teff_logg.teff_logg_search, which also looks up many objects
+at once. The 2015 models are used if they cover the temperature and logg,
+otherwise the 2003 models.
 
 """
-# TODO: Interpolate between tables?
 
 import argparse
 import sys
 from typing import Union
 import numpy as np
-from astropy.constants import M_jup, M_sun
 
-from baraffe_tables.table_search import baraffe_table_search
-from baraffe_tables.table_search import model_ages_15, model_ages_03
-import matplotlib.pyplot as plt
+from baraffe_tables.model_grid import get_grid
+from baraffe_tables.table_search import batch_table_search
+from baraffe_tables.teff_logg import teff_logg_search
 
 
 def _parser() -> object:
@@ -57,96 +56,83 @@ def main(temp: Union[float, int], logg: float, plot: bool = False) -> int:
         Plot teff vs logg.
 
     """
-    ages_03 = np.asarray(model_ages_03, dtype=float)
-    ages_15 = np.asarray(model_ages_15, dtype=float)
-
-    loggs_03 = []
-    loggs_15 = []
-    masses_03 = []
-    masses_15 = []
-    radii_03 = []
-    radii_15 = []
-
-    for age in ages_03:
-        result = baraffe_table_search("Teff", temp, age, model="03")
-        masses_03.append(result["M/Ms"])
-        loggs_03.append(result["g"])
-        radii_03.append(result["R"])
-
-    for age in ages_15:
-        result = baraffe_table_search("Teff", temp, age, model="15")
-        masses_15.append(result["M/Ms"])
-        loggs_15.append(result["g"])
-        radii_15.append(result["R/Rs"])
-
-    loggs_03 = np.asarray(loggs_03)
-    loggs_15 = np.asarray(loggs_15)
-    masses_03 = np.asarray(masses_03)
-    masses_15 = np.asarray(masses_15)
-    radii_03 = np.asarray(radii_03)
-    radii_15 = np.asarray(radii_15)
-
-    sim_age_15 = (ages_15[np.argmin(abs(loggs_15 - logg))])
-    sim_age_03 = (ages_03[np.argmin(abs(loggs_03 - logg))])
-
-    if plot:
-        plt.subplot(111)
-        plt.axhline(logg, alpha=0.5)
-        plt.semilogx(ages_15, loggs_15, ".-", label="Baraffe 2015")
-        plt.semilogx(ages_03, loggs_03, ".-", label="Baraffe 2003")
-        plt.plot(sim_age_03, logg, "h", label="closest 03")
-        plt.plot(sim_age_15, logg, "+", label="closest 15")
-        plt.xlabel("Age (Gyr)")
-        plt.ylabel("logg (dex)")
-        plt.legend()
-        plt.title("Temperature {} K".format(temp))
-        plt.annotate("Exploring evolutionary models to \nfind the table/age that matches \nTemp & logg", xy=(.5, .35), xycoords="axes fraction")
-        plt.tight_layout()
-        plt.show()
-
-        plt.semilogx(ages_03, masses_03, "+-")
-        plt.semilogx(ages_15, masses_15, ".-")
-        plt.xlabel("Age (Gyr)")
-        plt.ylabel("Mass (M/Ms)")
-        plt.title("Temp= {}, Logg = {}".format(temp, logg))
-        plt.show()
-
-        plt.semilogx(ages_03, radii_03, "+-")
-        plt.semilogx(ages_15, radii_15, ".-")
-        plt.xlabel("Age (Gyr)")
-        plt.ylabel("Radii (R/Rs)")
-        plt.title("Temp= {}, Logg = {}".format(temp, logg))
-        plt.show()
-
-        plt.plot(radii_03, masses_03, "+-")
-        plt.plot(radii_15, masses_15, ".-")
-        plt.xlabel("Radii (R/Rs)")
-        plt.ylabel("Mass (M/Ms)")
-        plt.title("Temp= {}, Logg = {}".format(temp, logg))
-        plt.show()
-
-    # Since my cutoffs are around 3500K I will use the 2015 models
-    # TODO Add temperature range checks that the value is inside the temperature range
-
-    result15 = baraffe_table_search("Teff", temp, age=sim_age_15, model="15")
-    result03 = baraffe_table_search("Teff", temp, age=sim_age_03, model="03")
-
-    # Add age to table
-    result15["age"] = sim_age_15
-    result03["age"] = sim_age_03
+    # Preference for 2015 models due to being newer and they have a higher age
+    # resolution
+    for model in ("15", "03"):
+        found = teff_logg_search(temp, logg, model=model)
+        if not np.isnan(found["age"]):
+            break
+    else:
+        raise ValueError(
+            "Temp {0} and logg {1} are not within either model grid".format(temp, logg)
+        )
+    result = {key: float(value) for key, value in found.items()}
 
     # Add jupyter mass
-    result15["M/Mjup"] = result15["M/Ms"] * (M_sun / M_jup).value
-    result03["M/Mjup"] = result03["M/Ms"] * (M_sun / M_jup).value
-
-    if temp == result15["Teff"]:
-        # Preference for 2015 models due to being newer and they have a higher age resolution
-        return result15
-    elif temp == result03["Teff"]:
-        return result03
-    else:
-        raise ValueError("Temp {} is not within either model grid".format(temp))
+    from astropy.constants import M_jup, M_sun
+
+    result["M/Mjup"] = result["M/Ms"] * (M_sun / M_jup).value
 
+    if plot:
+        _plot_age_logg(temp, logg, result["age"])
+    return result
+
+
+def _plot_age_logg(temp: Union[float, int], logg: float, age: float) -> None:
+    """Plot the log g, mass and radius of the temperature at every model age."""
+    import matplotlib.pyplot as plt
+
+    ages_03 = np.asarray(get_grid("03").ages)
+    ages_15 = np.asarray(get_grid("15").ages)
+
+    # Search the tables of every age at once.
+    result_03 = batch_table_search("Teff", temp, ages_03, model="03")
+    result_15 = batch_table_search("Teff", temp, ages_15, model="15")
+
+    loggs_03 = result_03["g"]
+    loggs_15 = result_15["g"]
+    masses_03 = result_03["M/Ms"]
+    masses_15 = result_15["M/Ms"]
+    radii_03 = result_03["R"]
+    radii_15 = result_15["R/Rs"]
+
+    plt.subplot(111)
+    plt.axhline(logg, alpha=0.5)
+    plt.semilogx(ages_15, loggs_15, ".-", label="Baraffe 2015")
+    plt.semilogx(ages_03, loggs_03, ".-", label="Baraffe 2003")
+    plt.plot(age, logg, "h", label="interpolated")
+    plt.xlabel("Age (Gyr)")
+    plt.ylabel("logg (dex)")
+    plt.legend()
+    plt.title("Temperature {} K".format(temp))
+    plt.annotate(
+        "Exploring evolutionary models to \nfind the table/age that matches \nTemp & logg",
+        xy=(0.5, 0.35),
+        xycoords="axes fraction",
+    )
+    plt.tight_layout()
+    plt.show()
+
+    plt.semilogx(ages_03, masses_03, "+-")
+    plt.semilogx(ages_15, masses_15, ".-")
+    plt.xlabel("Age (Gyr)")
+    plt.ylabel("Mass (M/Ms)")
+    plt.title("Temp= {}, Logg = {}".format(temp, logg))
+    plt.show()
+
+    plt.semilogx(ages_03, radii_03, "+-")
+    plt.semilogx(ages_15, radii_15, ".-")
+    plt.xlabel("Age (Gyr)")
+    plt.ylabel("Radii (R/Rs)")
+    plt.title("Temp= {}, Logg = {}".format(temp, logg))
+    plt.show()
+
+    plt.plot(radii_03, masses_03, "+-")
+    plt.plot(radii_15, masses_15, ".-")
+    plt.xlabel("Radii (R/Rs)")
+    plt.ylabel("Mass (M/Ms)")
+    plt.title("Temp= {}, Logg = {}".format(temp, logg))
+    plt.show()
 
 if __name__ == '__main__':
     args = vars(_parser())
@@ -0,0 +1,201 @@
+"""Look up model parameters from Teff and log g.
+
+Field objects have a measured temperature and surface gravity but no known
+age, so a search in a single age table cannot be used. A TeffLoggIndex
+splits every (age, mass) cell of a model grid, between two neighbouring ages
+and two neighbouring masses, into two triangles in the
+(log10 Teff, log g) plane once. Any (Teff, log g) pair is then mapped to the
+age, mass and the other table columns by linear interpolation inside its
+triangle.
+
+Only the cells of the grid are triangulated, so pairs in the gaps between
+the tracks, even inside the outline of the whole grid, are outside the grid.
+The age is interpolated in log10, as the grid ages are spaced roughly
+logarithmically.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from baraffe_tables.interpolation import ArrayLike
+from baraffe_tables.model_grid import ModelGrid, get_grid
+
+
+class TeffLoggIndex:
+    """Triangulation of the cells of a model grid in (log10 Teff, log g).
+
+    Parameters
+    ----------
+    grid: ModelGrid
+        Model grid to index.
+    n_buckets: int
+        Number of buckets along each axis of the plane, used to find the
+        triangles that may hold a point.
+
+    """
+
+    # Queries located at once, to bound the memory of the candidate search.
+    chunk_size = 65536
+
+    def __init__(self, grid: ModelGrid, n_buckets: int = 128) -> None:
+        self.grid = grid
+        self.columns = ["age"] + list(grid.columns)
+
+        n_ages, n_masses = grid.valid.shape
+        points = np.column_stack(
+            (
+                np.log10(grid.data[:, :, grid.column_index["Teff"]].ravel()),
+                grid.data[:, :, grid.column_index["g"]].ravel(),
+            )
+        )
+        ages = np.broadcast_to(grid.ages[:, None], grid.valid.shape)
+        self._values = np.column_stack(
+            (np.log10(ages).ravel(), grid.data.reshape(n_ages * n_masses, -1))
+        )
+
+        # Two triangles of each cell whose corners are valid, ordered by age
+        # then mass so the youngest cell wins where cells overlap.
+        corner = (
+            np.arange(n_ages * n_masses).reshape(n_ages, n_masses)[:-1, :-1].ravel()
+        )
+        triangles = np.stack(
+            (
+                np.column_stack((corner, corner + 1, corner + n_masses)),
+                np.column_stack((corner + n_masses + 1, corner + n_masses, corner + 1)),
+            ),
+            axis=1,
+        ).reshape(-1, 3)
+        triangles = triangles[grid.valid.ravel()[triangles].all(axis=1)]
+        first = points[triangles[:, 0]]
+        edges = np.stack(
+            (points[triangles[:, 1]] - first, points[triangles[:, 2]] - first), axis=-1
+        )
+        area = np.linalg.det(edges)
+        keep = np.abs(area) > 0
+        self._triangles = triangles[keep]
+        self._first = first[keep]
+        # Maps a point relative to the first corner to its barycentric weights.
+        self._inverse = np.linalg.inv(edges[keep])
+
+        corners = points[self._triangles]
+        self._low = corners.min(axis=1).min(axis=0)
+        self._bucket_size = (corners.max(axis=1).max(axis=0) - self._low) / n_buckets
+        self._n_buckets = n_buckets
+        low_bucket = self._bucket(corners.min(axis=1))
+        high_bucket = self._bucket(corners.max(axis=1))
+        buckets = [[] for __ in range(n_buckets * n_buckets)]  # type: List[List[int]]
+        for i, ((x0, y0), (x1, y1)) in enumerate(zip(low_bucket, high_bucket)):
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    buckets[x * n_buckets + y].append(i)
+        # The triangles of bucket b are
+        # _bucket_triangles[_bucket_starts[b]:_bucket_starts[b + 1]].
+        self._bucket_starts = np.cumsum([0] + [len(bucket) for bucket in buckets])
+        self._bucket_triangles = np.array(
+            [i for bucket in buckets for i in bucket], dtype=int
+        )
+
+    def __repr__(self) -> str:
+        return "TeffLoggIndex(model={0!r}, triangles={1})".format(
+            self.grid.model, len(self._triangles)
+        )
+
+    def _bucket(self, xy: np.ndarray) -> np.ndarray:
+        """(x, y) bucket of points, clipped to the buckets."""
+        with np.errstate(invalid="ignore"):
+            bucket = np.floor((xy - self._low) / self._bucket_size)
+        return np.clip(np.nan_to_num(bucket), 0, self._n_buckets - 1).astype(int)
+
+    def __call__(self, teff: ArrayLike, logg: ArrayLike) -> Dict[str, np.ndarray]:
+        """Interpolate the grid to arrays of Teff (K) and log g.
+
+        The arrays are broadcast against each other. Values outside the cells
+        of the grid are NaN. The returned Teff and g are the query values.
+        """
+        teff, logg = np.broadcast_arrays(
+            np.asarray(teff, dtype=float), np.asarray(logg, dtype=float)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xy = np.column_stack((np.log10(teff).ravel(), logg.ravel()))
+        results = np.full((len(xy), len(self.columns)), np.nan)
+        for start in range(0, len(xy), self.chunk_size):
+            part = slice(start, start + self.chunk_size)
+            results[part] = self._interpolate(xy[part])
+
+        found = ~np.isnan(results[:, 0])
+        results[:, 0] = 10 ** results[:, 0]
+        results[:, self.columns.index("Teff")] = np.where(found, teff.ravel(), np.nan)
+        results[:, self.columns.index("g")] = np.where(found, logg.ravel(), np.nan)
+        return {
+            col: results[:, i].reshape(teff.shape) for i, col in enumerate(self.columns)
+        }
+
+    def _interpolate(self, xy: np.ndarray) -> np.ndarray:
+        """Interpolated values of points, NaN outside every triangle."""
+        bucket = self._bucket(xy)
+        bucket = bucket[:, 0] * self._n_buckets + bucket[:, 1]
+        starts = self._bucket_starts[bucket]
+        counts = self._bucket_starts[bucket + 1] - starts
+        # One (query, candidate triangle) pair per triangle of the query's bucket.
+        query = np.repeat(np.arange(len(xy)), counts)
+        offset = np.arange(len(query)) - np.repeat(np.cumsum(counts) - counts, counts)
+        candidate = self._bucket_triangles[np.repeat(starts, counts) + offset]
+
+        weights = np.einsum(
+            "pij,pj->pi", self._inverse[candidate], xy[query] - self._first[candidate]
+        )
+        weights = np.column_stack((1 - weights.sum(axis=1), weights))
+        with np.errstate(invalid="ignore"):
+            inside = np.all(weights >= -1e-9, axis=1)
+        # The pairs of a query are in triangle order, so the first pair inside
+        # is the youngest triangle holding it.
+        found, first = np.unique(query[inside], return_index=True)
+        pairs = np.flatnonzero(inside)[first]
+
+        values = np.full((len(xy), self._values.shape[1]), np.nan)
+        corners = self._triangles[candidate[pairs]]
+        values[found] = np.einsum(
+            "qk,qkc->qc", np.clip(weights[pairs], 0, 1), self._values[corners]
+        )
+        return values
+
+
+_indices = {}  # type: Dict[str, TeffLoggIndex]
+
+
+def get_teff_logg_index(model: str, grid: Optional[ModelGrid] = None) -> TeffLoggIndex:
+    """Return the (Teff, log g) index of a model, building it on first use.
+
+    The index is rebuilt if a different grid was registered for the model.
+    """
+    grid = get_grid(model) if grid is None else grid
+    index = _indices.get(grid.model)
+    if index is None or index.grid is not grid:
+        index = TeffLoggIndex(grid)
+        _indices[grid.model] = index
+    return index
+
+
+def teff_logg_search(
+    teff: ArrayLike, logg: ArrayLike, model: str = "2015"
+) -> Dict[str, np.ndarray]:
+    """Find the model age, mass and parameters of objects with Teff and log g.
+
+    Parameters
+    ----------
+    teff: array_like
+        Effective temperatures (K).
+    logg: array_like
+        Surface gravities, log g (cgs).
+    model: str
+        Year of Baraffe model to use [2003, 2015 (default)].
+
+    Returns
+    -------
+    parameters: Dict[str, numpy.ndarray]
+        "age" (Gyr) and every column of the Baraffe tables, with the
+        broadcast shape of teff and logg. Teff and g are the inputs. NaN
+        outside the cells of the model grid.
+
+    """
+    return get_teff_logg_index(model)(teff, logg)
@@ -0,0 +1,213 @@
+"""Test the asyncio interface with a local stand-in provider."""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from baraffe_tables import aio
+from baraffe_tables.aio import (
+    AsyncStellarParams,
+    companion_params_async,
+    flux_ratios_async,
+)
+from baraffe_tables.flux_ratio_to_mass import compute_companion_params
+from baraffe_tables.mass_to_flux_ratio import compute_flux_ratios
+from baraffe_tables.providers import LocalCatalogProvider
+
+recorded_objects = os.path.join(
+    os.path.dirname(__file__), "data", "simbad_query_objects.ecsv"
+)
+
+
+class SlowProvider(LocalCatalogProvider):
+    """Catalog provider that blocks like a network lookup and can fail."""
+
+    def __init__(self, delay=0.05, failures=0, error=ConnectionError):
+        super().__init__(recorded_objects, name_column="user_specified_id")
+        self.delay = delay
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def get_stellar_params(self, star_name):
+        with self.lock:
+            self.calls += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            fail = self.calls <= self.failures
+        try:
+            time.sleep(self.delay)
+            if fail:
+                raise self.error("SIMBAD unavailable")
+            return super().get_stellar_params(star_name)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_flux_ratios_async_matches_sync():
+    provider = SlowProvider(delay=0)
+    db = AsyncStellarParams(provider)
+    ratios, params = run(flux_ratios_async("HD30501", 90, 5, db=db))
+    expected, expected_params = compute_flux_ratios(
+        provider.get_stellar_params("HD30501"), 90, 5
+    )
+    assert ratios == expected
+    assert params == expected_params
+    db.close()
+
+
+def test_companion_params_async_matches_sync():
+    provider = SlowProvider(delay=0)
+    db = AsyncStellarParams(provider)
+    companions = run(
+        companion_params_async("HD4747", 0.001, 5, bands=["J", "K"], db=db)
+    )
+    assert list(companions) == ["J", "K"]
+    star_params = provider.get_stellar_params("HD4747")
+    for band, (mag, params) in companions.items():
+        assert (mag, params) == compute_companion_params(
+            star_params, 0.001, 5, band=band
+        )
+    db.close()
+
+
+def test_concurrency_is_bounded():
+    provider = SlowProvider(delay=0.05)
+    db = AsyncStellarParams(provider, max_concurrency=2)
+    names = ["HD30501", "HD4747", "HD202206", "HD162020"] * 2
+
+    async def lookup_all():
+        return await asyncio.gather(*(db.get_stellar_params(name) for name in names))
+
+    results = run(lookup_all())
+    assert [row["user_specified_id"][0] for row in results] == names
+    assert provider.max_running == 2
+    db.close()
+
+
+def test_instance_is_reused_across_event_loops():
+    provider = SlowProvider(delay=0.02)
+    db = AsyncStellarParams(provider, max_concurrency=1)
+    names = ["HD30501", "HD4747", "HD202206"]
+
+    async def lookup_all():
+        return await asyncio.gather(*(db.get_stellar_params(name) for name in names))
+
+    for __ in range(2):
+        results = run(lookup_all())
+        assert [row["user_specified_id"][0] for row in results] == names
+    assert provider.max_running == 1
+    db.close()
+
+
+def test_async_with_closes_the_default_executor():
+    provider = SlowProvider(delay=0)
+
+    async def lookup():
+        async with AsyncStellarParams(provider) as db:
+            await db.get_stellar_params("HD4747")
+        return db
+
+    db = run(lookup())
+    assert db.executor is None
+
+
+def test_given_executor_is_not_shut_down():
+    with ThreadPoolExecutor(1) as executor:
+        db = AsyncStellarParams(SlowProvider(delay=0), executor=executor)
+        run(db.get_stellar_params("HD4747"))
+        db.close()
+        assert db.executor is executor
+        assert executor.submit(int, "1").result() == 1
+
+
+def test_pipelines_share_the_default_db(monkeypatch):
+    provider = SlowProvider(delay=0.02)
+    monkeypatch.setattr(
+        aio, "_default_db", AsyncStellarParams(provider, max_concurrency=1)
+    )
+
+    async def pipelines():
+        return await asyncio.gather(
+            flux_ratios_async("HD30501", 90, 5),
+            companion_params_async("HD4747", 0.001, 5, bands=["K"]),
+        )
+
+    run(pipelines())
+    assert aio.default_db() is aio._default_db
+    assert provider.calls == 2
+    assert provider.max_running == 1
+    aio.default_db().close()
+
+
+def test_lookups_are_retried():
+    provider = SlowProvider(delay=0, failures=2)
+    db = AsyncStellarParams(provider, retries=2, retry_delay=0.001)
+    assert run(db.get_stellar_params("HD4747"))["FLUX_K"][0] == 5.30
+    assert provider.calls == 3
+    db.close()
+
+    provider = SlowProvider(delay=0, failures=3)
+    db = AsyncStellarParams(provider, retries=2, retry_delay=0.001)
+    with pytest.raises(ConnectionError):
+        run(db.get_stellar_params("HD4747"))
+    assert provider.calls == 3
+    db.close()
+
+
+def test_unknown_stars_are_not_retried():
+    provider = SlowProvider(delay=0)
+    db = AsyncStellarParams(provider, retry_delay=0.001)
+    with pytest.raises(LookupError):
+        run(db.get_stellar_params("HD 10"))
+    assert provider.calls == 1
+    db.close()
+
+
+def test_lookups_time_out():
+    provider = SlowProvider(delay=0.5)
+    db = AsyncStellarParams(provider, timeout=0.01, retries=1, retry_delay=0.001)
+    with pytest.raises(asyncio.TimeoutError):
+        run(db.get_stellar_params("HD4747"))
+    assert provider.calls == 2
+    db.close()
+
+
+def test_timed_out_lookups_keep_their_slot():
+    provider = SlowProvider(delay=0.1)
+    executor = ThreadPoolExecutor(4)
+    db = AsyncStellarParams(
+        provider,
+        max_concurrency=1,
+        timeout=0.02,
+        retries=2,
+        retry_delay=0.001,
+        executor=executor,
+    )
+    with pytest.raises(asyncio.TimeoutError):
+        run(db.get_stellar_params("HD4747"))
+    executor.shutdown(wait=True)
+    assert provider.calls == 3
+    assert provider.max_running == 1
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        AsyncStellarParams(max_concurrency=0)
+    with pytest.raises(ValueError):
+        AsyncStellarParams(retries=-1)
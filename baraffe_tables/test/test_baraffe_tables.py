@@ -1,5 +1,6 @@
 """Test companion/flux ratio codes with Baraffe tables."""
 import sys
+import warnings
 
 import numpy as np
 import pytest
@@ -22,7 +23,10 @@ from baraffe_tables.flux_ratio_to_mass import (
 from baraffe_tables.table_search import (
     age_table,
     baraffe_table_search,
+    batch_table_search,
+    inverse_table_search,
     magnitude_table_search,
+    mass_from_magnitude,
     mass_table_search,
 )
 
@@ -452,3 +456,147 @@ def test_table_search_outside_bound_produces_error(
     assert str(
         record[0].message
     ) == "Interpolated values are outside the {0!s} bound of {1!s}.".format(bound, col)
+
+
+@pytest.mark.parametrize(
+    "col, values",
+    [
+        ("M/Ms", [0.02, 0.05, 0.08, 0.09, 0.1]),
+        ("Teff", [1000, 2000, 2600]),
+        ("Mk", [9, 10, 12]),
+    ],
+)
+def test_batch_table_search_matches_scalar_search(
+    col, values, baraffe_model, age_interp
+):
+    ages = [0.5, 1, 3.5, 4.6, 5]
+    results = batch_table_search(
+        col,
+        np.asarray(values)[:, None],
+        ages,
+        model=baraffe_model,
+        age_interp=age_interp,
+    )
+
+    for i, value in enumerate(values):
+        for j, age in enumerate(ages):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                expected = baraffe_table_search(
+                    col, value, age, model=baraffe_model, age_interp=age_interp
+                )
+            for key, expected_value in expected.items():
+                assert results[key].shape == (len(values), len(ages))
+                assert np.allclose(results[key][i, j], expected_value)
+
+
+def test_batch_table_search_scalar_inputs():
+    results = batch_table_search("M/Ms", 0.09, 5, model="2003")
+    assert results["M/Ms"].shape == ()
+    assert results["Teff"] == 2622
+
+
+@pytest.mark.parametrize(
+    "col, values, bound",
+    [
+        ("M/Ms", [0.09, 500], "upper"),
+        ("M/Ms", [0.0006, 0.09], "lower"),
+        ("Mk", [1, 10], "upper"),
+    ],
+)
+def test_batch_table_search_warns_once_outside_bounds(
+    col, values, bound, baraffe_model
+):
+    with pytest.warns(UserWarning) as record:
+        batch_table_search(col, values, 5, model=baraffe_model)
+    assert len(record) == 1
+    assert str(record[0].message) == (
+        "Interpolated values are outside the {0!s} bound of {1!s}.".format(bound, col)
+    )
+
+
+@pytest.mark.parametrize("col", ["G", "RRs"])
+def test_batch_table_search_invalid_column(col, baraffe_model):
+    with pytest.raises(ValueError):
+        batch_table_search(col, [1, 2], 5, model=baraffe_model)
+
+
+def test_age_interp_mass_missing_from_older_table_is_reported():
+    """1.35 M_sun is in the 2 Gyr but not the 3 Gyr 2015 table."""
+    with pytest.warns(UserWarning, match="outside the upper bound of M/Ms"):
+        result = mass_table_search(1.35, age=2.5, model="2015", age_interp=True)
+    assert result["M/Ms"] == 1.3
+
+    # Masses in both tables interpolate between the same mass rows.
+    result = mass_table_search(1.3, age=2.5, model="2015", age_interp=True)
+    lower = mass_table_search(1.3, age=2, model="2015")
+    upper = mass_table_search(1.3, age=3, model="2015")
+    assert result["M/Ms"] == 1.3
+    assert np.isclose(result["Teff"], (lower["Teff"] + upper["Teff"]) / 2)
+
+
+def test_inverse_table_search_returns_every_solution():
+    """Mk turns over at the high-mass end of the 2003 50 Myr table."""
+    solutions, ambiguous = inverse_table_search("Mk", 10.7, 0.05, model="2003")
+    assert ambiguous
+    assert len(solutions) > 1
+    masses = [solution["M/Ms"] for solution in solutions]
+    assert masses == sorted(masses)
+    for solution in solutions:
+        assert np.isclose(solution["Mk"], 10.7)
+
+    with pytest.warns(UserWarning, match="match more than one table row"):
+        result = magnitude_table_search(10.7, 0.05, band="K", model="2003")
+    assert result == solutions[0]
+
+    with pytest.warns(UserWarning, match="match more than one table row"):
+        batch = batch_table_search("Mk", [10.7, 10.7], [0.05, 0.05], model="2003")
+    assert np.allclose(batch["M/Ms"], masses[0])
+
+
+def test_inverse_table_search_monotonic_column(baraffe_model):
+    solutions, ambiguous = inverse_table_search("M/Ms", 0.09, 5, model=baraffe_model)
+    assert not ambiguous
+    assert solutions == [mass_table_search(0.09, 5, model=baraffe_model)]
+    assert inverse_table_search("M/Ms", 100, 5, model=baraffe_model) == ([], False)
+
+
+@pytest.mark.parametrize(
+    "model, ages",
+    [
+        ("2003", [0.1, 0.5, 1, 5, 7.5, 10]),
+        ("2015", [0.1, 0.5, 1, 4.2, 5, 10]),
+    ],
+)
+def test_mass_from_magnitude_matches_magnitude_table_search(model, ages, age_interp):
+    ages = np.repeat(ages, 3)
+    magnitudes = np.tile([9.0, 9.5, 10.0], len(ages) // 3)
+    masses, below, above = mass_from_magnitude(
+        magnitudes, ages, "K", model, age_interp=age_interp
+    )
+    assert masses.shape == below.shape == above.shape == ages.shape
+    for mass, magnitude, age, outside in zip(masses, magnitudes, ages, below | above):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            expected = magnitude_table_search(
+                magnitude, age, "K", model, age_interp=age_interp
+            )
+        if outside:
+            assert np.isnan(mass)
+        else:
+            assert np.isclose(mass, expected["M/Ms"])
+
+
+def test_mass_from_magnitude_non_monotonic_table():
+    """The lowest mass above which every companion is brighter."""
+    solutions, ambiguous = inverse_table_search("Mk", 10.7, 0.05, model="2003")
+    assert ambiguous
+    mass, below, above = mass_from_magnitude(10.7, 0.05, "K", "2003")
+    assert np.ndim(mass) == 0
+    assert np.isclose(mass, solutions[-1]["M/Ms"])
+
+
+@pytest.mark.parametrize("band", ["Q", "L", ["K"]])
+def test_mass_from_magnitude_invalid_band(band):
+    with pytest.raises(ValueError):
+        mass_from_magnitude(10, 5, band=band, model="2003")
@@ -0,0 +1,98 @@
+"""Test the batch driver for tables of searches."""
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from baraffe_tables.batch import batch_search
+from baraffe_tables.table_search import baraffe_table_search
+
+
+def _queries(n=60, seed=2):
+    rng = np.random.RandomState(seed)
+    column = rng.choice(["M/Ms", "Mk", "Teff"], n)
+    value = np.where(
+        column == "M/Ms",
+        rng.uniform(0.02, 0.5, n),
+        np.where(column == "Mk", rng.uniform(6, 14, n), rng.uniform(1200, 3000, n)),
+    )
+    return {
+        "column": column,
+        "value": value,
+        "age": rng.uniform(0.05, 9, n),
+        "model": rng.choice(["2003", "15"], n),
+        "age_interp": rng.rand(n) < 0.5,
+    }
+
+
+def _expected(queries, i):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return baraffe_table_search(
+            queries["column"][i],
+            queries["value"][i],
+            queries["age"][i],
+            queries["model"][i],
+            age_interp=bool(queries["age_interp"][i]),
+        )
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"chunk_size": 7},
+        {"chunk_size": 7, "n_workers": 2, "executor": "thread"},
+        {"chunk_size": 7, "n_workers": 2, "executor": "process"},
+    ],
+)
+def test_batch_search_matches_scalar_search(kwargs):
+    queries = _queries()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        results = batch_search(queries, **kwargs)
+    assert set(results) >= {"M/Ms", "R", "R/Rs", "Li/Li0"}
+    for i in range(len(queries["value"])):
+        expected = _expected(queries, i)
+        for col in results:
+            if col in expected:
+                assert np.isclose(results[col][i], expected[col])
+            else:
+                # Column of the other model.
+                assert np.isnan(results[col][i])
+
+
+def test_batch_search_rows_and_executor():
+    rows = [("M/Ms", 0.05, 5), ("Teff", 2000, 1, "15", True), ("Mk", 10, 5, "03")]
+    with ThreadPoolExecutor(2) as executor:
+        results = batch_search(rows, executor=executor, chunk_size=1)
+    assert results["M/Ms"][0] == 0.05
+    assert np.isclose(results["Teff"][1], 2000)
+    assert np.isclose(results["Mk"][2], 10)
+    assert np.isnan(results["R/Rs"][0])
+
+
+def test_batch_search_warns_once():
+    rows = [("M/Ms", 5, 5)] * 3 + [("M/Ms", 0.05, 5)]
+    with pytest.warns(UserWarning) as record:
+        batch_search(rows, chunk_size=1)
+    assert len(record) == 1
+    assert "upper bound of M/Ms" in str(record[0].message)
+
+
+@pytest.mark.parametrize(
+    "rows, kwargs",
+    [
+        ([("RRs", 0.05, 5)], {}),
+        ([("R", 0.1, 5, "2015")], {}),
+        ([("M/Ms", 0.05, 5, "1999")], {}),
+        ([("M/Ms", 0.05, 5)], {"chunk_size": 0}),
+        ([("M/Ms", 0.05, 5), ("M/Ms", 0.05)], {}),
+        ([("M/Ms", 0.05, 5, "2003", False, "extra")], {}),
+        ([("M/Ms", 0.05, 5)] * 2, {"chunk_size": 1, "n_workers": 2, "executor": "gpu"}),
+    ],
+)
+def test_batch_search_invalid_input(rows, kwargs):
+    with pytest.raises(ValueError):
+        batch_search(rows, **kwargs)
@@ -0,0 +1,134 @@
+"""Test the bounded caches used by the table searches."""
+import pickle
+
+import numpy as np
+import pytest
+
+from baraffe_tables.cache import LRUCache
+from baraffe_tables.table_search import (
+    age_table,
+    interpolated_table_cache,
+    magnitude_table_search,
+    mass_table_search,
+    memoize_searches,
+    model_age_table,
+    model_table_cache,
+    search_cache,
+)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_lru_cache_stats_and_clear():
+    cache = LRUCache(maxsize=4)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("missing")
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 4}
+
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "size": 0, "maxsize": 4}
+
+
+def test_lru_cache_get_or_create_calls_factory_once():
+    cache = LRUCache()
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_create("key", factory) == "value"
+    assert cache.get_or_create("key", factory) == "value"
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("maxsize", [0, -1])
+def test_lru_cache_invalid_size(maxsize):
+    with pytest.raises(ValueError):
+        LRUCache(maxsize=maxsize)
+
+
+def test_model_tables_are_loaded_once_and_read_only():
+    model_table_cache.clear()
+    table1, __, __ = age_table(5, model="2003")
+    table2, __, __ = age_table(5, model="2003")
+
+    stats = model_table_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+    assert np.all(table1["M/Ms"] == table2["M/Ms"])
+    with pytest.raises(ValueError):
+        table1["M/Ms"][0] = 10
+
+    # The short and long model names share the cached table.
+    model_age_table("03", "5.000")
+    assert model_table_cache.stats()["misses"] == 1
+
+
+def test_interpolated_tables_are_cached_by_rounded_age(capsys):
+    interpolated_table_cache.clear()
+    table1, __, age1 = age_table(4.6, model="2003", age_interp=True)
+    assert "Interpolating tables" in capsys.readouterr().out
+    table2, __, age2 = age_table(4.6 + 1e-9, model="2003", age_interp=True)
+    assert capsys.readouterr().out == ""  # Only printed when interpolating
+
+    stats = interpolated_table_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+    assert age1 == age2 == 4.6
+    assert table1["Teff"] is not table2["Teff"]
+    assert np.all(table1["Teff"] == table2["Teff"])
+    with pytest.raises(ValueError):
+        table1["Teff"][0] = 10
+
+    age_table(4.7, model="2003", age_interp=True)
+    assert interpolated_table_cache.stats()["misses"] == 2
+
+
+def test_memoize_searches_returns_shared_read_only_results():
+    assert isinstance(mass_table_search(0.08, 5), dict)  # Off by default
+    search_cache.clear()
+    with memoize_searches() as cache:
+        result1 = mass_table_search(0.08, 5)
+        result2 = mass_table_search(0.08, 5)
+        assert result1 is result2
+        assert cache.stats()["hits"] == 1
+        with pytest.raises(TypeError):
+            result1["M/Ms"] = 1
+        assert pickle.loads(pickle.dumps(result1)) == result1
+        with memoize_searches(enabled=False):
+            assert isinstance(mass_table_search(0.08, 5), dict)
+        assert mass_table_search(0.08, 5) is result1
+    assert isinstance(mass_table_search(0.08, 5), dict)
+    assert dict(result1) == mass_table_search(0.08, 5)
+
+
+def test_memoize_searches_rounds_inputs():
+    search_cache.clear()
+    with memoize_searches(decimals=4):
+        result1 = magnitude_table_search(10.10001, 5, band="K")
+        result2 = magnitude_table_search(10.1, 5, band="K")
+    assert result1 is result2
+    assert result1["Mk"] == pytest.approx(10.1)
+    assert search_cache.stats()["misses"] == 1
+
+
+def test_memoize_searches_replays_warnings():
+    search_cache.clear()
+    with memoize_searches():
+        for __ in range(2):
+            with pytest.warns(UserWarning, match="upper bound of M/Ms"):
+                mass_table_search(5, 5)
+    assert search_cache.stats()["hits"] == 1
@@ -0,0 +1,216 @@
+"""Test the flux ratio grids."""
+import os
+import sys
+import warnings
+
+import numpy as np
+import pytest
+from astropy.constants import M_jup, M_sun
+from astropy.table import Table
+
+from baraffe_tables.calculations import (
+    calculate_companion_magnitude,
+    flux_mag_ratio,
+    host_absolute_magnitude,
+    host_absolute_magnitudes,
+)
+from baraffe_tables.contrast import flux_ratio_grid, mass_limits, model_bands
+from baraffe_tables.flux_ratio_to_mass import (
+    _parser as ratio_parser,
+    main as ratio_main,
+)
+from baraffe_tables.model_grid import get_grid
+from baraffe_tables.providers import LocalCatalogProvider
+from baraffe_tables.table_search import (
+    magnitude_envelope,
+    magnitude_table_search,
+    mass_table_search,
+)
+
+recorded_objects = os.path.join(
+    os.path.dirname(__file__), "data", "simbad_query_objects.ecsv"
+)
+
+host_mags = {"V": 5.8, "J": 4.4, "H": 4.0, "K": 3.9}
+
+
+def test_model_bands():
+    assert model_bands("2003") == ["V", "R", "I", "J", "H", "K", "LL", "M"]
+    assert model_bands("15") == ["V", "R", "I", "J", "H", "K", "L", "LL", "M"]
+
+
+@pytest.mark.parametrize(
+    "model, masses",
+    [
+        ("2003", [0.02, 0.05, 0.08]),
+        ("2015", [0.08, 0.2, 0.5]),
+    ],
+)
+@pytest.mark.parametrize("age_interp", [True, False])
+def test_flux_ratio_grid_matches_mass_table_search(model, masses, age_interp):
+    ages = np.array([0.5, 1.0, 3.7, 5.0])
+    ratios, bands, outside = flux_ratio_grid(
+        host_mags, masses, ages, model, age_interp=age_interp
+    )
+    assert ratios.shape == (3, 4, len(model_bands(model)))
+    assert bands == model_bands(model)
+    assert not np.any(outside)
+    for i, mass in enumerate(masses):
+        for j, age in enumerate(ages):
+            params = mass_table_search(mass, age, model=model, age_interp=age_interp)
+            for k, band in enumerate(bands):
+                if band in host_mags:
+                    expected = flux_mag_ratio(
+                        params["M{}".format(band.lower())], host_mags[band]
+                    )
+                    assert np.isclose(ratios[i, j, k], expected)
+                else:
+                    assert np.isnan(ratios[i, j, k])
+
+
+def test_flux_ratio_grid_bands_and_outside():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        ratios, bands, outside = flux_ratio_grid(
+            {"k": 3.9}, [0.0001, 0.05, 5.0], [5.0], bands=["k", "J"]
+        )
+    assert bands == ["K", "J"]
+    assert ratios.shape == (3, 1, 2)
+    assert np.all(np.isnan(ratios[:, :, 1]))
+    assert list(outside[:, 0]) == [True, False, True]
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"bands": ["Q"]}, {"model": "2003", "bands": ["L"]}]
+)
+def test_flux_ratio_grid_invalid_band(kwargs):
+    with pytest.raises(ValueError):
+        flux_ratio_grid(host_mags, [0.05], [5], **kwargs)
+
+
+def test_host_absolute_magnitudes():
+    star_params = Table.read(recorded_objects, format="ascii.ecsv")[:1]
+    absolute_mags = host_absolute_magnitudes(star_params)
+    assert list(absolute_mags) == ["B", "V", "J", "H", "K"]
+    assert absolute_mags["K"] == host_absolute_magnitude(star_params, "K")
+    assert np.isclose(absolute_mags["K"], 5.59 - 5 * np.log10(1000 / 48.8741) + 5)
+
+
+@pytest.mark.parametrize(
+    "model, age, age_interp",
+    [
+        ("2003", 5, False),
+        ("2003", 3.7, True),
+        ("2015", 1, False),
+        ("2015", 2.2, True),
+    ],
+)
+def test_mass_limits_match_magnitude_table_search(model, age, age_interp):
+    __, envelope = magnitude_envelope(age, "K", model, age_interp=age_interp)
+    flux_ratios = flux_mag_ratio(np.linspace(envelope[-1], envelope[0], 7)[1:-1], 3.9)
+    masses, below, above = mass_limits(
+        flux_ratios, 3.9, age, "K", model, age_interp=age_interp
+    )
+    assert not np.any(below | above)
+    for flux_ratio, mass in zip(flux_ratios, masses):
+        magnitude = calculate_companion_magnitude(3.9, flux_ratio)
+        expected = magnitude_table_search(
+            magnitude, age, "K", model, age_interp=age_interp
+        )
+        assert np.isclose(mass, expected["M/Ms"])
+
+
+def test_mass_limits_shape_and_masks():
+    flux_ratios = np.array([[1e-1, 1e-3], [1e-30, np.nan]])
+    masses, below, above = mass_limits(flux_ratios, 3.9, 5)
+    assert masses.shape == below.shape == above.shape == (2, 2)
+    assert list(above.ravel()) == [True, False, False, False]
+    assert list(below.ravel()) == [False, False, True, False]
+    assert np.isnan(masses[0, 0]) and np.isnan(masses[1, 0]) and np.isnan(masses[1, 1])
+    assert 0 < masses[0, 1] < 0.1
+    mass, below, above = mass_limits(1e-3, 3.9, 5)
+    assert np.ndim(mass) == 0 and mass == masses[0, 1]
+
+
+def test_mass_limits_use_the_monotone_envelope():
+    # The 2003 0.05 Gyr K magnitudes are not monotonic in mass.
+    grid = get_grid("2003")
+    masses, envelope = magnitude_envelope(0.05, "K", "2003")
+    assert np.all(np.diff(envelope) <= 0)
+    mags = grid.table(grid.closest_age_index(0.05))[:, grid.column_index["Mk"]]
+    assert np.any(np.diff(mags) > 0)
+    limits = np.linspace(envelope[-1], envelope[0], 50)[1:-1]
+    found, below, above = mass_limits(flux_mag_ratio(limits, 3.9), 3.9, 0.05, "K")
+    assert not np.any(below | above)
+    # Every companion heavier than the limit is brighter than it.
+    for limit, mass in zip(limits, found):
+        assert np.all(mags[masses > mass + 1e-9] <= limit + 1e-9)
+    assert np.all(np.diff(found) <= 0)
+
+
+@pytest.mark.parametrize("band", ["Q", "L", 1])
+def test_mass_limits_invalid_band(band):
+    with pytest.raises(ValueError):
+        mass_limits([1e-3], 3.9, 5, band=band, model="2003")
+
+
+@pytest.fixture
+def catalog(tmpdir):
+    table = Table.read(recorded_objects, format="ascii.ecsv")
+    table.rename_column("user_specified_id", "name")
+    path = str(tmpdir.join("catalog.ecsv"))
+    table.write(path)
+    return path
+
+
+def test_contrast_curve_cli(catalog, tmpdir, capsys, monkeypatch):
+    curve_file = str(tmpdir.join("curve.csv"))
+    Table({"separation": [0.1, 0.5, 1.0], "flux_ratio": [1e-1, 1e-3, 1e-4]}).write(
+        curve_file
+    )
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        "pytest HD30501 5 --contrast_curve {} -b K".format(curve_file).split(),
+    )
+    args = vars(ratio_parser())
+    assert args["flux_ratio"] is None
+    assert ratio_main(**dict(args, catalog=catalog)) == 0
+    curve = Table.read(capsys.readouterr().out, format="ascii.csv")
+    assert curve.colnames == [
+        "separation",
+        "flux_ratio",
+        "mass_K",
+        "below_K",
+        "above_K",
+    ]
+    star_params = LocalCatalogProvider(catalog).get_stellar_params("HD30501")
+    masses, __, above = mass_limits(
+        curve["flux_ratio"], host_absolute_magnitude(star_params, "K"), 5
+    )
+    assert [str(flag) for flag in curve["above_K"]] == [str(flag) for flag in above]
+    assert np.allclose(curve["mass_K"][1:], masses[1:] * (M_sun / M_jup).value)
+
+    output = str(tmpdir.join("masses.fits"))
+    assert (
+        ratio_main(
+            "HD30501",
+            None,
+            5,
+            bands=["J", "K"],
+            catalog=catalog,
+            contrast_curve=curve_file,
+            output=output,
+        )
+        == 0
+    )
+    assert Table.read(output).colnames[-3:] == ["mass_K", "below_K", "above_K"]
+
+
+@pytest.mark.parametrize(
+    "argv", ["pytest HD30501 5", "pytest HD30501 0.1 5 --contrast_curve c.csv"]
+)
+def test_contrast_curve_cli_needs_one_flux_ratio(argv, monkeypatch):
+    monkeypatch.setattr(sys, "argv", argv.split())
+    with pytest.raises(SystemExit):
+        ratio_parser()
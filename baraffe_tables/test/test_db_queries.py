@@ -0,0 +1,191 @@
+"""Test the database lookups against local stand-ins of the catalogues."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from astropy.table import Table, vstack
+
+from baraffe_tables.db_queries import (
+    get_stellar_params,
+    get_stellar_params_batch,
+    get_sweet_cat_temp,
+    get_sweet_cat_temps,
+    sweet_cat_index,
+)
+from baraffe_tables.query_cache import query_cache
+
+recorded_objects = os.path.join(
+    os.path.dirname(__file__), "data", "simbad_query_objects.ecsv"
+)
+
+
+class ReplaySimbad:
+    """Stand-in for Simbad replaying recorded query_objects results."""
+
+    def __init__(self, fail_on=None):
+        self.recorded = Table.read(recorded_objects, format="ascii.ecsv")
+        self.fail_on = fail_on
+        self.queries = []
+
+    def query_objects(self, names):
+        self.queries.append(list(names))
+        if self.fail_on in names:
+            raise ConnectionError("SIMBAD timed out")
+        keys = [
+            "".join(name.split()).lower() for name in self.recorded["user_specified_id"]
+        ]
+        rows = []
+        for name in names:
+            key = "".join(name.split()).lower()
+            if key in keys:
+                row = Table(
+                    self.recorded[keys.index(key) : keys.index(key) + 1], masked=True
+                )
+            else:
+                row = Table(self.recorded[:1], masked=True)
+                for column in row.itercols():
+                    column.mask[:] = True
+            row["user_specified_id"] = [name]
+            rows.append(row)
+        return vstack(rows)
+
+
+class FakeSWEETCat:
+    """Stand-in for PyAstronomy's SWEETCat counting the catalogue loads."""
+
+    loads = 0
+
+    def __init__(self):
+        FakeSWEETCat.loads += 1
+        self.data = pd.DataFrame(
+            {
+                "star": [
+                    "HD 107383",
+                    "HD 41004B",
+                    "GJ 422",
+                    "HD 1237",
+                    "HD 1237",
+                    "HD 99706",
+                ],
+                "hd": ["107383", "41004B", np.nan, " 1237", "1237", 99706.0],
+                "teff": [4830, np.nan, 3323, 5514, 5000, 0],
+            }
+        )
+
+
+@pytest.fixture
+def fake_sweet_cat(monkeypatch):
+    monkeypatch.setattr("PyAstronomy.pyasl.SWEETCat", FakeSWEETCat)
+    FakeSWEETCat.loads = 0
+    sweet_cat_index.cache_clear()
+    yield FakeSWEETCat
+    sweet_cat_index.cache_clear()
+
+
+def test_sweet_cat_index(fake_sweet_cat):
+    assert sweet_cat_index() == {
+        "107383": 4830,
+        "41004B": pytest.approx(np.nan, nan_ok=True),
+        "1237": 5514,
+        "99706": 0,
+    }
+
+
+@pytest.mark.parametrize(
+    "star_name, temp",
+    [
+        ("HD107383", 4830),
+        ("hd 107383", 4830),
+        ("HD1237", 5514),
+        ("HD41004b", 0),  # No temperature
+        ("HD99706", 0),  # Zero temperature
+    ],
+)
+def test_get_sweet_cat_temp_loads_catalogue_once(fake_sweet_cat, star_name, temp):
+    assert get_sweet_cat_temp(star_name) == temp
+    assert get_sweet_cat_temp(star_name) == temp
+    assert fake_sweet_cat.loads == 1
+
+
+def test_get_sweet_cat_temp_missing_star(fake_sweet_cat, capsys):
+    assert get_sweet_cat_temp("HD 10") == 0
+    assert "HD10 was not in SWEET-Cat." in capsys.readouterr().out
+    with pytest.raises(NotImplementedError):
+        get_sweet_cat_temp("GJ 422")
+    assert fake_sweet_cat.loads == 1
+
+
+def test_get_sweet_cat_temps(fake_sweet_cat):
+    names = ["HD107383", "GJ 422", "HD 10", "hd41004B", "HD 1237"]
+    teffs = get_sweet_cat_temps(names)
+    assert teffs.dtype == float
+    assert np.array_equal(teffs, [4830, 0, 0, 0, 5514])
+    assert np.array_equal(teffs, [get_sweet_cat_temps([name])[0] for name in names])
+    assert fake_sweet_cat.loads == 1
+
+
+@pytest.fixture
+def empty_query_cache(monkeypatch, tmpdir):
+    monkeypatch.setenv("BARAFFE_TABLES_QUERY_CACHE", str(tmpdir.join("queries.sqlite")))
+    monkeypatch.delenv("BARAFFE_TABLES_OFFLINE", raising=False)
+    query_cache.clear()
+
+
+@pytest.mark.parametrize("chunk_size, n_queries", [(1, 5), (2, 3), (100, 1)])
+def test_get_stellar_params_batch(empty_query_cache, chunk_size, n_queries):
+    simbad = ReplaySimbad()
+    names = ["HD 30501", "HD4747", "Not a star", "HD 202206", "HD 162020", "HD 30501"]
+    params, errors = get_stellar_params_batch(
+        names, chunk_size=chunk_size, simbad=simbad
+    )
+    assert len(simbad.queries) == n_queries
+    assert sum(len(chunk) for chunk in simbad.queries) == 5
+    assert list(params["QUERY_NAME"]) == names
+    assert "user_specified_id" not in params.colnames
+    assert list(params["FLUX_K"].filled(np.nan)[[0, 1, 3, 4, 5]]) == [
+        5.59,
+        5.30,
+        6.49,
+        7.04,
+        5.59,
+    ]
+    assert params["FLUX_K"].mask[2] and params["MAIN_ID"].mask[2]
+    assert errors == {"Not a star": "Not found in SIMBAD."}
+    assert params["PLX_VALUE"].unit == "mas"
+
+
+def test_get_stellar_params_batch_uses_the_cache(empty_query_cache):
+    get_stellar_params_batch(["HD 30501", "HD 4747"], simbad=ReplaySimbad())
+    simbad = ReplaySimbad()
+    params, errors = get_stellar_params_batch(
+        ["HD 4747", "HD 202206", "hd 30501"], simbad=simbad
+    )
+    assert simbad.queries == [["HD 202206"]]
+    assert list(params["FLUX_K"]) == [5.30, 6.49, 5.59]
+    assert errors == {}
+    # The single star search shares the cache.
+    assert get_stellar_params("HD 4747", offline=True)["FLUX_K"][0] == 5.30
+
+    params, errors = get_stellar_params_batch(["HD 4747", "HD 162020"], offline=True)
+    assert params["FLUX_K"][0] == 5.30 and params["FLUX_K"].mask[1]
+    assert list(errors) == ["HD 162020"]
+
+
+def test_get_stellar_params_batch_reports_failed_chunks(empty_query_cache):
+    simbad = ReplaySimbad(fail_on="HD 202206")
+    names = ["HD 30501", "HD 4747", "HD 202206", "HD 162020"]
+    params, errors = get_stellar_params_batch(
+        names, chunk_size=2, simbad=simbad, cache=False
+    )
+    assert len(simbad.queries) == 2
+    assert list(params["FLUX_K"].mask) == [False, False, True, True]
+    assert errors == {name: "ConnectionError: SIMBAD timed out" for name in names[2:]}
+
+
+def test_get_stellar_params_batch_nothing_found(empty_query_cache):
+    params, errors = get_stellar_params_batch(["Not a star"], simbad=ReplaySimbad())
+    assert params.colnames == ["QUERY_NAME"]
+    assert list(errors) == ["Not a star"]
+    with pytest.raises(ValueError):
+        get_stellar_params_batch(["HD 4747"], chunk_size=0, simbad=ReplaySimbad())
@@ -0,0 +1,84 @@
+"""Test the compiled binary store of the model tables."""
+import os
+
+import numpy as np
+import pytest
+
+from baraffe_tables import grid_store
+from baraffe_tables.grid_store import (
+    build_grid_store,
+    load_grid_store,
+    parse_isochrones,
+    source_checksum,
+    source_files,
+    store_path,
+)
+
+
+@pytest.mark.parametrize("model", ["2003", "2015"])
+def test_build_grid_store_matches_ascii_tables(model, tmpdir):
+    path = build_grid_store(model, directory=str(tmpdir))
+    assert os.path.exists(path)
+
+    store = load_grid_store(model, directory=str(tmpdir))
+    files = source_files(model)
+    assert np.all(np.diff(store["ages"]) > 0)
+    assert store["columns"][0] == "M/Ms"
+    assert str(store["checksum"]) == source_checksum(files)
+
+    # The 5 Gyr table is identical to the single age text table.
+    skiprows = {"2003": 18, "2015": 22}[model]
+    filename = files[0].replace("-all.dat", "-5p000Gyr.dat")
+    expected = np.loadtxt(filename, skiprows=skiprows)
+    index = np.flatnonzero(store["ages"] == 5)[0]
+    valid = store["valid"][index]
+    assert np.sum(valid) == len(expected)
+    assert np.array_equal(store["data"][index, valid], expected)
+    assert np.array_equal(store["masses"][valid], expected[:, 0])
+
+
+def test_load_grid_store_builds_on_first_use(tmpdir):
+    path = store_path("03", directory=str(tmpdir))
+    assert not os.path.exists(path)
+    load_grid_store("03", directory=str(tmpdir))
+    assert os.path.exists(path)
+
+
+def test_load_grid_store_rebuilds_when_sources_change(tmpdir, monkeypatch):
+    directory = str(tmpdir)
+    build_grid_store("2015", directory=directory)
+    mtime = os.path.getmtime(store_path("2015", directory))
+    os.utime(store_path("2015", directory), (mtime - 100, mtime - 100))
+
+    monkeypatch.setattr(grid_store, "source_checksum", lambda files: "changed")
+    store = load_grid_store("2015", directory=directory)
+    assert str(store["checksum"]) == "changed"
+    assert os.path.getmtime(store_path("2015", directory)) > mtime - 100
+
+
+def test_load_grid_store_rebuilds_corrupt_artifact(tmpdir):
+    directory = str(tmpdir)
+    with open(store_path("2003", directory), "w") as f:
+        f.write("not a numpy file")
+
+    store = load_grid_store("2003", directory=directory)
+    assert str(store["checksum"]) == source_checksum(source_files("2003"))
+
+
+@pytest.mark.parametrize("model", ["2016", "", 2003])
+def test_grid_store_bad_model(model, tmpdir):
+    with pytest.raises(ValueError):
+        load_grid_store(model, directory=str(tmpdir))
+
+
+@pytest.mark.parametrize(
+    "model, n_ages, n_columns", [("2003", 10, 13), ("2015", 30, 15)]
+)
+def test_parse_isochrones_all_files(model, n_ages, n_columns):
+    age_labels, columns, tables = parse_isochrones(source_files(model)[0])
+    assert len(age_labels) == n_ages
+    assert len(columns) == n_columns
+    assert columns[0] == "M/Ms"
+    for table in tables:
+        assert table.shape[1] == n_columns
+        assert np.all(np.diff(table[:, 0]) > 0)  # Increasing mass
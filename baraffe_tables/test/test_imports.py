@@ -0,0 +1,68 @@
+"""Test the import cost of the table searches.
+
+The scripts are run many times from shell pipelines, so importing the table
+searches must not pull in the heavy optional dependencies.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import baraffe_tables
+from baraffe_tables.grid_store import build_grid_store
+
+# Seconds allowed for importing table_search and the first scalar search,
+# after numpy is imported and with the grid store already built.
+IMPORT_BUDGET = 0.1
+
+_script = """
+import json, sys, time
+import numpy
+start = time.perf_counter()
+from baraffe_tables.table_search import mass_table_search
+mass_table_search(0.05, 5)
+elapsed = time.perf_counter() - start
+import {modules}
+heavy = ["scipy", "pkg_resources", "matplotlib", "astropy", "astroquery", "PyAstronomy"]
+loaded = [m for m in heavy if m in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "loaded": loaded}}))
+"""
+
+
+def _run_fresh_interpreter(cache_dir, modules="baraffe_tables.table_search"):
+    # Import the package under test, installed or not.
+    package_root = os.path.dirname(
+        os.path.dirname(os.path.abspath(baraffe_tables.__file__))
+    )
+    python_path = os.pathsep.join(
+        filter(None, [package_root, os.environ.get("PYTHONPATH")])
+    )
+    env = dict(os.environ, BARAFFE_TABLES_CACHE=str(cache_dir), PYTHONPATH=python_path)
+    output = subprocess.check_output(
+        [sys.executable, "-c", _script.format(modules=modules)], env=env
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def test_table_search_import_does_not_load_heavy_modules(tmpdir):
+    build_grid_store("2003", str(tmpdir))
+    result = _run_fresh_interpreter(tmpdir)
+    assert result["loaded"] == []
+
+
+def test_scripts_import_does_not_load_heavy_modules(tmpdir):
+    """The scripts import them when they run, not before parsing arguments."""
+    build_grid_store("2003", str(tmpdir))
+    scripts = (
+        "baraffe_tables.flux_ratio_to_mass, baraffe_tables.mass_to_flux_ratio, "
+        "baraffe_tables.query_baraffe, baraffe_tables.teff2mass"
+    )
+    result = _run_fresh_interpreter(tmpdir, scripts)
+    assert result["loaded"] == []
+
+
+def test_table_search_import_time_budget(tmpdir):
+    build_grid_store("2003", str(tmpdir))
+    # Best of a few runs, to not fail on a single slow start.
+    elapsed = min(_run_fresh_interpreter(tmpdir)["elapsed"] for __ in range(3))
+    assert elapsed < IMPORT_BUDGET
@@ -7,7 +7,24 @@ import pytest
 Specifically interpolation between tables of different ages.
 
 """
-from baraffe_tables.table_search import find_bounding_ages, interp_data_dicts
+from baraffe_tables.interpolation import (
+    age_mass_interpolation,
+    envelope_inverse,
+    interpolate_age_table,
+    inverse_interpolation,
+    monotone_envelope,
+    monotonic_segments,
+    row_crossing_weights,
+    row_interpolation_weights,
+    segment_interpolation_weights,
+)
+from baraffe_tables.model_grid import get_grid
+from baraffe_tables.table_search import (
+    apply_interpolation_weights,
+    find_bounding_ages,
+    interp_data_dicts,
+    interpolation_weights,
+)
 from baraffe_tables.table_search import model_ages_03, model_ages_15
 
 
@@ -57,3 +74,202 @@ def test_table_interpolation_in_middle(lower, upper):
 
     for key, value in expected.items():
         assert np.allclose(result[key], value)
+
+
+@pytest.mark.parametrize("x_data", [[1.0, 2.0, 4.0, 8.0], [8.0, 4.0, 2.0, 1.0]])
+@pytest.mark.parametrize("value", [1.0, 1.5, 2.0, 3.0, 7.9, 8.0])
+def test_interpolation_weights_match_numpy_interp(x_data, value):
+    x_data = np.array(x_data)
+    table = np.column_stack((x_data, x_data ** 2, -3 * x_data))
+    index, weight, below, above = interpolation_weights(x_data, value)
+    result = apply_interpolation_weights(table, index, weight)
+
+    order = np.argsort(x_data)
+    for col in range(table.shape[1]):
+        assert np.allclose(
+            result[col], np.interp(value, x_data[order], table[order, col])
+        )
+    assert not below
+    assert not above
+    assert result[0] == value  # Reference column is exact
+
+
+@pytest.mark.parametrize(
+    "x_data, value, lower, upper",
+    [
+        ([1.0, 2.0, 3.0], 0.5, True, False),
+        ([1.0, 2.0, 3.0], 3.5, False, True),
+        ([3.0, 2.0, 1.0], 3.5, True, False),  # Beyond the first row of decreasing data
+        ([3.0, 2.0, 1.0], 0.5, False, True),
+    ],
+)
+def test_interpolation_weights_bound_flags(x_data, value, lower, upper):
+    index, weight, below, above = interpolation_weights(x_data, value)
+    assert below == lower
+    assert above == upper
+    assert 0 <= weight <= 1
+
+
+def test_interpolation_weights_arrays():
+    x_data = np.array([0.0, 10.0, 20.0])
+    values = np.array([-5.0, 0.0, 5.0, 15.0, 20.0, 25.0])
+    index, weight, below, above = interpolation_weights(x_data, values)
+    assert np.array_equal(index, [0, 0, 0, 1, 1, 1])
+    assert np.allclose(weight, [0.0, 0.0, 0.5, 0.5, 1.0, 1.0])
+    assert np.array_equal(below, [True, False, False, False, False, False])
+    assert np.array_equal(above, [False, False, False, False, False, True])
+
+
+@pytest.mark.parametrize("model", ["2003", "2015"])
+@pytest.mark.parametrize("age", [0.0007, 0.35, 4.6, 7.2])
+@pytest.mark.parametrize("col, value", [("M/Ms", 0.075), ("Teff", 2500), ("Mj", 11)])
+def test_age_mass_interpolation_matches_interpolated_table(model, age, col, value):
+    """Bilinear result equals interpolating the age interpolated table."""
+    grid = get_grid(model)
+    if not grid.ages[0] < age < grid.ages[-1]:
+        pytest.skip("Age outside the model grid.")
+    lower, upper = grid.bounding_age_indices(age)
+    table = interpolate_age_table(grid, age)
+    ref_index = grid.column_index[col]
+
+    results, below, above = age_mass_interpolation(grid, ref_index, [value], [age])
+    index, weight, table_below, table_above = interpolation_weights(
+        table[:, ref_index], value
+    )
+    expected = apply_interpolation_weights(table, index, weight)
+
+    assert np.allclose(results[0], expected)
+    assert below[0] == table_below
+    assert above[0] == table_above
+
+    # Within rounding of the dictionary interpolation.
+    dict_table = interp_data_dicts(
+        age,
+        grid.ages[lower],
+        grid.table_dict(lower),
+        grid.ages[upper],
+        grid.table_dict(upper),
+    )
+    assert np.allclose(dict_table[col], table[:, ref_index], atol=5e-4)
+
+
+def test_row_interpolation_weights_mixed_directions():
+    x_rows = np.array([[0.0, 1.0, 2.0], [2.0, 1.0, 0.0]])
+    index, weight, below, above = row_interpolation_weights(
+        x_rows, np.array([1.5, 1.5])
+    )
+    assert np.array_equal(index, [1, 0])
+    assert np.allclose(weight, [0.5, 0.5])
+    assert not np.any(below | above)
+
+
+def test_interp_data_dicts_aligns_on_mass():
+    """Rows missing at either end of a table are dropped."""
+    dict_lower = {"M/Ms": [0.1, 0.2, 0.3, 0.4], "b": [1.0, 2.0, 3.0, 4.0]}
+    dict_upper = {"M/Ms": [0.2, 0.3], "b": [4.0, 5.0]}
+    result = interp_data_dicts(1.5, 1.0, dict_lower, 2.0, dict_upper)
+    assert np.allclose(result["M/Ms"], [0.2, 0.3])
+    assert np.allclose(result["b"], [3.0, 4.0])
+
+
+def test_monotonic_segments():
+    x_data = [5.0, 3.0, 1.0, 2.0, 4.0, 4.0, 3.0]
+    segments = monotonic_segments(x_data)
+    assert segments.tolist() == [[0, 2], [2, 4], [4, 5], [5, 6]]
+    assert monotonic_segments([1.0, 2.0, 3.0]).tolist() == [[0, 2]]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (3.5, [(0, 0.75), (3, 0.75), (5, 0.5)]),
+        (4.0, [(0, 0.5), (3, 1.0)]),  # Turning point found once
+        (1.0, [(1, 1.0)]),
+        (6.0, []),
+    ],
+)
+def test_inverse_interpolation(value, expected):
+    x_data = [5.0, 3.0, 1.0, 2.0, 4.0, 4.0, 3.0]
+    assert inverse_interpolation(x_data, value, monotonic_segments(x_data)) == expected
+
+
+def test_segment_interpolation_weights_uses_first_solution():
+    x_data = np.array([5.0, 3.0, 1.0, 2.0, 4.0, 4.0, 3.0])
+    index, weight, below, above, n_solutions = segment_interpolation_weights(
+        x_data, [3.5, 4.0, 1.0, 0.0, 6.0], monotonic_segments(x_data)
+    )
+    assert np.array_equal(index[:3], [0, 0, 1])
+    assert np.allclose(weight[:3], [0.75, 0.5, 1.0])
+    assert np.array_equal(n_solutions, [3, 2, 1, 0, 0])
+    # Values outside the column are clamped as for a monotonic column.
+    assert np.array_equal(below, [False, False, False, False, True])
+    assert np.array_equal(above, [False, False, False, True, False])
+
+
+def test_row_crossing_weights_matches_segment_search():
+    x_data = np.array([5.0, 3.0, 1.0, 2.0, 4.0, 4.0, 3.0])
+    values = np.array([3.5, 4.0, 1.0, 0.0, 6.0])
+    x_rows = np.tile(x_data, (len(values), 1))
+    expected = segment_interpolation_weights(x_data, values, monotonic_segments(x_data))
+    for result, expect in zip(row_crossing_weights(x_rows, values), expected):
+        assert np.allclose(result, expect)
+
+
+def test_monotone_envelope():
+    assert list(monotone_envelope([5, 3, 4, 2, 2, 1])) == [5, 4, 4, 2, 2, 1]
+    assert list(monotone_envelope([1, 2, 3])) == [3, 3, 3]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (4.5, 0.5),
+        (4, 1),
+        (5, 0),
+        (3, 2.5),
+        (2, 3),
+        (1.5, 4.5),
+        (1, 5),
+        (np.nan, np.nan),
+    ],
+)
+def test_envelope_inverse(value, expected):
+    x = np.arange(6.0)
+    envelope = monotone_envelope([5, 3, 4, 2, 2, 1])
+    result, below, above = envelope_inverse(x, envelope, value)
+    assert np.allclose(result, expected, equal_nan=True)
+    assert not below and not above
+
+
+def test_envelope_inverse_bounds():
+    result, below, above = envelope_inverse([1, 2, 3], [3, 2, 1], [0.5, 3, 5, 2.5])
+    assert list(below) == [False, False, True, False]
+    assert list(above) == [True, False, False, False]
+    assert np.isnan(result[0]) and np.isnan(result[2])
+    assert list(result[[1, 3]]) == [1, 1.5]
+
+
+@pytest.mark.parametrize(
+    "model, column, age",
+    [
+        ("2003", "Mk", 0.007),
+        ("2003", "Teff", 0.003),
+        ("2015", "Teff", 0.0007),
+        ("2015", "Mk", 0.0035),
+    ],
+)
+def test_age_mass_interpolation_of_non_monotonic_column(model, column, age):
+    grid = get_grid(model)
+    ref_index = grid.column_index[column]
+    table = interpolate_age_table(grid, age)
+    x_data = table[:, ref_index]
+    values = (x_data[:-1] + x_data[1:]) / 2
+    results, below, above, n_solutions = age_mass_interpolation(
+        grid, ref_index, values, np.full(len(values), age), return_solutions=True
+    )
+    index, weight, __, __, expected_solutions = segment_interpolation_weights(
+        x_data, values, monotonic_segments(x_data)
+    )
+    assert np.allclose(results, apply_interpolation_weights(table, index, weight))
+    assert np.array_equal(n_solutions, expected_solutions)
+    assert np.any(n_solutions > 1)
@@ -0,0 +1,158 @@
+"""Test the dense in-memory model grid."""
+import numpy as np
+import pytest
+
+from baraffe_tables.model_grid import ModelGrid, get_grid
+from baraffe_tables.table_search import age_table, cols_03, cols_15, model_age_table
+
+
+@pytest.mark.parametrize("model, cols", [("2003", cols_03), ("2015", cols_15)])
+def test_get_grid(model, cols):
+    grid = get_grid(model)
+    assert grid is get_grid(model[2:])  # Loaded once for "03" and "2003"
+    assert grid.columns == cols
+    assert grid.column_index["M/Ms"] == 0
+    assert grid.data.shape == (len(grid.ages), len(grid.masses), len(cols))
+    assert grid.valid.shape == (len(grid.ages), len(grid.masses))
+    assert grid.data.flags.c_contiguous
+    assert not grid.data.flags.writeable
+    assert np.all(np.diff(grid.ages) > 0)
+
+
+@pytest.mark.parametrize("model", ["2003", "2015"])
+def test_grid_table_has_no_padding(model):
+    grid = get_grid(model)
+    for index in range(len(grid.ages)):
+        table = grid.table(index)
+        assert table.shape == (grid.n_rows[index], len(grid.columns))
+        assert not np.any(np.isnan(table))
+
+
+def test_grid_2015_youngest_table_keeps_first_row():
+    grid = get_grid("2015")
+    assert grid.table(0)[0, 0] == 0.010
+
+
+@pytest.mark.parametrize("age, lower, upper", [(0.003, 0.001, 0.005), (4.5, 1.0, 5.0)])
+def test_bounding_age_indices(age, lower, upper):
+    grid = get_grid("2003")
+    lower_index, upper_index = grid.bounding_age_indices(age)
+    assert grid.ages[lower_index] == lower
+    assert grid.ages[upper_index] == upper
+
+
+@pytest.mark.parametrize(
+    "age, expected", [(0.0, 0.001), (2.9, 1.0), (3.0, 1.0), (7.6, 10.0)]
+)
+def test_closest_age_index(age, expected):
+    grid = get_grid("2003")
+    assert grid.ages[grid.closest_age_index(age)] == expected
+
+
+def test_closest_age_indices_and_mass_range():
+    grid = get_grid("2015")
+    ages = np.array([0.0, 0.35, 2.9, 3.5, 7.6, 20.0])
+    assert list(grid.closest_age_indices(ages)) == [
+        grid.closest_age_index(age) for age in ages
+    ]
+    between = grid.between_tables(ages)
+    assert list(between) == [False, True, True, True, True, False]
+
+    low, high = grid.mass_range(ages)
+    for age, mass_low, mass_high in zip(ages, low, high):
+        masses = grid.table(grid.closest_age_index(age))[:, grid.column_index["M/Ms"]]
+        assert (mass_low, mass_high) == (masses[0], masses[-1])
+    low, high = grid.mass_range(ages, age_interp=True)
+    lower, __ = grid.bounding_age_indices(3.5)
+    masses = grid.aligned_pair(lower)[0][:, grid.column_index["M/Ms"]]
+    assert (low[3], high[3]) == (masses[0], masses[-1])
+
+
+def test_age_table_uses_grid_columns():
+    data, cols, model_age = age_table(5, model="2015")
+    grid = get_grid("2015")
+    assert cols == grid.columns
+    assert model_age == "5.000"
+    assert np.array_equal(
+        data["Ml"], grid.table(grid.age_index(5))[:, grid.column_index["Ml"]]
+    )
+
+
+@pytest.mark.parametrize(
+    "base_name, model, skiprows",
+    [
+        ("data/Baraffe2003/BaraffeCOND2003-", "2003", 18),
+        ("data/Baraffe2015/BaraffeBHAC15-", "2015", 22),
+    ],
+)
+def test_model_age_table_accepts_old_arguments(base_name, model, skiprows):
+    with pytest.warns(DeprecationWarning):
+        old = model_age_table(base_name, "0.100", skiprows=skiprows)
+    assert np.array_equal(old, model_age_table(model, 0.1))
+
+
+def test_model_grid_rejects_unsorted_ages():
+    with pytest.raises(ValueError):
+        ModelGrid(
+            "2003", [1.0, 0.5], ["M/Ms"], np.zeros((2, 2, 1)), np.ones((2, 2), bool)
+        )
+
+
+@pytest.mark.parametrize("model", ["2003", "2015"])
+def test_grid_rows_are_aligned_on_mass(model):
+    grid = get_grid(model)
+    mass = grid.data[:, :, grid.column_index["M/Ms"]]
+    assert np.all(np.diff(grid.masses) > 0)
+    assert np.array_equal(np.isnan(mass), ~grid.valid)
+    assert np.all(np.where(grid.valid, mass == grid.masses, True))
+
+
+@pytest.mark.parametrize("model", ["2003", "2015"])
+def test_grid_aligned_pairs_share_masses(model):
+    grid = get_grid(model)
+    for index in range(len(grid.ages) - 1):
+        lower, upper = grid.aligned_pair(index)
+        assert np.array_equal(lower[:, 0], upper[:, 0])
+        assert not np.any(np.isnan(lower) | np.isnan(upper))
+
+
+def test_2015_older_tables_lose_high_masses():
+    """The 2 and 3 Gyr tables differ at both ends."""
+    grid = get_grid("2015")
+    young, old = grid.age_index(2.0), grid.age_index(3.0)
+    assert grid.table(young)[-1, 0] == 1.4
+    assert grid.table(old)[-1, 0] == 1.3
+    lower, upper = grid.aligned_pair(young)
+    assert lower[0, 0] == upper[0, 0] == 0.07
+    assert lower[-1, 0] == upper[-1, 0] == 1.3
+
+
+def test_model_grid_rejects_non_contiguous_masses():
+    data = np.ones((1, 3, 1))
+    with pytest.raises(ValueError):
+        ModelGrid("2003", [1.0], ["M/Ms"], data, [[True, False, True]])
+
+
+def test_segments_are_cached_and_read_only():
+    grid = get_grid("2003")
+    index = grid.age_index(0.05)
+    segments = grid.segments(index, "Mk")
+    assert segments is grid.segments(index, "Mk")
+    assert not segments.flags.writeable
+    assert len(segments) > 1
+    assert not grid.is_monotonic(index, "Mk")
+    assert grid.is_monotonic(index, "M/Ms")
+    assert grid.pair_is_monotonic(index, "M/Ms")
+
+
+def test_inverse_tables_are_cached_and_monotone():
+    grid = get_grid("2003")
+    index = grid.age_index(0.05)
+    masses, envelope = grid.inverse_table(index, "Mk")
+    assert envelope is grid.inverse_table(index, "Mk")[1]
+    assert not envelope.flags.writeable
+    assert np.all(np.diff(masses) > 0)
+    assert np.all(np.diff(envelope) <= 0)
+    mags = grid.table(index)[:, grid.column_index["Mk"]]
+    assert np.all(envelope >= mags)
+    assert envelope[-1] == mags[-1]
@@ -0,0 +1,106 @@
+"""Test the Monte Carlo propagation of the input uncertainties."""
+import numpy as np
+import pytest
+from astropy.constants import M_jup, M_sun
+
+from baraffe_tables.calculations import absolute_magnitude, flux_mag_ratio
+from baraffe_tables.montecarlo import Histogram, monte_carlo_flux_ratios
+from baraffe_tables.table_search import batch_table_search
+
+mass_ratio = (M_jup / M_sun).value
+
+
+@pytest.mark.parametrize("log, resolution", [(False, 1e-3), (True, 1e-4)])
+def test_histogram_percentiles_match_numpy(log, resolution):
+    values = np.random.default_rng(3).lognormal(0, 0.5, 20000)
+    histogram = Histogram(resolution, log=log)
+    for chunk in np.array_split(values, 7):
+        histogram.add(chunk)
+    q = [0, 2.5, 50, 84, 100]
+    tolerance = resolution * (values.max() * np.log(10) if log else 1)
+    assert histogram.count == len(values)
+    assert np.allclose(
+        histogram.percentile(q), np.percentile(values, q), atol=tolerance * 2
+    )
+
+
+def test_histogram_merge_and_drop_invalid():
+    first, second = Histogram(1e-2, log=True), Histogram(1e-2, log=True)
+    first.add([1, 10, np.nan, -1])
+    second.add([100, 0, np.inf])
+    first.merge(second)
+    assert first.count == 3
+    assert np.allclose(first.percentile(50), 10, rtol=0.03)
+    with pytest.raises(ValueError):
+        first.merge(Histogram(1e-2))
+    assert np.isnan(Histogram().percentile([50])).all()
+
+
+def test_fixed_inputs_match_point_estimate():
+    result = monte_carlo_flux_ratios(
+        20.9, {"K": 5.5, "j": 6.0}, 5.0, 90, n_samples=50, seed=0
+    )
+    companion = batch_table_search("M/Ms", 90 * mass_ratio, 5.0)
+    percentiles = result.percentiles([50])
+    assert result.n_valid == 50
+    for band, mag in [("K", 5.5), ("J", 6.0)]:
+        expected = flux_mag_ratio(
+            companion["M{}".format(band.lower())], absolute_magnitude(20.9, mag)
+        )
+        assert np.allclose(
+            percentiles["flux_ratio_{}".format(band)], expected, rtol=1e-3
+        )
+    assert np.allclose(percentiles["Mk"], companion["Mk"], atol=1e-3)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"n_workers": 3, "executor": "thread"},
+        {"n_workers": 2, "executor": "process"},
+    ],
+)
+def test_results_do_not_depend_on_workers(kwargs):
+    args = ((20.9, 0.3), {"K": (5.5, 0.02)}, (5, 1), (90, 5))
+    serial = monte_carlo_flux_ratios(*args, n_samples=5000, chunk_size=1000, seed=7)
+    parallel = monte_carlo_flux_ratios(
+        *args, n_samples=5000, chunk_size=1000, seed=7, **kwargs
+    )
+    for name, histogram in serial.histograms.items():
+        assert np.array_equal(histogram.bins, parallel.histograms[name].bins)
+        assert np.array_equal(histogram.counts, parallel.histograms[name].counts)
+    other = monte_carlo_flux_ratios(*args, n_samples=5000, chunk_size=1000, seed=8)
+    assert not np.array_equal(
+        serial.histograms["Mk"].counts, other.histograms["Mk"].counts
+    )
+
+
+def test_samples_are_counted_and_dropped():
+    def ages(rng, size):
+        return np.where(np.arange(size) % 10 == 0, -1.0, 5.0)
+
+    with pytest.warns(UserWarning, match="outside the tables"):
+        result = monte_carlo_flux_ratios(
+            20.9, {"K": 5.5}, ages, (60, 40), n_samples=2000, chunk_size=300, seed=1
+        )
+    assert result.n_samples == 2000
+    assert result.n_invalid >= 200
+    assert result.n_outside > 0
+    assert result.histograms["flux_ratio_K"].count == result.n_valid
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"host_mags": {"Q": 5.5}},
+        {"age": (5, -1)},
+        {"age": (5, 1, 2)},
+        {"n_samples": 0},
+        {"chunk_size": 0},
+    ],
+)
+def test_bad_inputs(kwargs):
+    inputs = {"parallax": 20.9, "host_mags": {"K": 5.5}, "age": 5, "companion_mass": 90}
+    inputs.update(kwargs)
+    with pytest.raises(ValueError):
+        monte_carlo_flux_ratios(**inputs)
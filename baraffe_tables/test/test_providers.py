@@ -0,0 +1,126 @@
+"""Test the stellar parameter providers with local catalogs."""
+import os
+import sys
+
+import numpy as np
+import pytest
+from astropy.table import Table
+
+from baraffe_tables.flux_ratio_to_mass import (
+    _parser as ratio_parser,
+    main as ratio_main,
+)
+from baraffe_tables.mass_to_flux_ratio import _parser as mass_parser, main as mass_main
+from baraffe_tables.providers import (
+    LocalCatalogProvider,
+    SimbadProvider,
+    StellarParamProvider,
+    get_provider,
+)
+
+recorded_objects = os.path.join(
+    os.path.dirname(__file__), "data", "simbad_query_objects.ecsv"
+)
+
+
+@pytest.fixture(params=["csv", "fits", "parquet"])
+def catalog(request, tmpdir):
+    if request.param == "parquet":
+        pytest.importorskip("pyarrow")
+    table = Table.read(recorded_objects, format="ascii.ecsv")
+    table.rename_column("user_specified_id", "name")
+    path = str(tmpdir.join("catalog.{}".format(request.param)))
+    if request.param == "csv":
+        table["PLX_VALUE"].unit = None  # CSV has no units
+    table.write(path)
+    return path
+
+
+def test_local_catalog_provider(catalog):
+    provider = LocalCatalogProvider(catalog)
+    params = provider.get_stellar_params("HD 4747")
+    assert len(params) == 1
+    assert params["FLUX_K"][0] == 5.30
+    assert params["PLX_VALUE"].unit == "mas"
+    assert provider.get_stellar_params("hd202206")["FLUX_V"][0] == 8.08
+    with pytest.raises(LookupError):
+        provider.get_stellar_params("HD 10")
+
+
+def test_local_catalog_provider_batch(catalog):
+    params, errors = LocalCatalogProvider(catalog).get_stellar_params_batch(
+        ["HD30501", "HD 10", "HD162020"]
+    )
+    assert list(params["QUERY_NAME"]) == ["HD30501", "HD 10", "HD162020"]
+    assert list(params["FLUX_K"].mask) == [False, True, False]
+    assert list(errors) == ["HD 10"]
+
+
+def test_local_catalog_provider_temperature(catalog, capsys):
+    provider = LocalCatalogProvider(catalog)
+    assert provider.get_temperature("HD4747") == 5316
+    # No Fe_H_Teff, B-V is used instead of SWEET-Cat
+    teff = provider.get_temperature("HD162020")
+    assert 4000 < teff < 5100
+    assert "B-V" in capsys.readouterr().out
+
+
+def test_local_catalog_provider_converts_parallax(tmpdir):
+    path = str(tmpdir.join("catalog.fits"))
+    table = Table({"MAIN_ID": ["HD 1"], "PLX_VALUE": [0.05], "FLUX_K": [5.0]})
+    table["PLX_VALUE"].unit = "arcsec"
+    table.write(path)
+    params = LocalCatalogProvider(path).get_stellar_params("HD1")
+    assert params["PLX_VALUE"].unit == "mas"
+    assert np.isclose(params["PLX_VALUE"][0], 50)
+
+
+def test_local_catalog_provider_invalid(tmpdir):
+    with pytest.raises(ValueError):
+        LocalCatalogProvider(str(tmpdir.join("missing.csv")))
+    path = str(tmpdir.join("catalog.csv"))
+    Table({"star": ["HD 1"], "FLUX_K": [5.0]}).write(path)
+    with pytest.raises(ValueError):
+        LocalCatalogProvider(path)
+    assert (
+        LocalCatalogProvider(path, name_column="star").get_stellar_params("HD1")[
+            "FLUX_K"
+        ][0]
+        == 5
+    )
+
+
+def test_get_provider(catalog):
+    assert isinstance(get_provider(), SimbadProvider)
+    assert isinstance(get_provider(catalog), LocalCatalogProvider)
+
+
+def test_provider_must_implement_get_stellar_params():
+    class Incomplete(StellarParamProvider):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.parametrize("area_ratio", [True, False])
+def test_mass_to_flux_ratio_with_catalog(catalog, area_ratio, capsys):
+    assert mass_main("HD30501", 90, 5, area_ratio=area_ratio, catalog=catalog) == 0
+    out = capsys.readouterr().out
+    assert "K band  companion/star Flux ratio" in out
+    assert ("Radius Calculation" in out) is area_ratio
+
+
+def test_flux_ratio_to_mass_with_catalog(catalog, capsys):
+    assert ratio_main("HD30501", 0.01, 5, bands=["J", "K"], catalog=catalog) == 0
+    assert "Estimated Companion Mass from K band flux ratio" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("parser", [mass_parser, ratio_parser])
+def test_parsers_catalog_flag(parser, monkeypatch):
+    monkeypatch.setattr(
+        sys, "argv", "pytest HD30501 0.1 5 --catalog stars.fits".split()
+    )
+    assert parser().catalog == "stars.fits"
+    monkeypatch.setattr(sys, "argv", "pytest HD30501 0.1 5".split())
+    assert parser().catalog is None
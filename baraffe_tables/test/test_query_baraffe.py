@@ -0,0 +1,110 @@
+"""Test the streaming mode of query_baraffe."""
+import csv
+import io
+import warnings
+
+import numpy as np
+import pytest
+
+from baraffe_tables.query_baraffe import result_columns, stream_queries
+from baraffe_tables.table_search import baraffe_table_search
+
+QUERIES = """column,value,age,model,age_interp
+M/Ms,0.05,5,2003,False
+Teff,2000,1.5,15,true
+Mk,10,5,03,0
+Mk,9.5,1,2015,1
+"""
+
+
+def _check_rows(rows):
+    assert len(rows) == 4
+    for row in rows:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            expected = baraffe_table_search(
+                row["column"],
+                float(row["value"]),
+                float(row["age"]),
+                str(row["model"]),
+                age_interp=str(row["age_interp"]).lower() in ("1", "true"),
+            )
+        for col in result_columns():
+            if col in expected:
+                assert np.isclose(float(row[col]), expected[col])
+            else:
+                assert np.isnan(float(row[col]))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 100])
+def test_stream_queries_csv_file(tmpdir, chunk_size):
+    queries_file = str(tmpdir.join("queries.csv"))
+    output_file = str(tmpdir.join("results.csv"))
+    with open(queries_file, "w") as f:
+        f.write(QUERIES)
+
+    assert stream_queries(queries_file, output_file, chunk_size=chunk_size) == 4
+    with open(output_file, newline="") as f:
+        _check_rows(list(csv.DictReader(f)))
+
+
+def test_stream_queries_stdin_to_stdout(monkeypatch, capsys):
+    queries = "\n".join(line.rsplit(",", 2)[0] for line in QUERIES.splitlines())
+    monkeypatch.setattr("sys.stdin", io.StringIO(queries))
+    assert stream_queries("-", model="2015", chunk_size=2) == 4
+    rows = list(csv.DictReader(io.StringIO(capsys.readouterr().out)))
+    assert list(rows[0])[:3] == ["column", "value", "age"]
+    expected = baraffe_table_search("M/Ms", 0.05, 5, "2015")
+    assert float(rows[0]["Teff"]) == expected["Teff"]
+    assert np.isnan(float(rows[0]["R"]))
+
+
+def test_stream_queries_parquet(tmpdir):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    queries = list(csv.DictReader(io.StringIO(QUERIES)))
+    table = pa.table({name: [row[name] for row in queries] for name in queries[0]})
+    queries_file = str(tmpdir.join("queries.parquet"))
+    output_file = str(tmpdir.join("results.parquet"))
+    pq.write_table(table, queries_file)
+
+    assert stream_queries(queries_file, output_file, chunk_size=3) == 4
+    results = pq.read_table(output_file).to_pylist()
+    _check_rows(results)
+
+
+def test_stream_queries_invalid_chunk_size(tmpdir):
+    with pytest.raises(ValueError):
+        stream_queries(str(tmpdir.join("queries.csv")), chunk_size=0)
+
+
+@pytest.mark.parametrize("header", ["col,value,age", "column,value", ""])
+def test_stream_queries_missing_columns(tmpdir, header):
+    queries_file = str(tmpdir.join("queries.csv"))
+    output_file = tmpdir.join("results.csv")
+    with open(queries_file, "w") as f:
+        f.write(header + "\n" + "M/Ms,0.05,5\n" if header else "")
+    with pytest.raises(ValueError, match="lack the column"):
+        stream_queries(queries_file, str(output_file))
+    assert not output_file.exists()
+
+
+@pytest.mark.parametrize(
+    "row, message",
+    [
+        (
+            "R,0.1,5,2015",
+            "Query 3 of .*: Column R not in Baraffe table \\(model=2015\\)",
+        ),
+        ("M/Ms,heavy,5,2003", "Query 3 of .*: value 'heavy' is not a number"),
+        ("M/Ms,0.05,5,1999", "Query 3 of .*: Model value '1999' is not valid"),
+    ],
+)
+def test_stream_queries_reports_the_failing_row(tmpdir, row, message):
+    queries_file = str(tmpdir.join("queries.csv"))
+    with open(queries_file, "w") as f:
+        f.write(
+            "column,value,age,model\nM/Ms,0.05,5,2003\nTeff,2500,5,2003\n" + row + "\n"
+        )
+    with pytest.raises(ValueError, match=message):
+        stream_queries(queries_file, str(tmpdir.join("results.csv")), chunk_size=2)
@@ -0,0 +1,164 @@
+"""Test the persistent cache of the SIMBAD queries."""
+import pickle
+import sqlite3
+import types
+
+import numpy as np
+import pytest
+from astropy.table import MaskedColumn, Table
+
+from baraffe_tables import query_cache as query_cache_module
+from baraffe_tables.db_queries import get_stellar_params
+from baraffe_tables.query_cache import QueryCache, query_cache, query_key
+
+
+class FakeSimbad:
+    """Stand-in for astroquery's Simbad counting the queries."""
+
+    queries = []  # type: list
+
+    def add_votable_fields(self, *fields):
+        self.fields = fields
+
+    def query_object(self, name):
+        FakeSimbad.queries.append(name)
+        if name == "unknown":
+            return None
+        return Table({"MAIN_ID": [name], "FLUX_K": [5.5], "PLX_VALUE": [100.0]})
+
+
+@pytest.fixture
+def fake_simbad(monkeypatch, tmpdir):
+    monkeypatch.setenv("BARAFFE_TABLES_QUERY_CACHE", str(tmpdir.join("queries.sqlite")))
+    monkeypatch.delenv("BARAFFE_TABLES_QUERY_TTL", raising=False)
+    monkeypatch.delenv("BARAFFE_TABLES_OFFLINE", raising=False)
+    monkeypatch.setattr("astroquery.simbad.Simbad", FakeSimbad)
+    FakeSimbad.queries = []
+    query_cache.clear()
+    return FakeSimbad
+
+
+def test_query_key_normalizes_name_and_fields():
+    assert query_key("HD  30501", ["sp", "parallax"]) == query_key(
+        " hd 30501", ["parallax", "sp"]
+    )
+    assert query_key("HD 30501", ["sp"]) != query_key("HD 30501", ["sp", "parallax"])
+
+
+def test_query_cache_round_trip(tmpdir):
+    cache = QueryCache(str(tmpdir.join("sub", "cache.sqlite")), ttl=100)
+    table = Table({"FLUX_K": [5.5], "SP_TYPE": ["M2"]})
+    assert cache.get("HD 1", ["sp"]) is None
+    cache.put("HD 1", ["sp"], table)
+    cached = cache.get("hd 1", ["sp"])
+    assert cached.colnames == table.colnames
+    assert cached["FLUX_K"][0] == 5.5
+    assert cache.get("HD 1", ["sp", "fe_h"]) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 1)
+
+    cache.clear()
+    assert cache.get("HD 1", ["sp"]) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_query_cache_expires_entries(tmpdir, monkeypatch):
+    cache = QueryCache(str(tmpdir.join("cache.sqlite")), ttl=60)
+    cache.put("HD 1", ["sp"], Table({"FLUX_K": [5.5]}))
+    now = query_cache_module.time.time()
+    monkeypatch.setattr(
+        query_cache_module, "time", types.SimpleNamespace(time=lambda: now + 30)
+    )
+    assert cache.get("HD 1", ["sp"])["FLUX_K"][0] == 5.5
+    monkeypatch.setattr(
+        query_cache_module, "time", types.SimpleNamespace(time=lambda: now + 90)
+    )
+    assert cache.get("HD 1", ["sp"]) is None
+
+
+def test_query_cache_unwritable_path_behaves_empty(tmpdir):
+    blocker = tmpdir.join("file")
+    blocker.write("")
+    cache = QueryCache(str(blocker.join("cache.sqlite")))
+    cache.put("HD 1", ["sp"], Table({"FLUX_K": [5.5]}))
+    assert cache.get("HD 1", ["sp"]) is None
+
+
+def test_query_cache_stores_ecsv_not_pickles(tmpdir):
+    path = str(tmpdir.join("cache.sqlite"))
+    cache = QueryCache(path)
+    table = Table(
+        {"FLUX_K": MaskedColumn([5.5, 0], mask=[False, True]), "PLX_VALUE": [1.0, 2]}
+    )
+    table["PLX_VALUE"].unit = "mas"
+    cache.put("HD 1", ["sp"], table)
+    with pytest.raises(TypeError):
+        cache.put("HD 2", ["sp"], {"FLUX_K": 5.5})
+
+    connection = sqlite3.connect(path)
+    text = connection.execute("SELECT ecsv FROM results").fetchone()[0]
+    connection.execute("UPDATE results SET ecsv = ?", (pickle.dumps(table),))
+    connection.commit()
+    connection.close()
+    assert text.startswith("# %ECSV")
+    assert cache.get("HD 1", ["sp"]) is None
+
+    cache.put("HD 1", ["sp"], table)
+    cached = cache.get("HD 1", ["sp"])
+    assert list(cached["FLUX_K"].mask) == [False, True]
+    assert cached["PLX_VALUE"].unit == "mas"
+
+
+def test_query_cache_skips_tables_it_can_not_write(tmpdir):
+    path = tmpdir.join("cache.sqlite")
+    cache = QueryCache(str(path))
+    cache.put("HD 1", ["sp"], Table({"FLUX_K": np.array([object()], dtype=object)}))
+    assert cache.get("HD 1", ["sp"]) is None
+
+    path.write("not a database")
+    cache.put("HD 1", ["sp"], Table({"FLUX_K": [5.5]}))
+    cache.clear()
+    assert cache.stats()["size"] == 0
+
+
+def test_get_stellar_params_is_cached(fake_simbad):
+    first = get_stellar_params("HD 30501")
+    second = get_stellar_params("HD  30501")
+    assert fake_simbad.queries == ["HD 30501"]
+    assert second["FLUX_K"][0] == first["FLUX_K"][0]
+    assert query_cache.stats()["size"] == 1
+
+    get_stellar_params("HD 30501", cache=False)
+    assert fake_simbad.queries == ["HD 30501"] * 2
+
+
+def test_get_stellar_params_cache_is_opt_in(fake_simbad, monkeypatch, tmpdir):
+    monkeypatch.delenv("BARAFFE_TABLES_QUERY_CACHE")
+    monkeypatch.setenv("BARAFFE_TABLES_CACHE", str(tmpdir.join("store")))
+    get_stellar_params("HD 30501")
+    get_stellar_params("HD 30501")
+    assert fake_simbad.queries == ["HD 30501"] * 2
+    assert not tmpdir.join("store").check()
+
+    get_stellar_params("HD 30501", cache=True)
+    assert get_stellar_params("HD 30501", cache=True)["FLUX_K"][0] == 5.5
+    assert fake_simbad.queries == ["HD 30501"] * 3
+    assert tmpdir.join("store", "queries.sqlite").check()
+
+
+def test_get_stellar_params_does_not_cache_missing_stars(fake_simbad):
+    assert get_stellar_params("unknown") is None
+    assert get_stellar_params("unknown") is None
+    assert fake_simbad.queries == ["unknown"] * 2
+
+
+def test_get_stellar_params_offline(fake_simbad, monkeypatch):
+    get_stellar_params("HD 30501")
+    monkeypatch.setenv("BARAFFE_TABLES_OFFLINE", "1")
+    assert get_stellar_params("HD 30501")["FLUX_K"][0] == 5.5
+    with pytest.raises(LookupError):
+        get_stellar_params("HD 4747")
+    with pytest.raises(LookupError):
+        get_stellar_params("HD 202206", offline=True)
+    assert get_stellar_params("HD 4747", offline=False)["MAIN_ID"][0] == "HD 4747"
+    assert fake_simbad.queries == ["HD 30501", "HD 4747"]
@@ -0,0 +1,96 @@
+"""Test sharing the model grids between processes."""
+import multiprocessing
+import pickle
+import weakref
+
+import numpy as np
+import pytest
+
+from baraffe_tables.model_grid import clear_grids, get_grid
+from baraffe_tables import shared_grid
+from baraffe_tables.shared_grid import attach_grids, detach_grids, publish_grids
+from baraffe_tables.table_search import (
+    age_table,
+    batch_table_search,
+    mass_from_magnitude,
+)
+from baraffe_tables.teff_logg import teff_logg_search
+from baraffe_tables.tracks import track
+
+shared_memory = pytest.importorskip("multiprocessing.shared_memory")
+
+
+def _teff_of_mass(mass):
+    grid = get_grid("2003")
+    return grid.data.flags.writeable, float(
+        batch_table_search("M/Ms", mass, 5, model="2003")["Teff"]
+    )
+
+
+def test_attach_grids_shares_the_grid_arrays():
+    grid = get_grid("2015")
+    with publish_grids(["2015"]) as shared:
+        handles = pickle.loads(pickle.dumps(shared.handles))
+        try:
+            (attached,) = attach_grids(handles)
+            assert get_grid("2015") is attached
+            assert attached is not grid
+            assert np.array_equal(attached.data, grid.data, equal_nan=True)
+            assert np.array_equal(attached.valid, grid.valid)
+            assert attached.columns == grid.columns
+            assert attached.age_labels == grid.age_labels
+            assert not attached.data.flags.writeable
+            assert not attached.data.flags.owndata
+            del attached
+        finally:
+            detach_grids()
+            clear_grids()
+
+
+def test_detach_grids_closes_the_blocks():
+    expected = batch_table_search("M/Ms", 0.05, 5, model="2003")["Teff"]
+    with publish_grids(["2003"]) as shared:
+        (attached,) = attach_grids(shared.handles)
+        age_table(5, model="2003")  # Caches a view of the attached grid.
+        teff_logg_search(2500.0, 5.0, model="2003")
+        assert len(shared_grid._attached) == 2
+        attached_ref = weakref.ref(attached)
+        del attached
+        detach_grids()
+        assert shared_grid._attached == []
+        assert attached_ref() is None
+        assert batch_table_search("M/Ms", 0.05, 5, model="2003")["Teff"] == expected
+
+
+def test_detach_grids_clears_every_cache_of_grid_views():
+    with publish_grids(["2003"]) as shared:
+        attach_grids(shared.handles)
+        # The age rounds onto a table, so the interpolated table is a view.
+        age_table(5.0000001, model="2003", age_interp=True)
+        track(0.05, model="2003")
+        mass_from_magnitude(20.0, 5.0000001, "K", model="2003", age_interp=True)
+        kept = get_grid("2003").table(0)
+        assert len(shared_grid._attached) == 2
+        detach_grids()
+        # The block of the data is still viewed, so it stays open.
+        assert len(shared_grid._attached) == 1
+        assert kept.sum() > 0
+        del kept
+        detach_grids()
+        assert shared_grid._attached == []
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="Needs fork."
+)
+def test_pool_workers_search_the_shared_grids():
+    masses = [0.05, 0.08, 0.1]
+    expected = batch_table_search("M/Ms", masses, 5, model="2003")["Teff"]
+    context = multiprocessing.get_context("fork")
+    with publish_grids(["2003"]) as shared:
+        with context.Pool(
+            2, initializer=attach_grids, initargs=(shared.handles,)
+        ) as pool:
+            results = pool.map(_teff_of_mass, masses)
+    assert [writeable for writeable, __ in results] == [False] * 3
+    assert np.allclose([teff for __, teff in results], expected)
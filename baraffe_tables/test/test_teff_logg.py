@@ -0,0 +1,99 @@
+"""Test the (Teff, log g) lookup of the model grids."""
+import numpy as np
+import pytest
+
+from baraffe_tables.model_grid import get_grid
+from baraffe_tables.teff2mass import main as teff2mass_main
+from baraffe_tables.teff_logg import get_teff_logg_index, teff_logg_search
+
+
+@pytest.mark.parametrize(
+    "model, age, row",
+    [
+        ("2003", 1.0, 5),
+        ("2003", 5.0, 12),
+        ("2015", 0.1, 10),
+        ("2015", 1.0, 5),
+    ],
+)
+def test_teff_logg_search_grid_nodes(model, age, row):
+    """Grid cells map back to their own age and mass."""
+    grid = get_grid(model)
+    cell = grid.table(grid.age_index(age))[row]
+    result = teff_logg_search(
+        cell[grid.column_index["Teff"]], cell[grid.column_index["g"]], model=model
+    )
+    assert np.isclose(result["age"], age)
+    assert np.isclose(result["M/Ms"], cell[grid.column_index["M/Ms"]])
+    assert set(grid.columns) < set(result)
+
+
+def test_teff_logg_search_returns_the_query_teff_and_logg():
+    result = teff_logg_search([3000.0, 2500.0], [5.0, 5.2], model="2015")
+    assert list(result["Teff"]) == [3000.0, 2500.0]
+    assert list(result["g"]) == [5.0, 5.2]
+
+
+def test_teff_logg_search_arrays():
+    teff = np.array([[2500.0], [2800.0]])
+    logg = np.array([4.8, 5.0, 5.2])
+    result = teff_logg_search(teff, logg, model="2015")
+    assert result["age"].shape == (2, 3)
+    assert np.all(np.isfinite(result["M/Ms"]))
+    # Hotter at the same gravity is more massive.
+    assert np.all(result["M/Ms"][1] > result["M/Ms"][0])
+
+
+def test_teff_logg_search_outside_grid_is_nan():
+    result = teff_logg_search([50000.0, 2500.0], [5.0, 5.2], model="2015")
+    assert np.isnan(result["M/Ms"][0])
+    assert np.isfinite(result["M/Ms"][1])
+
+
+def test_teff_logg_index_built_once():
+    assert get_teff_logg_index("2003") is get_teff_logg_index("03")
+
+
+@pytest.mark.parametrize(
+    "model, teff, logg",
+    [
+        ("2015", 1652.0, 4.85),
+        ("2015", 5952.0, 4.03),
+        ("2003", 2011.0, 3.45),
+    ],
+)
+def test_teff_logg_search_gaps_between_tracks_are_nan(model, teff, logg):
+    """Points inside the outline of the grid but in no grid cell are outside."""
+    spatial = pytest.importorskip("scipy.spatial")
+    grid = get_grid(model)
+    cells = grid.data[grid.valid]
+    hull = spatial.Delaunay(
+        np.column_stack(
+            (
+                np.log10(cells[:, grid.column_index["Teff"]]),
+                cells[:, grid.column_index["g"]],
+            )
+        )
+    )
+    assert hull.find_simplex([np.log10(teff), logg]) >= 0
+    result = teff_logg_search(teff, logg, model=model)
+    assert (
+        np.isnan(result["M/Ms"])
+        and np.isnan(result["age"])
+        and np.isnan(result["Teff"])
+    )
+
+
+def test_teff2mass_main_prefers_the_2015_grid():
+    result = teff2mass_main(3000.0, 5.0)
+    expected = teff_logg_search(3000.0, 5.0, model="2015")
+    assert "R/Rs" in result
+    assert np.isclose(result["age"], expected["age"])
+    assert np.isclose(result["M/Ms"], expected["M/Ms"])
+    assert np.isclose(result["M/Mjup"], result["M/Ms"] * 1047.57, rtol=1e-4)
+
+    # Below the 2015 grid, the 2003 grid is used.
+    result = teff2mass_main(265.0, 4.254)
+    assert "R" in result and np.isclose(result["age"], 5.0)
+    with pytest.raises(ValueError):
+        teff2mass_main(50000.0, 5.0)
@@ -0,0 +1,64 @@
+"""Test the evolutionary tracks over the model ages."""
+import warnings
+
+import numpy as np
+import pytest
+
+from baraffe_tables.model_grid import get_grid
+from baraffe_tables.table_search import mass_table_search
+from baraffe_tables.tracks import track, track_cache
+
+
+@pytest.mark.parametrize(
+    "model, mass",
+    [
+        ("2003", 0.0123),
+        ("2003", 0.08),
+        ("2015", 0.05),
+        ("2015", 0.3456),
+    ],
+)
+def test_track_matches_mass_table_search(model, mass):
+    result = track(mass, ["Teff", "Mk"], model=model)
+    assert np.array_equal(result["age"], get_grid(model).ages)
+    for i, age in enumerate(result["age"]):
+        with warnings.catch_warnings(record=True) as record:
+            warnings.simplefilter("always")
+            expected = mass_table_search(mass, age, model=model)
+        if record:
+            # Mass outside of this table.
+            assert np.isnan(result["Teff"][i])
+        else:
+            assert np.isclose(result["Teff"][i], expected["Teff"])
+            assert np.isclose(result["Mk"][i], expected["Mk"])
+
+
+def test_track_array_of_masses():
+    masses = np.array([0.01, 0.05, 0.1])
+    result = track(masses, model="2003")
+    n_ages = len(get_grid("2003").ages)
+    assert result["M/Ms"].shape == (3, n_ages)
+    assert np.allclose(result["M/Ms"], masses[:, None])
+    assert np.allclose(result["Teff"][1], track(0.05, model="2003")["Teff"])
+
+
+def test_track_is_cached():
+    track_cache.clear()
+    first = track(0.0732, ["Teff"], model="2015")
+    second = track(0.0732 + 1e-9, ["Teff"], model="2015")
+    assert track_cache.stats()["hits"] == 1
+    assert np.array_equal(first["Teff"], second["Teff"], equal_nan=True)
+    # Results are copies, changing them does not change the cache.
+    second["Teff"][:] = 0
+    assert not np.array_equal(
+        track(0.0732, ["Teff"], model="2015")["Teff"], second["Teff"]
+    )
+
+
+def test_track_outside_masses_is_nan():
+    assert np.all(np.isnan(track(5.0, ["Teff"], model="2003")["Teff"]))
+
+
+def test_track_invalid_column():
+    with pytest.raises(ValueError):
+        track(0.05, ["RRs"], model="2003")
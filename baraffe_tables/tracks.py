@@ -0,0 +1,90 @@
+"""Evolutionary tracks, the model parameters of a fixed mass over all ages.
+
+The rows of every age table in a ModelGrid are aligned on mass, so a track
+is a single interpolation in mass applied to the whole (age, column) slab of
+the grid. Tracks are cached per model and quantized mass in ``track_cache``.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from baraffe_tables.cache import LRUCache
+from baraffe_tables.interpolation import ArrayLike, interpolation_weights
+from baraffe_tables.model_grid import ModelGrid, get_grid
+
+track_cache = LRUCache(maxsize=4096)
+
+# Masses are rounded to this number of decimals (M_sun) for the cache key and
+# the track is evaluated at the rounded mass.
+track_mass_decimals = 6
+
+
+def track(
+    mass: ArrayLike, columns: Optional[List[str]] = None, model: str = "2003"
+) -> Dict[str, np.ndarray]:
+    """Evolutionary track of the given mass over every age of a model.
+
+    Parameters
+    ----------
+    mass: float or array_like
+        Companion mass (M_sun), or a 1-D array of masses.
+    columns: list of str, optional
+        Columns to return. Default is every column of the model.
+    model: str
+        Year of Baraffe model to use [2003 (default), 2015].
+
+    Returns
+    -------
+    track: Dict[str, numpy.ndarray]
+        "age" (Gyr) and each column over the age axis of the model. For an
+        array of masses the columns have shape (mass, age). Ages whose table
+        does not cover the mass are NaN.
+
+    """
+    grid = get_grid(model)
+    if columns is None:
+        columns = list(grid.columns)
+    for col in columns:
+        if col not in grid.column_index:
+            raise ValueError(
+                "Column {0} not in Baraffe table (model={1})".format(col, model)
+            )
+
+    masses = np.asarray(mass, dtype=float)
+    keys = np.round(np.atleast_1d(masses), track_mass_decimals)
+    tracks = [track_cache.get((grid.model, key)) for key in keys.tolist()]
+    missing = [i for i, found in enumerate(tracks) if found is None]
+    if missing:
+        new_tracks = _mass_tracks(grid, keys[missing])
+        for i, new_track in zip(missing, new_tracks):
+            track_cache.put((grid.model, float(keys[i])), new_track)
+            tracks[i] = new_track
+
+    slabs = np.stack(tracks)
+    indices = [grid.column_index[col] for col in columns]
+    if masses.ndim == 0:
+        slabs = slabs[0]
+    result = {"age": grid.ages.copy()}
+    for col, index in zip(columns, indices):
+        result[col] = slabs[..., index].copy()
+    return result
+
+
+def _mass_tracks(grid: ModelGrid, masses: np.ndarray) -> List[np.ndarray]:
+    """Interpolate the grid in mass, returning read-only (age, column) tracks."""
+    index, weight, below, above = interpolation_weights(grid.masses, masses)
+    lower = grid.data[:, index]  # (age, mass, column)
+    upper = grid.data[:, index + 1]
+    w = weight[None, :, None]
+    with np.errstate(invalid="ignore"):
+        tracks = np.where(
+            w == 0, lower, np.where(w == 1, upper, lower + w * (upper - lower))
+        )
+    # Both rows are needed unless the mass is exactly on one of them.
+    valid = (grid.valid[:, index] | (weight == 1)) & (
+        grid.valid[:, index + 1] | (weight == 0)
+    )
+    tracks[~valid | below | above] = np.nan
+    tracks = np.ascontiguousarray(np.moveaxis(tracks, 1, 0))
+    tracks.setflags(write=False)
+    return list(tracks)